@@ -0,0 +1,107 @@
+import datetime as dt
+import functools
+import re
+from decimal import Decimal
+from typing import Any, Callable, Dict, List
+
+from harness import measure
+
+from scoundrel_python.scoundrel_json import (
+  ScoundrelTypeHandler,
+  _walk_dumps,
+  dumps,
+  loads,
+  register_scoundrel_type,
+)
+from scoundrel_python.web_socket_server import WebSocketClient
+from scoundrel_python.wire_codecs import available_wire_codecs, negotiate_wire_codec
+
+
+def register_decimal_type() -> None:
+  register_scoundrel_type(
+    ScoundrelTypeHandler(
+      type="decimal",
+      can_serialize=lambda value: isinstance(value, Decimal),
+      serialize=lambda value: {"value": str(value)},
+      deserialize=lambda payload: Decimal(payload["value"]),
+      python_types=(Decimal,)
+    )
+  )
+
+
+def deep_payload(depth: int) -> Any:
+  value: Any = {"leaf": True}
+  for level in range(depth):
+    value = {"level": level, "child": value, "siblings": [level, str(level)]}
+
+  return value
+
+
+def payloads() -> Dict[str, Any]:
+  timestamp = dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+  pattern = re.compile(r"^item-\d+$", re.IGNORECASE)
+
+  rows = [{"id": index, "name": f"row-{index}", "score": index / 3} for index in range(10000)]
+
+  return {
+    "flat": {"response": rows},
+    "deep": {"response": deep_payload(200)},
+    "custom_types": {
+      "response": [
+        {"id": index, "created_at": timestamp, "pattern": pattern, "price": Decimal(index) / 4}
+        for index in range(2000)
+      ]
+    }
+  }
+
+
+def handle_payloads() -> Dict[str, Any]:
+  client = WebSocketClient(None)
+  payloads = {}
+
+  for handles in ("verbose", "compact"):
+    client.decode_context.compact_handles = handles == "compact"
+    # 10k child handles, as sent in a callback batch or a reference-heavy response
+    payloads[handles] = {
+      "command": "call_function_on_reference",
+      "command_id": None,
+      "data": {
+        "reference_id": 1,
+        "calls": [[client.reference_marker(object_id)] for object_id in range(10000)],
+        "with": "none"
+      }
+    }
+
+  return payloads
+
+
+def run(iterations: int) -> List[Dict[str, Any]]:
+  register_decimal_type()
+  results = []
+
+  def add(name: str, function: Callable[[], Any]) -> Dict[str, Any]:
+    result = measure("codec", name, function, iterations)
+    results.append(result)
+    return result
+
+  for name, value in payloads().items():
+    raw = dumps(value)
+    # The walk is the fallback for values the json module can't encode, so both have to agree
+    assert raw == _walk_dumps(value)
+
+    add(f"json_dumps_{name}", functools.partial(dumps, value))
+    add(f"json_walk_dumps_{name}", functools.partial(_walk_dumps, value))
+    add(f"json_loads_{name}", functools.partial(loads, raw))
+
+    if "msgpack" in available_wire_codecs():
+      codec = negotiate_wire_codec(["msgpack"])
+      packed = codec.encode(value)
+      # Partials bind this iteration's codec and payload instead of reading the loop variables later
+      add(f"msgpack_encode_{name}", functools.partial(codec.encode, value))
+      add(f"msgpack_decode_{name}", functools.partial(codec.decode, packed))
+
+  for handles, value in handle_payloads().items():
+    result = add(f"json_dumps_handles_{handles}", functools.partial(dumps, value))
+    result["bytes"] = len(dumps(value))
+
+  return results
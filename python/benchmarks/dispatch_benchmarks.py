@@ -0,0 +1,166 @@
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from harness import measure_async
+
+from scoundrel_python.command_dispatcher import CommandDispatcher
+from scoundrel_python.scoundrel_json import dumps, loads
+from scoundrel_python.web_socket_server import WebSocketClient
+
+
+class LoopbackWebSocket:
+  def __init__(self) -> None:
+    self.incoming: "asyncio.Queue[str]" = asyncio.Queue()
+    self.responses: Dict[int, "asyncio.Future[Any]"] = {}
+    self.loop = asyncio.get_running_loop()
+
+  async def recv(self) -> str:
+    return await self.incoming.get()
+
+  async def send(self, payload: Any) -> None:
+    data = loads(payload)
+
+    if data["command"] == "call_function_on_reference":
+      if data["command_id"] is not None:
+        response = {
+          "command": "command_response",
+          "command_id": data["command_id"],
+          "data": {"data": {"response": None}}
+        }
+        self.incoming.put_nowait(dumps(response))
+      return
+
+    future = self.responses.pop(data["command_id"], None)
+    if future is not None and not future.done():
+      future.set_result(data)
+
+  async def request(self, command_id: int, command: str, data: Dict[str, Any]) -> Any:
+    future = self.loop.create_future()
+    self.responses[command_id] = future
+    self.incoming.put_nowait(dumps({"command": command, "command_id": command_id, "data": data}))
+
+    return await future
+
+
+class ArgumentSink:
+  def accept(self, rows: List[Any], owner: Any) -> int:
+    return len(rows)
+
+  def emit_progress(self, events: int, progress: Any) -> int:
+    for index in range(events):
+      progress(index)
+
+    return events
+
+
+async def run_connection(
+  iterations: int,
+  inline_commands: Optional[List[str]],
+  label: str
+) -> List[Dict[str, Any]]:
+  ws = LoopbackWebSocket()
+  dispatcher = CommandDispatcher(inline_commands=inline_commands)
+  client = WebSocketClient(ws, dispatcher=dispatcher)
+  list_id = client.spawn_object(list(range(100)))
+  sink_id = client.spawn_object(ArgumentSink())
+  owner_marker = {
+    "__scoundrel_type": "reference",
+    "__scoundrel_object_id": list_id,
+    "__scoundrel_instance_id": client.instance_id
+  }
+  rows = [
+    {"id": index, "name": f"row-{index}", "tags": ["a", "b"], "owner": owner_marker}
+    for index in range(2000)
+  ]
+  listen_task = asyncio.ensure_future(client.listen())
+  command_ids = iter(range(1, 10 ** 9))
+
+  def read_data(index: int) -> Dict[str, Any]:
+    return {"reference_id": list_id, "attribute_name": index, "with": "result"}
+
+  async def read_attribute() -> None:
+    await ws.request(next(command_ids), "read_attribute", read_data(5))
+
+  async def concurrent_reads() -> None:
+    await asyncio.gather(*(
+      ws.request(next(command_ids), "read_attribute", read_data(index)) for index in range(50)
+    ))
+
+  async def batch_reads() -> None:
+    commands = [{"command": "read_attribute", "data": read_data(index)} for index in range(50)]
+    await ws.request(next(command_ids), "batch", {"commands": commands})
+
+  async def call_with_heavy_args() -> None:
+    await ws.request(
+      next(command_ids),
+      "call_method_on_reference",
+      {
+        "reference_id": sink_id,
+        "method_name": "accept",
+        "args": [rows, owner_marker],
+        "with": "result"
+      }
+    )
+
+  def progress_events(mode: str) -> Any:
+    marker = {
+      "__scoundrel_type": "function",
+      "__scoundrel_function_id": 1,
+      "__scoundrel_callback_mode": mode
+    }
+
+    async def emit() -> None:
+      await ws.request(
+        next(command_ids),
+        "call_method_on_reference",
+        {
+          "reference_id": sink_id,
+          "method_name": "emit_progress",
+          "args": [1000, marker],
+          "with": "result"
+        }
+      )
+
+    return emit
+
+  try:
+    return [
+      await measure_async("dispatch", f"read_attribute_{label}", read_attribute, iterations),
+      await measure_async(
+        "dispatch", f"concurrent_reads_50_{label}", concurrent_reads, iterations, unit_count=50
+      ),
+      await measure_async(
+        "dispatch", f"batch_reads_50_{label}", batch_reads, iterations, unit_count=50
+      ),
+      await measure_async(
+        "dispatch", f"call_with_heavy_args_{label}", call_with_heavy_args, iterations
+      )
+    ] + [
+      await measure_async(
+        "dispatch",
+        f"progress_events_1000_{mode}_{label}",
+        progress_events(mode),
+        max(1, iterations // 10),
+        unit_count=1000
+      )
+      for mode in ("result", "fire_and_forget", "batched")
+    ]
+  finally:
+    listen_task.cancel()
+    try:
+      await listen_task
+    except asyncio.CancelledError:
+      pass
+
+    dispatcher.shutdown()
+
+
+async def run_all(iterations: int) -> List[Dict[str, Any]]:
+  results = await run_connection(iterations, None, "pool")
+  results.extend(await run_connection(iterations, ["read_attribute", "batch"], "inline"))
+
+  return results
+
+
+def run(iterations: int) -> List[Dict[str, Any]]:
+  return asyncio.run(run_all(iterations))
@@ -0,0 +1,167 @@
+import asyncio
+import itertools
+import threading
+from typing import Any, Dict, List, Optional
+
+import websockets
+from harness import measure_async
+
+from scoundrel_python.scoundrel_json import dumps, loads
+from scoundrel_python.web_socket_server import ScoundrelPythonServer
+from scoundrel_python.worker_supervisor import bind_socket
+
+
+class BackgroundServer:
+  def __init__(self, **options: Any) -> None:
+    self.server = ScoundrelPythonServer(**options)
+    self.sock = bind_socket("127.0.0.1", 0)
+    self.port: int = self.sock.getsockname()[1]
+    self.loop: Optional[asyncio.AbstractEventLoop] = None
+    self.task: Optional["asyncio.Task[None]"] = None
+    self.ready = threading.Event()
+    self.thread = threading.Thread(
+      target=self.serve, name="scoundrel-benchmark-server", daemon=True
+    )
+
+  def __enter__(self) -> "BackgroundServer":
+    self.thread.start()
+    self.ready.wait()
+    return self
+
+  def __exit__(self, *_args: Any) -> None:
+    if self.loop is not None and self.task is not None:
+      self.loop.call_soon_threadsafe(self.task.cancel)
+
+    self.thread.join()
+
+  def serve(self) -> None:
+    loop = asyncio.new_event_loop()
+    self.loop = loop
+    self.task = loop.create_task(self.server.run_forever(sock=self.sock, started=self.ready.set))
+
+    try:
+      loop.run_until_complete(self.task)
+    except asyncio.CancelledError:
+      pass
+    finally:
+      loop.close()
+
+
+class BenchmarkClient:
+  def __init__(self, ws: Any) -> None:
+    self.ws = ws
+    self.command_ids = itertools.count(1)
+    self.responses: Dict[int, "asyncio.Future[Any]"] = {}
+    self.reader: Optional["asyncio.Task[None]"] = None
+
+  async def start(self) -> None:
+    self.reader = asyncio.ensure_future(self.read_messages())
+
+  async def read_messages(self) -> None:
+    async for raw in self.ws:
+      data = loads(raw)
+
+      if data["command"] == "call_function_on_reference":
+        # Answers callbacks like the JavaScript client would, echoing the first argument
+        args = data["data"]["args"]
+        await self.ws.send(dumps({
+          "command": "command_response",
+          "command_id": data["command_id"],
+          "data": {"data": {"response": args[0] if args else None}}
+        }))
+        continue
+
+      future = self.responses.pop(data["command_id"], None)
+      if future is None:
+        continue
+
+      if "error" in data["data"]:
+        future.set_exception(RuntimeError(data["data"]["error"]))
+      else:
+        future.set_result(data["data"]["data"])
+
+  async def request(self, command: str, data: Dict[str, Any]) -> Any:
+    command_id = next(self.command_ids)
+    future = asyncio.get_running_loop().create_future()
+    self.responses[command_id] = future
+    await self.ws.send(dumps({"command": command, "command_id": command_id, "data": data}))
+
+    return await future
+
+  async def close(self) -> None:
+    if self.reader is not None:
+      self.reader.cancel()
+
+
+async def run_client(port: int, iterations: int) -> List[Dict[str, Any]]:
+  async with websockets.connect(f"ws://127.0.0.1:{port}", max_size=None) as ws:
+    client = BenchmarkClient(ws)
+    await client.start()
+
+    try:
+      async def new_object(class_name: str, args: List[Any]) -> int:
+        created = await client.request(
+          "new_object_with_reference", {"class_name": class_name, "args": args}
+        )
+        return int(created["object_id"])
+
+      list_id = await new_object("[]", list(range(100)))
+      target_id = await new_object("CallbackTarget", [])
+      await client.request("call_method_on_reference", {
+        "reference_id": target_id,
+        "method_name": "addEventListener",
+        "args": ["tick", {"__scoundrel_type": "function", "__scoundrel_function_id": 1}],
+        "with": "result"
+      })
+
+      def read_data(index: int) -> Dict[str, Any]:
+        return {"reference_id": list_id, "attribute_name": index, "with": "result"}
+
+      def call_data(reference_id: int, method_name: str, args: List[Any]) -> Dict[str, Any]:
+        return {
+          "reference_id": reference_id,
+          "method_name": method_name,
+          "args": args,
+          "with": "result"
+        }
+
+      async def read_attribute() -> None:
+        await client.request("read_attribute", read_data(5))
+
+      async def call_method() -> None:
+        await client.request("call_method_on_reference", call_data(list_id, "index", [50]))
+
+      async def callback() -> None:
+        await client.request(
+          "call_method_on_reference", call_data(target_id, "trigger", ["tick", 1])
+        )
+
+      async def reference_churn() -> None:
+        object_id = await new_object("[]", [1, 2, 3])
+        await client.request("release_references", {"reference_ids": [object_id]})
+
+      async def pipelined_reads() -> None:
+        await asyncio.gather(*(
+          client.request("read_attribute", read_data(index)) for index in range(100)
+        ))
+
+      return [
+        await measure_async("end_to_end", "read_attribute", read_attribute, iterations),
+        await measure_async("end_to_end", "call_method", call_method, iterations),
+        await measure_async("end_to_end", "callback", callback, iterations),
+        await measure_async("end_to_end", "reference_churn", reference_churn, iterations),
+        await measure_async(
+          "end_to_end",
+          "pipelined_reads_100",
+          pipelined_reads,
+          max(1, iterations // 10),
+          unit_count=100
+        )
+      ]
+    finally:
+      await client.close()
+
+
+def run(iterations: int) -> List[Dict[str, Any]]:
+  with BackgroundServer() as background_server:
+    return asyncio.run(run_client(background_server.port, iterations))
@@ -0,0 +1,59 @@
+import statistics
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+
+def summarize(suite: str, name: str, samples: List[float], unit_count: int = 1) -> Dict[str, Any]:
+  samples = sorted(samples)
+  mean = statistics.mean(samples)
+
+  return {
+    "suite": suite,
+    "name": name,
+    "iterations": len(samples),
+    "mean_ms": mean * 1000,
+    "min_ms": samples[0] * 1000,
+    "p50_ms": samples[len(samples) // 2] * 1000,
+    "p99_ms": samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000,
+    "ops_per_second": unit_count / mean if mean else 0.0
+  }
+
+
+def measure(
+  suite: str,
+  name: str,
+  function: Callable[[], Any],
+  iterations: int,
+  warmup: int = 3
+) -> Dict[str, Any]:
+  for _ in range(warmup):
+    function()
+
+  samples = []
+  for _ in range(iterations):
+    started_at = time.perf_counter()
+    function()
+    samples.append(time.perf_counter() - started_at)
+
+  return summarize(suite, name, samples)
+
+
+async def measure_async(
+  suite: str,
+  name: str,
+  function: Callable[[], Awaitable[Any]],
+  iterations: int,
+  warmup: int = 3,
+  unit_count: int = 1
+) -> Dict[str, Any]:
+  for _ in range(warmup):
+    await function()
+
+  samples = []
+  for _ in range(iterations):
+    started_at = time.perf_counter()
+    await function()
+    samples.append(time.perf_counter() - started_at)
+
+  return summarize(suite, name, samples, unit_count)
+
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+
+import argparse
+import datetime as dt
+import json
+import os
+import platform
+import sys
+from typing import Any, Dict, List, Optional, Sequence
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import codec_benchmarks
+import dispatch_benchmarks
+import end_to_end_benchmarks
+
+SUITES = {
+  "codec": codec_benchmarks.run,
+  "dispatch": dispatch_benchmarks.run,
+  "end_to_end": end_to_end_benchmarks.run
+}
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], threshold: float) -> List[str]:
+  baseline_results = {(result["suite"], result["name"]): result for result in baseline["results"]}
+  regressions = []
+
+  for result in results:
+    previous = baseline_results.get((result["suite"], result["name"]))
+    if previous is None or not previous["mean_ms"]:
+      continue
+
+    change = result["mean_ms"] / previous["mean_ms"] - 1
+    if change > threshold:
+      regressions.append(
+        f"{result['suite']}/{result['name']}: "
+        f"{previous['mean_ms']:.3f}ms -> {result['mean_ms']:.3f}ms (+{change:.0%})"
+      )
+
+  return regressions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+  parser = argparse.ArgumentParser(description="Benchmarks the Scoundrel Python server and codecs")
+  parser.add_argument(
+    "--suites", default=",".join(SUITES), help=f"Comma separated suites out of {', '.join(SUITES)}"
+  )
+  parser.add_argument("--iterations", type=int, default=200, help="Timed iterations per benchmark")
+  parser.add_argument(
+    "--output", default=None, help="Write the JSON results here instead of stdout"
+  )
+  parser.add_argument(
+    "--compare", default=None, help="Baseline JSON results to check for regressions"
+  )
+  parser.add_argument(
+    "--threshold",
+    type=float,
+    default=0.1,
+    help="Allowed slow-down before a benchmark counts as a regression"
+  )
+  args = parser.parse_args(argv)
+
+  results: List[Dict[str, Any]] = []
+  for suite in [suite.strip() for suite in args.suites.split(",") if suite.strip()]:
+    if suite not in SUITES:
+      parser.error(f"Unknown suite {suite}")
+
+    for result in SUITES[suite](args.iterations):
+      size = f" {result['bytes']:>10} bytes" if "bytes" in result else ""
+      print(
+        f"{result['suite']:<11} {result['name']:<32} {result['mean_ms']:>9.3f}ms "
+        f"{result['ops_per_second']:>12.0f}/s{size}",
+        file=sys.stderr
+      )
+      results.append(result)
+
+  report = {
+    "created_at": dt.datetime.now(dt.timezone.utc).isoformat(),
+    "python": platform.python_version(),
+    "implementation": platform.python_implementation(),
+    "platform": platform.platform(),
+    "cpu_count": os.cpu_count(),
+    "iterations": args.iterations,
+    "results": results
+  }
+
+  if args.output:
+    with open(args.output, "w", encoding="utf-8") as output:
+      json.dump(report, output, indent=2)
+  else:
+    print(json.dumps(report, indent=2))
+
+  if args.compare:
+    with open(args.compare, encoding="utf-8") as baseline_file:
+      regressions = compare(results, json.load(baseline_file), args.threshold)
+
+    for regression in regressions:
+      print(f"Regression: {regression}", file=sys.stderr)
+
+    if regressions:
+      return 1
+
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
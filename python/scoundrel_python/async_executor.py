@@ -0,0 +1,73 @@
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Awaitable, Optional
+
+
+async def _await(awaitable: Awaitable[Any]) -> Any:
+  return await awaitable
+
+
+class AsyncExecutor:
+  def __init__(self) -> None:
+    self.loop: Optional[asyncio.AbstractEventLoop] = None
+    self._thread: Optional[threading.Thread] = None
+    self._lock = threading.Lock()
+
+  def in_loop_thread(self) -> bool:
+    return self._thread is not None and self._thread is threading.current_thread()
+
+  def submit(self, awaitable: Awaitable[Any]) -> concurrent.futures.Future:
+    loop = self.start()
+
+    return asyncio.run_coroutine_threadsafe(_await(awaitable), loop)
+
+  def start(self) -> asyncio.AbstractEventLoop:
+    with self._lock:
+      if self.loop is None:
+        loop = asyncio.new_event_loop()
+        started = threading.Event()
+        thread = threading.Thread(target=self._run, args=(loop, started), name="scoundrel-async", daemon=True)
+        thread.start()
+        started.wait()
+
+        self.loop = loop
+        self._thread = thread
+
+      return self.loop
+
+  def shutdown(self) -> None:
+    with self._lock:
+      loop = self.loop
+      thread = self._thread
+      self.loop = None
+      self._thread = None
+
+    if loop is None or thread is None:
+      return
+
+    # Let running coroutines finish so their responses still go out
+    asyncio.run_coroutine_threadsafe(self._stop(loop), loop)
+
+    if thread is not threading.current_thread():
+      thread.join()
+
+  @staticmethod
+  async def _stop(loop: asyncio.AbstractEventLoop) -> None:
+    current_task = asyncio.current_task()
+    tasks = [task for task in asyncio.all_tasks() if task is not current_task]
+
+    if tasks:
+      await asyncio.gather(*tasks, return_exceptions=True)
+
+    loop.stop()
+
+  @staticmethod
+  def _run(loop: asyncio.AbstractEventLoop, started: threading.Event) -> None:
+    asyncio.set_event_loop(loop)
+    loop.call_soon(started.set)
+
+    try:
+      loop.run_forever()
+    finally:
+      loop.close()
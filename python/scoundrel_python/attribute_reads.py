@@ -0,0 +1,84 @@
+import collections.abc
+import re
+from typing import Any, List, Optional, Tuple
+
+Items = Tuple[Optional[List[Any]], List[Any], Optional[int]]
+
+SLICE_PATTERN = re.compile(r"^\[(-?\d*):(-?\d*)(?::(-?\d*))?\]$")
+
+
+def parse_index(attribute_name: Any) -> Optional[int]:
+  if isinstance(attribute_name, int):
+    return attribute_name
+  if isinstance(attribute_name, str) and attribute_name.isdigit():
+    return int(attribute_name)
+  return None
+
+
+def read_attribute_value(object: Any, attribute_name: Any) -> Any:
+  if isinstance(object, (list, tuple)):
+    index = parse_index(attribute_name)
+    if index is not None:
+      return object[index]
+    if attribute_name == "length":
+      return len(object)
+  elif isinstance(object, dict):
+    if attribute_name in object:
+      return object[attribute_name]
+    if attribute_name == "length":
+      return len(object)
+
+  return getattr(object, attribute_name)
+
+
+def read_keys(object: Any, keys: Any) -> List[Any]:
+  if not isinstance(keys, list):
+    raise ValueError("Keys must be a list")
+
+  return [read_attribute_value(object, key) for key in keys]
+
+
+def read_slice(object: Any, item_slice: slice) -> Tuple[Optional[List[Any]], List[Any]]:
+  if isinstance(object, collections.abc.Mapping):
+    keys = list(object.keys())[item_slice]
+    return keys, [object[key] for key in keys]
+
+  if isinstance(object, collections.abc.Sequence):
+    return None, list(object[item_slice])
+
+  raise TypeError(f"Can't read items from {type(object).__name__}")
+
+
+def is_slice_name(attribute_name: Any) -> bool:
+  return isinstance(attribute_name, str) and SLICE_PATTERN.match(attribute_name) is not None
+
+
+def slice_from_name(object: Any, attribute_name: Any) -> Optional[slice]:
+  # Only sequences are sliced by name, a mapping can have a key that looks like a slice
+  if not isinstance(object, collections.abc.Sequence) or not isinstance(attribute_name, str):
+    return None
+
+  match = SLICE_PATTERN.match(attribute_name)
+  if match is None:
+    return None
+
+  return slice(*(int(part) if part else None for part in match.groups()))
+
+
+def item_length(object: Any) -> Optional[int]:
+  return len(object) if isinstance(object, collections.abc.Sized) else None
+
+
+def read_items(object: Any, keys: Any, item_slice: Optional[slice], attribute_name: Any = None) -> Optional[Items]:
+  # Shared by the server and its worker processes, so both answer keys and slice reads the same way
+  if keys is not None:
+    return None, read_keys(object, keys), item_length(object)
+
+  if item_slice is None:
+    item_slice = slice_from_name(object, attribute_name)
+    if item_slice is None:
+      return None
+
+  item_keys, values = read_slice(object, item_slice)
+
+  return item_keys, values, item_length(object)
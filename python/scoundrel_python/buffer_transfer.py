@@ -0,0 +1,113 @@
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+from .marker_resolution import resolve_markers
+
+BUFFER_TYPE = "buffer"
+DEFAULT_FRAME_SIZE = 1024 * 1024
+
+
+class OutgoingBuffer:
+  def __init__(self, value: Any, frame_size: int = DEFAULT_FRAME_SIZE) -> None:
+    try:
+      view = memoryview(value)
+    except TypeError:
+      raise TypeError(f"Can't send {type(value).__name__} as a buffer since it doesn't support the buffer protocol") from None
+
+    self.view: memoryview = view
+    self.frame_size: int = frame_size
+    # Frames are sliced from a flat byte view of the original memory, so only non-contiguous buffers are copied
+    self.bytes_view: memoryview = view.cast("B") if view.c_contiguous else memoryview(view.tobytes())
+
+  @property
+  def byte_length(self) -> int:
+    return self.bytes_view.nbytes
+
+  @property
+  def frame_count(self) -> int:
+    return frame_count(self.byte_length, self.frame_size)
+
+  def metadata(self) -> Dict[str, Any]:
+    return {
+      "byte_length": self.byte_length,
+      "frames": self.frame_count,
+      "format": self.view.format,
+      "itemsize": self.view.itemsize,
+      "shape": list(self.view.shape or ())
+    }
+
+  def frames(self) -> Iterator[memoryview]:
+    if self.byte_length == 0:
+      yield self.bytes_view
+      return
+
+    for offset in range(0, self.byte_length, self.frame_size):
+      yield self.bytes_view[offset:offset + self.frame_size]
+
+
+def frame_count(byte_length: int, frame_size: int = DEFAULT_FRAME_SIZE) -> int:
+  return max(1, -(-byte_length // frame_size))
+
+
+class BufferAssembler:
+  def __init__(
+    self,
+    byte_length: int,
+    frames: int,
+    format: Optional[str] = None,
+    shape: Optional[Sequence[int]] = None,
+    max_byte_length: Optional[int] = None,
+    frame_size: int = DEFAULT_FRAME_SIZE
+  ) -> None:
+    # The length comes from the client, so it is checked before anything is allocated for it
+    if not isinstance(byte_length, int) or isinstance(byte_length, bool) or byte_length < 0:
+      raise ValueError(f"Invalid buffer length {byte_length!r}")
+
+    if max_byte_length is not None and byte_length > max_byte_length:
+      raise ValueError(f"Buffer of {byte_length} bytes exceeds the limit of {max_byte_length} bytes")
+
+    expected_frames = frame_count(byte_length, frame_size)
+    if frames != expected_frames:
+      raise ValueError(f"Buffer of {byte_length} bytes must be sent in {expected_frames} frames, got {frames!r}")
+
+    self.data: bytearray = bytearray(byte_length)
+    self.frames: int = frames
+    self.format: Optional[str] = format
+    self.shape: Optional[List[int]] = list(shape) if shape else None
+    self.received_frames: int = 0
+    self.offset: int = 0
+
+  @property
+  def done(self) -> bool:
+    return self.received_frames >= self.frames
+
+  def add(self, frame: Any) -> None:
+    if isinstance(frame, str):
+      raise TypeError("Buffer frames must be binary")
+
+    frame_view = memoryview(frame).cast("B")
+    end = self.offset + frame_view.nbytes
+
+    if end > len(self.data):
+      raise ValueError(f"Buffer frames exceed the announced {len(self.data)} bytes")
+
+    memoryview(self.data)[self.offset:end] = frame_view
+    self.offset = end
+    self.received_frames += 1
+
+  def result(self) -> memoryview:
+    if self.offset != len(self.data):
+      raise ValueError(f"Buffer received {self.offset} of {len(self.data)} bytes")
+
+    view = memoryview(self.data)
+    if self.format and self.format != "B":
+      return view.cast(self.format, self.shape) if self.shape else view.cast(self.format)
+
+    return view
+
+
+def is_buffer_marker(value: Any) -> bool:
+  return isinstance(value, dict) and value.get("__scoundrel_type") == BUFFER_TYPE and isinstance(value.get("index"), int)
+
+
+def resolve_buffer_markers(value: Any, buffers: Sequence[memoryview]) -> Any:
+  return resolve_markers(value, lambda marker: buffers[marker["index"]] if is_buffer_marker(marker) else marker)
@@ -0,0 +1,59 @@
+import threading
+from typing import Any, Callable, List, Sequence
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_BATCH_INTERVAL = 0.05
+
+
+class CallbackBatch:
+  def __init__(
+    self,
+    function_id: int,
+    send: Callable[[int, List[Sequence[Any]]], None],
+    schedule: Callable[[float, Callable[[], None]], None],
+    max_calls: int = DEFAULT_BATCH_SIZE,
+    interval: float = DEFAULT_BATCH_INTERVAL
+  ) -> None:
+    if not isinstance(max_calls, int) or max_calls < 1:
+      raise ValueError(f"Batch size must be at least 1, got {max_calls!r}")
+
+    self.function_id: int = function_id
+    self.send: Callable[[int, List[Sequence[Any]]], None] = send
+    self.schedule: Callable[[float, Callable[[], None]], None] = schedule
+    self.max_calls: int = max_calls
+    self.interval: float = interval
+    self.calls: List[Sequence[Any]] = []
+    self._timer_pending: bool = False
+    self._lock = threading.Lock()
+
+  def __call__(self, *args: Any) -> None:
+    with self._lock:
+      self.calls.append(args)
+
+      if len(self.calls) < self.max_calls:
+        # One timer per batch, so calls never wait much longer than the interval for a flush
+        if not self._timer_pending:
+          self._timer_pending = True
+          self.schedule(self.interval, self.flush)
+        return
+
+      calls = self.calls
+      self.calls = []
+
+    self.send(self.function_id, calls)
+
+  def take(self) -> List[Sequence[Any]]:
+    with self._lock:
+      calls = self.calls
+      self.calls = []
+
+    return calls
+
+  def flush(self) -> None:
+    with self._lock:
+      self._timer_pending = False
+      calls = self.calls
+      self.calls = []
+
+    if calls:
+      self.send(self.function_id, calls)
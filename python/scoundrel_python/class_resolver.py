@@ -0,0 +1,83 @@
+import builtins
+import collections
+import importlib
+import re
+import threading
+from typing import Any, Dict, Mapping, Optional
+
+CLASS_NAME_PATTERN = re.compile(r"^[A-Za-z_]\w*(\.[A-Za-z_]\w*)*$")
+
+
+class ClassResolver:
+  def __init__(self, namespace: Optional[Mapping[str, Any]] = None, maxsize: int = 256) -> None:
+    self.namespace: Mapping[str, Any] = namespace if namespace is not None else {}
+    self.maxsize: int = maxsize
+    self.hits: int = 0
+    self.misses: int = 0
+    self._cache: "collections.OrderedDict[str, Any]" = collections.OrderedDict()
+    self._lock = threading.Lock()
+
+  def resolve(self, class_name: str) -> Any:
+    with self._lock:
+      if class_name in self._cache:
+        self.hits += 1
+        self._cache.move_to_end(class_name)
+        return self._cache[class_name]
+
+      self.misses += 1
+
+    resolved = self._resolve_uncached(class_name)
+
+    with self._lock:
+      self._cache[class_name] = resolved
+      self._cache.move_to_end(class_name)
+
+      while len(self._cache) > self.maxsize:
+        self._cache.popitem(last=False)
+
+    return resolved
+
+  def clear(self) -> None:
+    with self._lock:
+      self._cache.clear()
+
+  def stats(self) -> Dict[str, int]:
+    return {"hits": self.hits, "misses": self.misses, "size": len(self._cache), "maxsize": self.maxsize}
+
+  def _resolve_uncached(self, class_name: str) -> Any:
+    if not isinstance(class_name, str) or not CLASS_NAME_PATTERN.match(class_name):
+      raise ValueError(f"Invalid class name: {class_name!r}")
+
+    parts = class_name.split(".")
+    first_name = parts[0]
+
+    if first_name in self.namespace:
+      return self._get_attributes(self.namespace[first_name], parts[1:], class_name)
+
+    if hasattr(builtins, first_name):
+      return self._get_attributes(getattr(builtins, first_name), parts[1:], class_name)
+
+    # Import the longest module path that exists and read the rest as attributes, e.g. collections.OrderedDict
+    for split_at in range(len(parts), 0, -1):
+      module_name = ".".join(parts[:split_at])
+
+      try:
+        module = importlib.import_module(module_name)
+      except ModuleNotFoundError as error:
+        if error.name is not None and not module_name.startswith(error.name):
+          raise
+        continue
+
+      return self._get_attributes(module, parts[split_at:], class_name)
+
+    raise NameError(f"Can't resolve class {class_name}")
+
+  @staticmethod
+  def _get_attributes(value: Any, attribute_names: Any, class_name: str) -> Any:
+    for attribute_name in attribute_names:
+      try:
+        value = getattr(value, attribute_name)
+      except AttributeError:
+        raise NameError(f"Can't resolve class {class_name}") from None
+
+    return value
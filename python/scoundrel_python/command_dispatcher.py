@@ -0,0 +1,224 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import contextvars
+import os
+import queue
+import threading
+from typing import Any, Awaitable, Callable, Deque, Iterable, Iterator, List, Optional, Set, Tuple
+
+CommandJob = Callable[[], Awaitable[None]]
+
+
+
+class SlotHandoff:
+  def __init__(self, worker: bool) -> None:
+    self.worker: bool = worker
+    # Concurrent waits of one job, like callbacks it gathers, share the single slot it holds
+    self.waiting: int = 0
+
+
+# Set while a dispatched job runs, so it can give up its slot while it waits on the client
+HOLDING_SLOT: "contextvars.ContextVar[Optional[SlotHandoff]]" = contextvars.ContextVar(
+  "scoundrel_holding_slot",
+  default=None
+)
+
+
+def default_pool_size() -> int:
+  return min(32, (os.cpu_count() or 1) + 4)
+
+
+class CommandDispatcher:
+  def __init__(
+    self,
+    pool_size: Optional[int] = None,
+    queue_size: int = 1024,
+    inline_commands: Optional[Iterable[str]] = None
+  ) -> None:
+    self.pool_size: int = default_pool_size() if pool_size is None else int(pool_size)
+    self.queue_size: int = int(queue_size)
+    self.inline_commands: Set[str] = set(inline_commands or ())
+
+    if self.pool_size < 1:
+      raise ValueError(f"Pool size must be at least 1, got {self.pool_size}")
+    if self.queue_size < 0:
+      raise ValueError(f"Queue size can't be negative, got {self.queue_size}")
+
+    self._jobs: "queue.SimpleQueue[Optional[CommandJob]]" = queue.SimpleQueue()
+    self._lock = threading.Lock()
+    self._pending: int = 0
+    self._blocked: int = 0
+    self._waiters: Deque[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = collections.deque()
+    self._workers: List[threading.Thread] = []
+
+  @property
+  def capacity(self) -> int:
+    return self.pool_size + self.queue_size
+
+  @property
+  def pending(self) -> int:
+    return self._pending
+
+  async def dispatch(self, command: str, job: CommandJob) -> None:
+    if command in self.inline_commands:
+      try:
+        await job()
+      except Exception:
+        # The job has already reported the error back to the client
+        pass
+      return
+
+    await self._acquire_slot()
+    self._start_workers()
+    self._jobs.put(job)
+
+  async def dispatch_to(
+    self,
+    submit: Callable[[Awaitable[None]], "concurrent.futures.Future[None]"],
+    job: CommandJob
+  ) -> None:
+    # Commands that run on another loop count against the same slots as the pool
+    await self._acquire_slot()
+    future = submit(self._run_holding_slot(job, worker=False))
+    future.add_done_callback(lambda _future: self._release_slot())
+
+  @contextlib.contextmanager
+  def blocking(self) -> Iterator[None]:
+    handoff = HOLDING_SLOT.get()
+    if handoff is None:
+      yield
+      return
+
+    with self._lock:
+      handoff.waiting += 1
+      outermost = handoff.waiting == 1
+
+    if outermost:
+      # A job waiting on the client gives up its slot and thread, so the client's nested commands can still run
+      self._release_slot()
+
+      if handoff.worker:
+        with self._lock:
+          self._blocked += 1
+          if len(self._workers) - self._blocked < self.pool_size:
+            self._add_worker()
+
+    try:
+      yield
+    finally:
+      with self._lock:
+        handoff.waiting -= 1
+        if handoff.waiting == 0:
+          if handoff.worker:
+            self._blocked -= 1
+          self._pending += 1
+
+  def shutdown(self) -> None:
+    with self._lock:
+      workers = self._workers
+      self._workers = []
+
+    for _worker in workers:
+      self._jobs.put(None)
+
+    for worker in workers:
+      if worker is not threading.current_thread():
+        worker.join()
+
+  async def _acquire_slot(self) -> None:
+    with self._lock:
+      if self._pending < self.capacity:
+        self._pending += 1
+        return
+
+      loop = asyncio.get_running_loop()
+      waiter = loop.create_future()
+      self._waiters.append((loop, waiter))
+
+    # Wait for a finishing job to hand its slot over to us, which stops the caller from reading more commands
+    await waiter
+
+  def _release_slot(self) -> None:
+    with self._lock:
+      while self._waiters:
+        loop, waiter = self._waiters.popleft()
+        if loop.is_closed():
+          continue
+
+        loop.call_soon_threadsafe(self._wake_waiter, waiter)
+        return
+
+      self._pending -= 1
+
+  @staticmethod
+  async def _run_holding_slot(job: CommandJob, worker: bool) -> None:
+    HOLDING_SLOT.set(SlotHandoff(worker))
+
+    try:
+      await job()
+    except Exception:
+      # The job has already reported the error back to the client
+      pass
+
+  def _wake_waiter(self, waiter: asyncio.Future) -> None:
+    if waiter.done():
+      # The waiter was cancelled after the slot was handed over
+      self._release_slot()
+    else:
+      waiter.set_result(None)
+
+  def _start_workers(self) -> None:
+    if self._workers:
+      return
+
+    with self._lock:
+      if self._workers:
+        return
+
+      for _index in range(self.pool_size):
+        self._add_worker()
+
+  def _add_worker(self) -> None:
+    worker = threading.Thread(target=self._work, name=f"scoundrel-worker-{len(self._workers)}", daemon=True)
+    worker.start()
+    self._workers.append(worker)
+
+  def _retire(self) -> bool:
+    # Workers started for blocked jobs stop again once enough of the others are running
+    with self._lock:
+      current = threading.current_thread()
+      if current in self._workers and len(self._workers) - self._blocked > self.pool_size:
+        self._workers.remove(current)
+        return True
+
+    return False
+
+  def _work(self) -> None:
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    try:
+      while True:
+        job = self._jobs.get()
+        if job is None:
+          break
+
+        try:
+          loop.run_until_complete(self._run_holding_slot(job, worker=True))
+        finally:
+          retire = self._retire()
+          self._release_slot()
+
+        if retire:
+          break
+    finally:
+      loop.close()
+
+
+def parse_inline_commands(value: Any) -> Tuple[str, ...]:
+  if not value:
+    return ()
+
+  return tuple(command.strip() for command in str(value).split(",") if command.strip())
@@ -0,0 +1,81 @@
+from typing import Any, Callable, Dict, Optional
+
+from .marker_resolution import resolve_markers
+from .scoundrel_json import _decode_object
+
+MARKER_KEY = "__scoundrel_type"
+FUNCTION_TYPE = "function"
+REFERENCE_TYPE = "reference"
+COMPACT_REFERENCE_KEY = "$r"
+COMPACT_FUNCTION_KEY = "$f"
+
+
+class DecodeContext:
+  def __init__(
+    self,
+    registry: Any,
+    instance_id: str,
+    callback_factory: Callable[[int, Dict[str, Any]], Callable[..., Any]]
+  ) -> None:
+    self.registry: Any = registry
+    self.instance_id: str = instance_id
+    # Gets the marker as well, since it declares how the callback is called
+    self.callback_factory: Callable[[int, Dict[str, Any]], Callable[..., Any]] = callback_factory
+    self.error: Optional[Exception] = None
+    # Set once the connection negotiated compact handles in its handshake
+    self.compact_handles: bool = False
+
+  def decode_object(self, value: Dict[str, Any]) -> Any:
+    try:
+      return self.resolve_object(value)
+    except (KeyError, ValueError) as error:
+      # Raising would abort the whole message, so the error is kept for the command that sent it
+      if self.error is None:
+        self.error = error
+
+      return value
+
+  def resolve_object(self, value: Dict[str, Any]) -> Any:
+    marker_type = value.get(MARKER_KEY)
+    if marker_type is None:
+      if self.compact_handles and len(value) == 1:
+        return self.resolve_compact_handle(value)
+
+      return _decode_object(value)
+
+    if marker_type == FUNCTION_TYPE:
+      function_id = value.get("__scoundrel_function_id")
+      if not isinstance(function_id, int):
+        raise ValueError("Missing function reference ID")
+
+      return self.callback_factory(function_id, value)
+
+    if marker_type == REFERENCE_TYPE:
+      instance_id = value.get("__scoundrel_instance_id")
+      if instance_id is None or instance_id == self.instance_id:
+        return self.registry[value["__scoundrel_object_id"]]
+
+    return value
+
+  def resolve_compact_handle(self, value: Dict[str, Any]) -> Any:
+    if COMPACT_REFERENCE_KEY in value:
+      return self.registry[value[COMPACT_REFERENCE_KEY]]
+
+    if COMPACT_FUNCTION_KEY in value:
+      function_id = value[COMPACT_FUNCTION_KEY]
+      if not isinstance(function_id, int):
+        raise ValueError("Missing function reference ID")
+
+      return self.callback_factory(function_id, {})
+
+    return _decode_object(value)
+
+  def resolve(self, value: Any) -> Any:
+    # Resolves values that weren't decoded with this context
+    return resolve_markers(value, self.resolve_object)
+
+  def take_error(self) -> Optional[Exception]:
+    error = self.error
+    self.error = None
+
+    return error
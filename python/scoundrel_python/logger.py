@@ -0,0 +1,72 @@
+from typing import Any, Callable, Dict, Optional
+
+LOG_LEVELS: Dict[str, int] = {"debug": 10, "info": 20, "warning": 30, "error": 40, "off": 100}
+DEBUG = LOG_LEVELS["debug"]
+INFO = LOG_LEVELS["info"]
+WARNING = LOG_LEVELS["warning"]
+ERROR = LOG_LEVELS["error"]
+DEFAULT_LOG_LEVEL = "warning"
+DEFAULT_MAX_LENGTH = 1000
+
+
+def print_line(message: str) -> None:
+  print(message, flush=True)
+
+
+def parse_log_level(level: str) -> int:
+  try:
+    return LOG_LEVELS[level.lower()]
+  except KeyError:
+    raise ValueError(f"Unknown log level {level!r}, expected one of {', '.join(LOG_LEVELS)}") from None
+
+
+def truncate(value: Any, max_length: int) -> str:
+  text = value if isinstance(value, str) else str(value)
+  if len(text) <= max_length:
+    return text
+
+  return f"{text[:max_length]}... ({len(text) - max_length} more characters)"
+
+
+class ScoundrelLogger:
+  def __init__(
+    self,
+    level: str = DEFAULT_LOG_LEVEL,
+    sink: Optional[Callable[[str], None]] = None,
+    max_length: int = DEFAULT_MAX_LENGTH
+  ) -> None:
+    self.level: int = parse_log_level(level)
+    self.sink: Callable[[str], None] = sink or print_line
+    self.max_length: int = max_length
+
+  def enabled_for(self, level: int) -> bool:
+    return level >= self.level
+
+  def debug(self, message: Any, *args: Any) -> None:
+    if self.enabled_for(DEBUG):
+      self.log(DEBUG, message, args)
+
+  def info(self, message: Any, *args: Any) -> None:
+    if self.enabled_for(INFO):
+      self.log(INFO, message, args)
+
+  def warning(self, message: Any, *args: Any) -> None:
+    if self.enabled_for(WARNING):
+      self.log(WARNING, message, args)
+
+  def error(self, message: Any, *args: Any) -> None:
+    if self.enabled_for(ERROR):
+      self.log(ERROR, message, args)
+
+  def always(self, message: str) -> None:
+    self.sink(message)
+
+  def log(self, level: int, message: Any, args: Any) -> None:
+    # Messages and arguments are only rendered once the level is known to be enabled
+    if callable(message):
+      message = message()
+
+    if args:
+      message = message % tuple(truncate(arg, self.max_length) for arg in args)
+
+    self.sink(message)
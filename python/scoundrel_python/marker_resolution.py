@@ -0,0 +1,23 @@
+from typing import Any, Callable, Dict
+
+MarkerResolver = Callable[[Dict[str, Any]], Any]
+
+
+def resolve_markers(value: Any, resolve_marker: MarkerResolver) -> Any:
+  # Containers without markers are kept as they are, since they can be objects that references resolved to
+  if isinstance(value, list):
+    items = [resolve_markers(item, resolve_marker) for item in value]
+    if any(item is not original for item, original in zip(items, value)):
+      return items
+
+    return value
+
+  if isinstance(value, dict):
+    children = {key: resolve_markers(child, resolve_marker) for key, child in value.items()}
+    if any(children[key] is not child for key, child in value.items()):
+      value = children
+
+    # Gets every dict once its children are resolved and returns it as it is unless it is a marker
+    return resolve_marker(value)
+
+  return value
@@ -0,0 +1,252 @@
+import bisect
+import threading
+import time
+import weakref
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0, 2500.0, 5000.0, 10000.0)
+SIZE_BUCKETS_BYTES = (64, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+HISTOGRAM_NAMES = ("queue_wait_ms", "execution_ms", "serialize_ms", "bytes_in", "bytes_out")
+UNKNOWN_COMMAND = "unknown"
+
+
+def escape_label(value: Any) -> str:
+  return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+  def __init__(self, buckets: Sequence[float]) -> None:
+    self.buckets: List[float] = list(buckets)
+    # The last count is for values above the largest bucket
+    self.counts: List[int] = [0] * (len(self.buckets) + 1)
+    self.count: int = 0
+    self.sum: float = 0.0
+    self.max: float = 0.0
+
+  def observe(self, value: float) -> None:
+    self.counts[bisect.bisect_left(self.buckets, value)] += 1
+    self.count += 1
+    self.sum += value
+    if value > self.max:
+      self.max = value
+
+  def percentile(self, fraction: float) -> float:
+    if self.count == 0:
+      return 0.0
+
+    # Reports the upper bound of the bucket holding the percentile, so it is never lower than the real value
+    rank = fraction * self.count
+    seen = 0
+    for index, bucket_count in enumerate(self.counts):
+      seen += bucket_count
+      if seen >= rank:
+        return self.buckets[index] if index < len(self.buckets) else self.max
+
+    return self.max
+
+  def snapshot(self) -> Dict[str, Any]:
+    return {
+      "count": self.count,
+      "sum": self.sum,
+      "max": self.max,
+      "p50": self.percentile(0.5),
+      "p90": self.percentile(0.9),
+      "p99": self.percentile(0.99),
+      "buckets": list(self.buckets),
+      "counts": list(self.counts)
+    }
+
+
+class CommandMetrics:
+  def __init__(self) -> None:
+    self.count: int = 0
+    self.errors: int = 0
+    self.histograms: Dict[str, Histogram] = {
+      name: Histogram(SIZE_BUCKETS_BYTES if name.startswith("bytes") else LATENCY_BUCKETS_MS)
+      for name in HISTOGRAM_NAMES
+    }
+
+  def snapshot(self) -> Dict[str, Any]:
+    snapshot: Dict[str, Any] = {"count": self.count, "errors": self.errors}
+    for name, histogram in self.histograms.items():
+      snapshot[name] = histogram.snapshot()
+
+    return snapshot
+
+
+class CommandTiming:
+  def __init__(self, command: str) -> None:
+    self.command: str = command
+    self.started_at: float = time.perf_counter()
+    self.serialize_seconds: float = 0.0
+
+
+class MetricsRegistry:
+  def __init__(self) -> None:
+    self.commands: Dict[str, CommandMetrics] = {}
+    self.in_flight_commands: int = 0
+    self.outgoing_callbacks: int = 0
+    self.callbacks_sent: int = 0
+    self.callbacks_waiting: int = 0
+    self.callbacks_timed_out: int = 0
+    self.callbacks_cancelled: int = 0
+    self.callbacks_without_reply: int = 0
+    self.callback_frames_without_reply: int = 0
+    self.connections: int = 0
+    self.coalesced_frames: int = 0
+    self.coalesced_responses: int = 0
+    self.started_at: float = time.time()
+    self.gauges: Dict[str, Callable[[], Any]] = {}
+    self.reference_registries: "weakref.WeakSet[Any]" = weakref.WeakSet()
+    self._lock = threading.Lock()
+
+  def command_metrics(self, command: str) -> CommandMetrics:
+    command_metrics = self.commands.get(command)
+    if command_metrics is None:
+      command_metrics = self.commands.setdefault(command, CommandMetrics())
+
+    return command_metrics
+
+  def observe(self, command: str, name: str, value: float) -> None:
+    command_metrics = self.command_metrics(command)
+
+    with self._lock:
+      command_metrics.histograms[name].observe(value)
+
+  def command_started(self, command: str, received_at: Optional[float] = None) -> CommandTiming:
+    timing = CommandTiming(command)
+
+    with self._lock:
+      self.in_flight_commands += 1
+
+    if received_at is not None:
+      self.observe(command, "queue_wait_ms", (timing.started_at - received_at) * 1000)
+
+    return timing
+
+  def command_finished(self, timing: CommandTiming, failed: bool) -> None:
+    command_metrics = self.command_metrics(timing.command)
+    elapsed = time.perf_counter() - timing.started_at
+
+    with self._lock:
+      self.in_flight_commands -= 1
+      command_metrics.count += 1
+      if failed:
+        command_metrics.errors += 1
+
+      command_metrics.histograms["execution_ms"].observe(max(0.0, elapsed - timing.serialize_seconds) * 1000)
+
+  def add_outgoing_callbacks(self, amount: int) -> None:
+    with self._lock:
+      self.outgoing_callbacks += amount
+      if amount > 0:
+        self.callbacks_sent += amount
+
+  def add_waiting_callbacks(self, amount: int) -> None:
+    with self._lock:
+      self.callbacks_waiting += amount
+
+  def record_callback_timeout(self) -> None:
+    with self._lock:
+      self.callbacks_timed_out += 1
+
+  def record_callbacks_cancelled(self, amount: int) -> None:
+    with self._lock:
+      self.callbacks_cancelled += amount
+
+  def record_callbacks_without_reply(self, calls: int) -> None:
+    with self._lock:
+      self.callbacks_without_reply += calls
+      self.callback_frames_without_reply += 1
+
+  def record_coalesced_frame(self, responses: int) -> None:
+    with self._lock:
+      self.coalesced_frames += 1
+      self.coalesced_responses += responses
+
+  def add_connections(self, amount: int) -> None:
+    with self._lock:
+      self.connections += amount
+
+  def track_references(self, reference_registry: Any) -> None:
+    self.reference_registries.add(reference_registry)
+
+  def register_gauge(self, name: str, read: Callable[[], Any]) -> None:
+    self.gauges[name] = read
+
+  def snapshot(self) -> Dict[str, Any]:
+    with self._lock:
+      commands = {command: command_metrics.snapshot() for command, command_metrics in self.commands.items()}
+      snapshot: Dict[str, Any] = {
+        "uptime_seconds": time.time() - self.started_at,
+        "connections": self.connections,
+        "in_flight_commands": self.in_flight_commands,
+        "live_references": sum(len(registry) for registry in list(self.reference_registries)),
+        "outgoing_callbacks": self.outgoing_callbacks,
+        "callbacks_sent": self.callbacks_sent,
+        "callbacks_waiting": self.callbacks_waiting,
+        "callbacks_timed_out": self.callbacks_timed_out,
+        "callbacks_cancelled": self.callbacks_cancelled,
+        "callbacks_without_reply": self.callbacks_without_reply,
+        "callback_frames_without_reply": self.callback_frames_without_reply,
+        "coalescing": {
+          "frames": self.coalesced_frames,
+          "responses": self.coalesced_responses,
+          # Average responses per frame sent by connections that coalesce
+          "ratio": self.coalesced_responses / self.coalesced_frames if self.coalesced_frames else 0.0
+        },
+        "commands": commands
+      }
+
+    for name, read in list(self.gauges.items()):
+      snapshot[name] = read()
+
+    return snapshot
+
+  def render_text(self) -> str:
+    snapshot = self.snapshot()
+    lines = [
+      f"scoundrel_uptime_seconds {snapshot['uptime_seconds']:.3f}",
+      f"scoundrel_connections {snapshot['connections']}",
+      f"scoundrel_in_flight_commands {snapshot['in_flight_commands']}",
+      f"scoundrel_live_references {snapshot['live_references']}",
+      f"scoundrel_outgoing_callbacks {snapshot['outgoing_callbacks']}",
+      f"scoundrel_callbacks_sent_total {snapshot['callbacks_sent']}",
+      f"scoundrel_callbacks_waiting {snapshot['callbacks_waiting']}",
+      f"scoundrel_callbacks_timed_out_total {snapshot['callbacks_timed_out']}",
+      f"scoundrel_callbacks_cancelled_total {snapshot['callbacks_cancelled']}",
+      f"scoundrel_callbacks_without_reply_total {snapshot['callbacks_without_reply']}",
+      f"scoundrel_callback_frames_without_reply_total {snapshot['callback_frames_without_reply']}",
+      f"scoundrel_coalesced_frames_total {snapshot['coalescing']['frames']}",
+      f"scoundrel_coalesced_responses_total {snapshot['coalescing']['responses']}",
+      f"scoundrel_coalescing_ratio {snapshot['coalescing']['ratio']}"
+    ]
+
+    for name in self.gauges:
+      value = snapshot[name]
+      if isinstance(value, dict):
+        lines.extend(
+          f"scoundrel_{name}_{key} {child}"
+          for key, child in value.items()
+          if isinstance(child, (int, float)) and not isinstance(child, bool)
+        )
+      elif isinstance(value, (int, float)):
+        lines.append(f"scoundrel_{name} {value}")
+
+    for command, command_snapshot in sorted(snapshot["commands"].items(), key=lambda item: str(item[0])):
+      label = f'command="{escape_label(command)}"'
+      lines.append(f"scoundrel_commands_total{{{label}}} {command_snapshot['count']}")
+      lines.append(f"scoundrel_command_errors_total{{{label}}} {command_snapshot['errors']}")
+
+      for name in HISTOGRAM_NAMES:
+        histogram = command_snapshot[name]
+        cumulative = 0
+        for bucket, bucket_count in zip(histogram["buckets"], histogram["counts"]):
+          cumulative += bucket_count
+          lines.append(f'scoundrel_command_{name}_bucket{{{label},le="{bucket}"}} {cumulative}')
+
+        lines.append(f'scoundrel_command_{name}_bucket{{{label},le="+Inf"}} {histogram["count"]}')
+        lines.append(f"scoundrel_command_{name}_sum{{{label}}} {histogram['sum']}")
+        lines.append(f"scoundrel_command_{name}_count{{{label}}} {histogram['count']}")
+
+    return "\n".join(lines) + "\n"
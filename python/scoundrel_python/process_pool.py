@@ -0,0 +1,314 @@
+import collections
+import importlib
+import itertools
+import multiprocessing
+import os
+import pickle
+import threading
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from . import attribute_reads
+from .class_resolver import ClassResolver
+from .scoundrel_json import dumps as scoundrel_json_dumps
+
+
+REMOTE_CHUNK_SIZE = 100
+
+
+class WorkerReference:
+  def __init__(self, object_id: int) -> None:
+    self.object_id: int = object_id
+
+
+class RemoteObject:
+  def __init__(self, worker: "ProcessWorker", object_id: int) -> None:
+    self.worker: "ProcessWorker" = worker
+    self.object_id: int = object_id
+
+  def call(self, method_name: str, args: List[Any], keep: bool = False) -> Any:
+    return self.worker.request("call", self.object_id, method_name, args, keep)
+
+  def read(self, attribute_name: Any, keep: bool = False) -> Any:
+    return self.worker.request("read", self.object_id, attribute_name, keep)
+
+  def item(self, key: Any, keep: bool = False) -> Any:
+    return self.worker.request("item", self.object_id, key, keep)
+
+  def items(
+    self,
+    keys: Any,
+    item_slice: Optional[slice],
+    attribute_name: Any = None,
+    keep: bool = False
+  ) -> Optional[attribute_reads.Items]:
+    items = self.worker.request("items", self.object_id, keys, item_slice, attribute_name, keep)
+    if items is None:
+      return None
+
+    item_keys, values, length = items
+    if keep:
+      values = [RemoteObject(self.worker, object_id) for object_id in values]
+
+    return item_keys, values, length
+
+  def __iter__(self) -> Iterator[Any]:
+    # Opened right away so a value that isn't iterable fails here and not on the first read
+    return self._iterate(self.worker.request("iterate", self.object_id))
+
+  def _iterate(self, iterator: "RemoteObject") -> Iterator[Any]:
+    while True:
+      items = self.worker.request("next", iterator.object_id, REMOTE_CHUNK_SIZE)
+      yield from items
+
+      if len(items) < REMOTE_CHUNK_SIZE:
+        return
+
+  def fetch(self) -> Any:
+    return self.worker.request("fetch", self.object_id)
+
+  def serialize(self) -> str:
+    return self.worker.request("serialize", self.object_id)
+
+  def __del__(self) -> None:
+    # Sent along with the next request to the worker, since this can run in any thread
+    self.worker.pending_releases.append(self.object_id)
+
+  def __repr__(self) -> str:
+    return f"<RemoteObject {self.object_id} in process {self.worker.pid}>"
+
+
+class ProcessWorker:
+  def __init__(self, context: Any, index: int) -> None:
+    parent_connection, child_connection = context.Pipe()
+
+    self.index: int = index
+    self.process: Any = context.Process(
+      target=_worker_main,
+      args=(child_connection,),
+      name=f"scoundrel-process-{index}",
+      daemon=True
+    )
+    self.process.start()
+    child_connection.close()
+
+    self.connection: Any = parent_connection
+    self.pending_releases: Deque[int] = collections.deque()
+    self._lock = threading.Lock()
+
+  @property
+  def pid(self) -> Optional[int]:
+    return self.process.pid
+
+  def request(self, operation: str, *args: Any) -> Any:
+    with self._lock:
+      releases = self.take_pending_releases()
+      message = (operation, tuple(self.prepare_value(arg) for arg in args), releases)
+
+      try:
+        self.connection.send(message)
+      except (pickle.PicklingError, TypeError, AttributeError) as error:
+        self.pending_releases.extend(releases)
+        raise TypeError(f"Can't send arguments to worker process {self.pid}: {error}") from None
+      except OSError:
+        raise RuntimeError(f"Worker process {self.pid} exited") from None
+
+      try:
+        status, value = self.connection.recv()
+      except (EOFError, OSError):
+        raise RuntimeError(f"Worker process {self.pid} exited") from None
+
+    if status == "error":
+      raise value
+
+    if status == "reference":
+      return RemoteObject(self, value)
+
+    return value
+
+  def take_pending_releases(self) -> List[int]:
+    releases = []
+
+    while self.pending_releases:
+      releases.append(self.pending_releases.popleft())
+
+    return releases
+
+  def prepare_value(self, value: Any) -> Any:
+    if isinstance(value, RemoteObject):
+      if value.worker is not self:
+        raise ValueError("Objects from different worker processes can't be passed to each other")
+
+      return WorkerReference(value.object_id)
+
+    if isinstance(value, list):
+      return [self.prepare_value(item) for item in value]
+
+    if isinstance(value, tuple):
+      return tuple(self.prepare_value(item) for item in value)
+
+    if isinstance(value, dict):
+      return {key: self.prepare_value(item) for key, item in value.items()}
+
+    return value
+
+  def shutdown(self) -> None:
+    with self._lock:
+      try:
+        self.connection.send(None)
+      except OSError:
+        pass
+
+      self.connection.close()
+
+    self.process.join(timeout=5)
+    if self.process.is_alive():
+      self.process.terminate()
+      self.process.join()
+
+
+class ProcessPool:
+  def __init__(self, targets: Iterable[str], processes: Optional[int] = None) -> None:
+    self.targets: List[str] = [target for target in targets if target]
+    self.processes: int = processes or os.cpu_count() or 1
+    self.workers: List[ProcessWorker] = []
+    self._next_worker = itertools.count()
+    self._lock = threading.Lock()
+    # Spawned workers start from a clean interpreter instead of copying the server's threads and sockets
+    self._context = multiprocessing.get_context("spawn")
+
+  def matches(self, name: str) -> bool:
+    return any(name == target or name.startswith(f"{target}.") for target in self.targets)
+
+  def create(self, class_name: str, args: List[Any]) -> RemoteObject:
+    return self.next_worker().request("new", class_name, args)
+
+  def import_module(self, import_name: str) -> RemoteObject:
+    return self.next_worker().request("import", import_name)
+
+  def next_worker(self) -> ProcessWorker:
+    with self._lock:
+      if len(self.workers) < self.processes:
+        worker = ProcessWorker(self._context, len(self.workers))
+        self.workers.append(worker)
+        return worker
+
+      return self.workers[next(self._next_worker) % len(self.workers)]
+
+  def stats(self) -> Dict[str, Any]:
+    return {"processes": self.processes, "started": len(self.workers), "pids": [worker.pid for worker in self.workers]}
+
+  def shutdown(self) -> None:
+    with self._lock:
+      workers = self.workers
+      self.workers = []
+
+    for worker in workers:
+      worker.shutdown()
+
+
+class _WorkerState:
+  def __init__(self) -> None:
+    self.objects: Dict[int, Any] = {}
+    self.objects_count = itertools.count(1)
+    self.class_resolver = ClassResolver()
+
+  def handle(self, operation: str, args: Tuple[Any, ...]) -> Tuple[str, Any]:
+    if operation == "new":
+      class_name, class_args = args
+      return self.keep(self.class_resolver.resolve(class_name)(*self.resolve_value(class_args)))
+
+    if operation == "import":
+      return self.keep(importlib.import_module(args[0]))
+
+    if operation == "call":
+      object_id, method_name, method_args, keep = args
+      result = getattr(self.objects[object_id], method_name)(*self.resolve_value(method_args))
+      return self.keep(result) if keep else ("value", result)
+
+    if operation == "read":
+      object_id, attribute_name, keep = args
+      result = attribute_reads.read_attribute_value(self.objects[object_id], attribute_name)
+      return self.keep(result) if keep else ("value", result)
+
+    if operation == "items":
+      object_id, keys, item_slice, attribute_name, keep = args
+      items = attribute_reads.read_items(self.objects[object_id], keys, item_slice, attribute_name)
+      if items is None:
+        return "value", None
+
+      item_keys, values, length = items
+      if keep:
+        values = [self.keep(value)[1] for value in values]
+
+      return "value", (item_keys, values, length)
+
+    if operation == "iterate":
+      return self.keep(iter(self.objects[args[0]]))
+
+    if operation == "next":
+      object_id, size = args
+      return "value", list(itertools.islice(self.objects[object_id], size))
+
+    if operation == "item":
+      object_id, key, keep = args
+      result = self.objects[object_id][key]
+      return self.keep(result) if keep else ("value", result)
+
+    if operation == "fetch":
+      return "value", self.objects[args[0]]
+
+    if operation == "serialize":
+      return "value", scoundrel_json_dumps(self.objects[args[0]])
+
+    raise ValueError(f"Unknown worker operation {operation}")
+
+  def keep(self, value: Any) -> Tuple[str, int]:
+    object_id = next(self.objects_count)
+    self.objects[object_id] = value
+    return "reference", object_id
+
+  def resolve_value(self, value: Any) -> Any:
+    if isinstance(value, WorkerReference):
+      return self.objects[value.object_id]
+
+    if isinstance(value, list):
+      return [self.resolve_value(item) for item in value]
+
+    if isinstance(value, tuple):
+      return tuple(self.resolve_value(item) for item in value)
+
+    if isinstance(value, dict):
+      return {key: self.resolve_value(item) for key, item in value.items()}
+
+    return value
+
+  def release(self, object_ids: List[int]) -> None:
+    for object_id in object_ids:
+      self.objects.pop(object_id, None)
+
+
+def _worker_main(connection: Any) -> None:
+  state = _WorkerState()
+
+  while True:
+    try:
+      message = connection.recv()
+    except (EOFError, KeyboardInterrupt):
+      return
+
+    if message is None:
+      return
+
+    operation, args, releases = message
+    state.release(releases)
+
+    try:
+      response = state.handle(operation, args)
+    except Exception as error:
+      response = ("error", error)
+
+    try:
+      connection.send(response)
+    except Exception as error:
+      # Results and errors that can't be pickled are reported instead of hanging the caller
+      connection.send(("error", TypeError(f"Can't send {type(response[1]).__name__} back from the worker process: {error}")))
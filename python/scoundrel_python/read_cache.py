@@ -0,0 +1,113 @@
+import collections
+import threading
+import time
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+CacheKey = Tuple[int, Hashable, str]
+
+
+class ReadCache:
+  def __init__(self, maxsize: int = 0, ttl: Optional[float] = None) -> None:
+    self.maxsize: int = maxsize
+    self.ttl: Optional[float] = ttl
+    self.hits: int = 0
+    self.misses: int = 0
+    self.evictions: int = 0
+    self.invalidations: int = 0
+    self.immutable_ids: Set[int] = set()
+    # Values are (payload, expires_at), where immutable references never expire
+    self._entries: "collections.OrderedDict[CacheKey, Tuple[Dict[str, Any], Optional[float]]]" = collections.OrderedDict()
+    # Keys by the reference that was read
+    self._keys_by_id: Dict[int, Set[CacheKey]] = {}
+    self._lock = threading.Lock()
+
+  @property
+  def enabled(self) -> bool:
+    return self.maxsize > 0
+
+  def should_cache(self, reference_id: int, requested: bool) -> bool:
+    return self.enabled and (requested or reference_id in self.immutable_ids)
+
+  def get(self, key: CacheKey) -> Optional[Dict[str, Any]]:
+    with self._lock:
+      entry = self._entries.get(key)
+
+      if entry is None:
+        self.misses += 1
+        return None
+
+      payload, expires_at = entry
+      if expires_at is not None and expires_at <= time.monotonic():
+        self._remove(key)
+        self.misses += 1
+        return None
+
+      self._entries.move_to_end(key)
+      self.hits += 1
+
+      # Callers get their own copy, since sending a payload can rewrite it
+      return dict(payload)
+
+  def put(self, key: CacheKey, payload: Dict[str, Any]) -> None:
+    reference_id = key[0]
+    expires_at = None
+    if self.ttl is not None and reference_id not in self.immutable_ids:
+      expires_at = time.monotonic() + self.ttl
+
+    with self._lock:
+      if key in self._entries:
+        self._remove(key)
+
+      self._entries[key] = (dict(payload), expires_at)
+      self._keys_by_id.setdefault(reference_id, set()).add(key)
+
+      while len(self._entries) > self.maxsize:
+        oldest_key = next(iter(self._entries))
+        self._remove(oldest_key)
+        self.evictions += 1
+
+  def invalidate(self, reference_id: int) -> None:
+    with self._lock:
+      keys = self._keys_by_id.pop(reference_id, None)
+      if not keys:
+        return
+
+      for key in list(keys):
+        self._remove(key)
+
+      self.invalidations += 1
+
+  def release(self, reference_id: int) -> None:
+    self.immutable_ids.discard(reference_id)
+    self.invalidate(reference_id)
+
+  def mark_immutable(self, reference_id: int) -> None:
+    self.immutable_ids.add(reference_id)
+
+  def clear(self) -> None:
+    with self._lock:
+      self._entries.clear()
+      self._keys_by_id.clear()
+      self.immutable_ids.clear()
+
+  def stats(self) -> Dict[str, Any]:
+    return {
+      "enabled": self.enabled,
+      "size": len(self._entries),
+      "maxsize": self.maxsize,
+      "ttl": self.ttl,
+      "hits": self.hits,
+      "misses": self.misses,
+      "evictions": self.evictions,
+      "invalidations": self.invalidations,
+      "immutable_references": len(self.immutable_ids)
+    }
+
+  def _remove(self, key: CacheKey) -> None:
+    del self._entries[key]
+
+    keys = self._keys_by_id.get(key[0])
+    if keys is not None:
+      keys.discard(key)
+      if not keys:
+        del self._keys_by_id[key[0]]
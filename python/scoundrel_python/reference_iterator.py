@@ -0,0 +1,83 @@
+import concurrent.futures
+import itertools
+import threading
+from typing import Any, Iterator, List, Optional, Tuple
+
+Chunk = Tuple[List[Any], bool]
+
+
+def validate_chunk_size(chunk_size: Any) -> int:
+  if not isinstance(chunk_size, int) or chunk_size < 1:
+    raise ValueError(f"Chunk size must be a positive integer, got {chunk_size}")
+
+  return chunk_size
+
+
+class ReferenceIterator:
+  def __init__(self, iterable: Any, chunk_size: int, executor: concurrent.futures.Executor) -> None:
+    self.iterator: Iterator[Any] = iter(iterable)
+    self.chunk_size: int = validate_chunk_size(chunk_size)
+    self.executor: concurrent.futures.Executor = executor
+    self.done: bool = False
+    self.closed: bool = False
+    self._lock = threading.Lock()
+    self._prefetched: Optional[concurrent.futures.Future] = None
+
+  def prefetch(self) -> None:
+    with self._lock:
+      self._prefetch_locked()
+
+  def next_chunk(self, chunk_size: Optional[int] = None) -> Chunk:
+    with self._lock:
+      if self.closed:
+        raise ValueError("Iterator is closed")
+
+      if chunk_size is not None:
+        # Takes effect from the next read, since the current chunk may already be prefetched
+        self.chunk_size = validate_chunk_size(chunk_size)
+
+      if self._prefetched is None:
+        items, done = self._read_chunk(self.chunk_size)
+      else:
+        items, done = self._take_prefetched()
+
+      self.done = done
+      if not done:
+        self._prefetch_locked()
+
+      return items, done
+
+  def close(self) -> None:
+    with self._lock:
+      if self.closed:
+        return
+
+      self.closed = True
+      prefetched = self._prefetched
+      self._prefetched = None
+
+    if prefetched is not None and not prefetched.cancel():
+      # Let a running prefetch finish so the iterator isn't closed while it is being read
+      concurrent.futures.wait([prefetched])
+
+    close = getattr(self.iterator, "close", None)
+    if callable(close):
+      close()
+
+  def _prefetch_locked(self) -> None:
+    if self._prefetched is None and not self.done and not self.closed:
+      self._prefetched = self.executor.submit(self._read_chunk, self.chunk_size)
+
+  def _take_prefetched(self) -> Chunk:
+    prefetched = self._prefetched
+    self._prefetched = None
+
+    assert prefetched is not None
+    items, done = prefetched.result()
+
+    return list(items), done
+
+  def _read_chunk(self, size: int) -> Chunk:
+    items = list(itertools.islice(self.iterator, size))
+
+    return items, len(items) < size
@@ -0,0 +1,247 @@
+import sys
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+SLOT_BITS = 32
+SLOT_MASK = (1 << SLOT_BITS) - 1
+# Keeps IDs below 2 ** 53 so JavaScript clients can hold them as plain numbers
+MAX_GENERATION = (1 << 21) - 1
+
+_EMPTY = object()
+
+
+class UnknownReferenceError(KeyError):
+  def __str__(self) -> str:
+    return str(self.args[0])
+
+
+class StaleReferenceError(UnknownReferenceError):
+  pass
+
+
+def encode_reference_id(slot: int, generation: int) -> int:
+  return (generation << SLOT_BITS) | slot
+
+
+def decode_reference_id(reference_id: int) -> Tuple[int, int]:
+  return reference_id & SLOT_MASK, reference_id >> SLOT_BITS
+
+
+class ReferenceRegistry:
+  def __init__(self) -> None:
+    # Slot 0 is never used so the first IDs are 1, 2, 3 like before slots were reused
+    self._values: List[Any] = [_EMPTY]
+    self._generations: List[int] = [0]
+    self._free_slots: List[int] = []
+    self._slot_scopes: Dict[int, Hashable] = {}
+    self._scopes: Dict[Hashable, Set[int]] = {}
+    self._lock = threading.Lock()
+    self.live_count: int = 0
+    self.spawned_count: int = 0
+    self.released_count: int = 0
+    self.retired_slots: int = 0
+    self.stale_lookups: int = 0
+    # Called with each released reference ID while the registry lock is held
+    self.on_release: Optional[Callable[[int], None]] = None
+
+  def spawn(self, value: Any, scope: Optional[Hashable] = None) -> int:
+    with self._lock:
+      if self._free_slots:
+        slot = self._free_slots.pop()
+      else:
+        slot = len(self._values)
+        self._values.append(_EMPTY)
+        self._generations.append(0)
+
+      self._values[slot] = value
+      self.live_count += 1
+      self.spawned_count += 1
+
+      if scope is not None:
+        self._tag_slot(slot, scope)
+
+      return encode_reference_id(slot, self._generations[slot])
+
+  def get(self, reference_id: Any, default: Any = None) -> Any:
+    slot = self._live_slot(reference_id)
+    if slot is None:
+      return default
+
+    return self._values[slot]
+
+  def __getitem__(self, reference_id: Any) -> Any:
+    slot = self._live_slot(reference_id)
+    if slot is None:
+      if self._is_stale(reference_id):
+        self.stale_lookups += 1
+        raise StaleReferenceError(f"Stale reference ID {reference_id} was released")
+
+      raise UnknownReferenceError(f"Unknown reference ID {reference_id}")
+
+    return self._values[slot]
+
+  def __setitem__(self, reference_id: int, value: Any) -> None:
+    slot, generation = decode_reference_id(reference_id)
+
+    with self._lock:
+      while len(self._values) <= slot:
+        self._free_slots.append(len(self._values))
+        self._values.append(_EMPTY)
+        self._generations.append(0)
+
+      if self._values[slot] is _EMPTY:
+        self.live_count += 1
+        self.spawned_count += 1
+        if slot in self._free_slots:
+          self._free_slots.remove(slot)
+
+      self._values[slot] = value
+      self._generations[slot] = generation
+
+  def __delitem__(self, reference_id: int) -> None:
+    if not self.release(reference_id):
+      raise UnknownReferenceError(f"Unknown reference ID {reference_id}")
+
+  def __contains__(self, reference_id: Any) -> bool:
+    return self._live_slot(reference_id) is not None
+
+  def __len__(self) -> int:
+    return self.live_count
+
+  def __iter__(self) -> Iterator[int]:
+    return iter(self.ids())
+
+  def ids(self) -> List[int]:
+    with self._lock:
+      return [
+        encode_reference_id(slot, self._generations[slot])
+        for slot, value in enumerate(self._values)
+        if value is not _EMPTY
+      ]
+
+  def items(self) -> List[Tuple[int, Any]]:
+    with self._lock:
+      return [
+        (encode_reference_id(slot, self._generations[slot]), value)
+        for slot, value in enumerate(self._values)
+        if value is not _EMPTY
+      ]
+
+  def release(self, reference_id: Any) -> bool:
+    with self._lock:
+      slot = self._live_slot(reference_id)
+      if slot is None:
+        return False
+
+      self._free_slot(slot)
+      return True
+
+  def release_many(self, reference_ids: Iterable[Any]) -> int:
+    released = 0
+
+    with self._lock:
+      for reference_id in reference_ids:
+        slot = self._live_slot(reference_id)
+        if slot is not None:
+          self._free_slot(slot)
+          released += 1
+
+    return released
+
+  def release_scope(self, scope: Hashable) -> int:
+    with self._lock:
+      slots = self._scopes.pop(scope, set())
+
+      for slot in slots:
+        del self._slot_scopes[slot]
+        self._free_slot(slot, untag=False)
+
+      return len(slots)
+
+  def tag(self, reference_id: int, scope: Hashable) -> None:
+    with self._lock:
+      slot = self._live_slot(reference_id)
+      if slot is None:
+        raise UnknownReferenceError(f"Unknown reference ID {reference_id}")
+
+      self._untag_slot(slot)
+      self._tag_slot(slot, scope)
+
+  def scope_size(self, scope: Hashable) -> int:
+    return len(self._scopes.get(scope, ()))
+
+  def clear(self) -> None:
+    with self._lock:
+      for slot, value in enumerate(self._values):
+        if value is not _EMPTY:
+          self._free_slot(slot, untag=False)
+
+      self._slot_scopes.clear()
+      self._scopes.clear()
+
+  def stats(self) -> Dict[str, Any]:
+    values = [value for value in list(self._values) if value is not _EMPTY]
+
+    return {
+      "live": self.live_count,
+      "slots": len(self._values) - 1,
+      "free_slots": len(self._free_slots),
+      "retired_slots": self.retired_slots,
+      "spawned": self.spawned_count,
+      "released": self.released_count,
+      "stale_lookups": self.stale_lookups,
+      "scopes": len(self._scopes),
+      # Shallow sizes of the referenced objects, which is only a rough estimate of what they keep alive
+      "retained_bytes": sum(sys.getsizeof(value) for value in values)
+    }
+
+  def _live_slot(self, reference_id: Any) -> Optional[int]:
+    if not isinstance(reference_id, int) or isinstance(reference_id, bool) or reference_id <= 0:
+      return None
+
+    slot, generation = decode_reference_id(reference_id)
+    if slot >= len(self._values) or self._generations[slot] != generation or self._values[slot] is _EMPTY:
+      return None
+
+    return slot
+
+  def _is_stale(self, reference_id: Any) -> bool:
+    if not isinstance(reference_id, int) or reference_id <= 0:
+      return False
+
+    slot, generation = decode_reference_id(reference_id)
+    return slot < len(self._values) and (generation < self._generations[slot] or self._values[slot] is _EMPTY)
+
+  def _free_slot(self, slot: int, untag: bool = True) -> None:
+    if untag:
+      self._untag_slot(slot)
+
+    if self.on_release is not None:
+      self.on_release(encode_reference_id(slot, self._generations[slot]))
+
+    self._values[slot] = _EMPTY
+    self.live_count -= 1
+    self.released_count += 1
+
+    if self._generations[slot] >= MAX_GENERATION:
+      # Out of generations, so the slot is never handed out again instead of repeating old IDs
+      self.retired_slots += 1
+      return
+
+    self._generations[slot] += 1
+    self._free_slots.append(slot)
+
+  def _tag_slot(self, slot: int, scope: Hashable) -> None:
+    self._slot_scopes[slot] = scope
+    self._scopes.setdefault(scope, set()).add(slot)
+
+  def _untag_slot(self, slot: int) -> None:
+    scope = self._slot_scopes.pop(slot, None)
+    if scope is None:
+      return
+
+    slots = self._scopes.get(scope)
+    if slots is not None:
+      slots.discard(slot)
+      if not slots:
+        del self._scopes[scope]
@@ -0,0 +1,81 @@
+import asyncio
+from typing import Any, Awaitable, Callable, List, Optional, Sequence
+
+DEFAULT_WINDOW = 0.001
+DEFAULT_MAX_MESSAGES = 64
+
+
+class ResponseCoalescer:
+  def __init__(
+    self,
+    send: Callable[[Sequence[Any]], Awaitable[None]],
+    join: Callable[[Sequence[Any]], Any],
+    window: float = DEFAULT_WINDOW,
+    max_messages: int = DEFAULT_MAX_MESSAGES,
+    on_flush: Optional[Callable[[int], None]] = None,
+    on_error: Optional[Callable[[Exception], None]] = None
+  ) -> None:
+    self.send: Callable[[Sequence[Any]], Awaitable[None]] = send
+    self.join: Callable[[Sequence[Any]], Any] = join
+    self.window: float = window
+    self.max_messages: int = max_messages
+    self.on_flush: Optional[Callable[[int], None]] = on_flush
+    self.on_error: Optional[Callable[[Exception], None]] = on_error
+    self.pending: List[Any] = []
+    # Commands that were dispatched and haven't responded yet, which is what makes waiting worthwhile
+    self.outstanding: int = 0
+    self._timer: Optional[asyncio.TimerHandle] = None
+
+  def command_dispatched(self) -> None:
+    self.outstanding += 1
+
+  async def add(self, frame: Any) -> None:
+    self.pending.append(frame)
+    self.outstanding = max(0, self.outstanding - 1)
+
+    # A lone call is sent right away, so coalescing only delays responses while more are on their way
+    if self.outstanding == 0 or len(self.pending) >= self.max_messages:
+      await self.flush()
+    elif self._timer is None:
+      self._timer = asyncio.get_running_loop().call_later(self.window, self._flush_later)
+
+  async def response_sent(self) -> None:
+    # Responses sent past the coalescer, like ones carrying buffers, still answer a dispatched command
+    self.outstanding = max(0, self.outstanding - 1)
+
+    if self.outstanding == 0:
+      await self.flush()
+
+  async def flush(self) -> None:
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+
+    if not self.pending:
+      return
+
+    frames = self.pending
+    self.pending = []
+
+    if self.on_flush is not None:
+      self.on_flush(len(frames))
+
+    await self.send([frames[0] if len(frames) == 1 else self.join(frames)])
+
+  def close(self) -> None:
+    if self._timer is not None:
+      self._timer.cancel()
+      self._timer = None
+
+    self.pending = []
+
+  def _flush_later(self) -> None:
+    self._timer = None
+    asyncio.ensure_future(self._flush_reporting_errors())
+
+  async def _flush_reporting_errors(self) -> None:
+    try:
+      await self.flush()
+    except Exception as error:
+      if self.on_error is not None:
+        self.on_error(error)
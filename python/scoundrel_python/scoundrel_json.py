@@ -5,10 +5,11 @@ import json
 import math
 import re
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type, Union
 
 TYPE_KEY = "__scoundrel_type__"
 VALUE_KEY = "value"
+JSON_NATIVE_TYPES = (dict, list, tuple, str, int, float)
 
 
 @dataclass(frozen=True)
@@ -17,9 +18,14 @@ class ScoundrelTypeHandler:
   can_serialize: Callable[[Any], bool]
   serialize: Callable[[Any], Dict[str, Any]]
   deserialize: Callable[[Dict[str, Any]], Any]
+  # Exact Python types handled without calling can_serialize
+  python_types: Tuple[Type[Any], ...] = ()
 
 
 _type_handlers: List[ScoundrelTypeHandler] = []
+_handlers_by_type_name: Dict[str, ScoundrelTypeHandler] = {}
+_handlers_by_python_type: Dict[type, ScoundrelTypeHandler | None] = {}
+_fast_path_enabled = True
 
 
 def register_scoundrel_type(handler: ScoundrelTypeHandler) -> None:
@@ -32,13 +38,47 @@ def register_scoundrel_type(handler: ScoundrelTypeHandler) -> None:
   else:
     _type_handlers[existing_index] = handler
 
+  _handlers_by_type_name[handler.type] = handler
+  _handlers_by_python_type.clear()
+
+  global _fast_path_enabled
+  _fast_path_enabled = _fast_path_supported()
+
 
 def _find_handler_for_value(value: Any) -> ScoundrelTypeHandler | None:
-  return next((handler for handler in _type_handlers if handler.can_serialize(value)), None)
+  value_type = type(value)
+
+  try:
+    return _handlers_by_python_type[value_type]
+  except KeyError:
+    pass
+
+  handler = _resolve_handler_for_value(value, value_type)
+  _handlers_by_python_type[value_type] = handler
+
+  return handler
+
+
+def _resolve_handler_for_value(value: Any, value_type: type) -> ScoundrelTypeHandler | None:
+  for handler in _type_handlers:
+    if value_type in handler.python_types:
+      return handler
+
+  # Subclasses such as pandas.Timestamp are handled like the closest declared base class
+  for base_type in value_type.__mro__[1:]:
+    for handler in _type_handlers:
+      if base_type in handler.python_types:
+        return handler
+
+  # Predicates are cached per concrete type, so they must decide on the type of the value alone
+  return next(
+    (handler for handler in _type_handlers if not handler.python_types and handler.can_serialize(value)),
+    None
+  )
 
 
 def _find_handler_for_type(type_name: str) -> ScoundrelTypeHandler | None:
-  return next((handler for handler in _type_handlers if handler.type == type_name), None)
+  return _handlers_by_type_name.get(type_name)
 
 
 def _ensure_serialized_object(handler: ScoundrelTypeHandler, payload: Any, path: str) -> Dict[str, Any]:
@@ -69,7 +109,10 @@ def _encode_value(value: Any, path: str, seen: Dict[int, str]) -> Any:
     if id(value) in seen:
       raise ValueError(f"Cannot serialize circular reference at {path}")
     seen[id(value)] = path
-    return [_encode_value(item, f"{path}[{index}]", seen) for index, item in enumerate(value)]
+    try:
+      return [_encode_value(item, f"{path}[{index}]", seen) for index, item in enumerate(value)]
+    finally:
+      del seen[id(value)]
 
   if isinstance(value, dict):
     return _encode_object(value, path, seen)
@@ -83,35 +126,70 @@ def _encode_object(value: Dict[str, Any], path: str, seen: Dict[int, str]) -> Di
   seen[id(value)] = path
 
   encoded: Dict[str, Any] = {}
-  for key, child in value.items():
-    key_str = str(key)
-    child_path = f"{path}.{key_str}"
-    encoded[key_str] = _encode_value(child, child_path, seen)
+  try:
+    for key, child in value.items():
+      key_str = str(key)
+      child_path = f"{path}.{key_str}"
+      encoded[key_str] = _encode_value(child, child_path, seen)
+  finally:
+    # Only ancestors count as circular, so shared values and recycled IDs of temporary dicts are fine
+    del seen[id(value)]
   return encoded
 
 
-def _decode_value(value: Any) -> Any:
-  if isinstance(value, list):
-    return [_decode_value(item) for item in value]
-
-  if isinstance(value, dict):
-    type_name = value.get(TYPE_KEY)
-    if isinstance(type_name, str):
-      handler = _find_handler_for_type(type_name)
-      if handler is not None:
-        return handler.deserialize(value)
-    return {key: _decode_value(child) for key, child in value.items()}
+def _decode_object(value: Dict[str, Any]) -> Any:
+  type_name = value.get(TYPE_KEY)
+  if isinstance(type_name, str):
+    handler = _find_handler_for_type(type_name)
+    if handler is not None:
+      return handler.deserialize(value)
 
   return value
 
 
-def dumps(value: Any) -> str:
+def _encode_default(value: Any) -> Dict[str, Any]:
+  handler = _find_handler_for_value(value)
+  if handler is None:
+    raise TypeError(f"Cannot serialize unsupported type {type(value).__name__}")
+
+  return _ensure_serialized_object(handler, handler.serialize(value), "value")
+
+
+_fast_encoder = json.JSONEncoder(allow_nan=False, default=_encode_default)
+
+
+def _fast_path_supported() -> bool:
+  # json encodes subclasses of its native types itself without calling default, so handlers that can match
+  # those need the full walk. Predicate-only handlers might match any of them, like an OrderedDict or a namedtuple
+  return all(
+    handler.python_types and not any(issubclass(python_type, JSON_NATIVE_TYPES) for python_type in handler.python_types)
+    for handler in _type_handlers
+  )
+
+
+def _native_subclasses_handled() -> bool:
+  return not _fast_path_enabled
+
+
+def _walk_dumps(value: Any) -> str:
   encoded = _encode_value(value, "value", {})
   return json.dumps(encoded)
 
 
-def loads(raw: str) -> Any:
-  return _decode_value(json.loads(raw))
+def dumps(value: Any) -> str:
+  if _fast_path_enabled:
+    try:
+      return _fast_encoder.encode(value)
+    except (TypeError, ValueError):
+      # Walk the value to build the error with its path, or to encode keys json doesn't accept
+      pass
+
+  return _walk_dumps(value)
+
+
+def loads(raw: Union[str, bytes, bytearray], object_hook: Optional[Callable[[Dict[str, Any]], Any]] = None) -> Any:
+  # Type tags are resolved while json builds each object, instead of rebuilding the decoded tree afterwards
+  return json.loads(raw, object_hook=object_hook or _decode_object)
 
 
 def _parse_iso_datetime(raw: str) -> dt.datetime:
@@ -157,7 +235,8 @@ register_scoundrel_type(
     type="date",
     can_serialize=lambda value: isinstance(value, dt.datetime),
     serialize=lambda value: {TYPE_KEY: "date", VALUE_KEY: _format_datetime(value)},
-    deserialize=lambda payload: _parse_iso_datetime(str(payload[VALUE_KEY]))
+    deserialize=lambda payload: _parse_iso_datetime(str(payload[VALUE_KEY])),
+    python_types=(dt.datetime,)
   )
 )
 
@@ -166,7 +245,8 @@ register_scoundrel_type(
     type="regex",
     can_serialize=lambda value: isinstance(value, re.Pattern),
     serialize=lambda value: {TYPE_KEY: "regex", VALUE_KEY: f"/{value.pattern}/{_regex_flags_from_pattern(value)}"},
-    deserialize=lambda payload: _deserialize_regex(payload)
+    deserialize=lambda payload: _deserialize_regex(payload),
+    python_types=(re.Pattern,)
   )
 )
 
@@ -1,15 +1,46 @@
 import argparse
 import asyncio
+import concurrent.futures
+import contextvars
+import functools
 import importlib
+import inspect
 import os
+import socket
 import threading
+import time
 import uuid
-from typing import Any, Awaitable, Callable, Dict, Optional, Sequence
+import weakref
+from typing import Any, Awaitable, Callable, Coroutine, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import websockets
-
+from websockets.exceptions import ConnectionClosed
+
+from . import attribute_reads
+from .async_executor import AsyncExecutor
+from .buffer_transfer import DEFAULT_FRAME_SIZE, BufferAssembler, OutgoingBuffer, resolve_buffer_markers
+from .callback_batch import DEFAULT_BATCH_INTERVAL, DEFAULT_BATCH_SIZE, CallbackBatch
+from .class_resolver import ClassResolver
+from .command_dispatcher import CommandDispatcher, parse_inline_commands
+from .decode_context import COMPACT_REFERENCE_KEY, DecodeContext
+from .logger import LOG_LEVELS, ScoundrelLogger
+from .marker_resolution import resolve_markers
+from .metrics import UNKNOWN_COMMAND, CommandTiming, MetricsRegistry
+from .process_pool import ProcessPool, RemoteObject
+from .read_cache import ReadCache
+from .reference_iterator import ReferenceIterator
+from .reference_registry import ReferenceRegistry
+from .response_coalescer import DEFAULT_MAX_MESSAGES, DEFAULT_WINDOW, ResponseCoalescer
 from .scoundrel_json import dumps as scoundrel_json_dumps
-from .scoundrel_json import loads as scoundrel_json_loads
+from .wire_codecs import IncrementalDecoder, JsonWireCodec, WireCodec, available_wire_codecs, negotiate_wire_codec
+from .worker_supervisor import WorkerSupervisor
+
+CURRENT_SCOPE: "contextvars.ContextVar[Optional[int]]" = contextvars.ContextVar("scoundrel_current_scope", default=None)
+CURRENT_TIMING: "contextvars.ContextVar[Optional[CommandTiming]]" = contextvars.ContextVar("scoundrel_current_timing", default=None)
+DEFAULT_MAX_OUTGOING_COMMANDS = 256
+DEFAULT_MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+FIRE_AND_FORGET = "fire_and_forget"
+BATCHED = "batched"
 
 class CallbackTarget:
   def __init__(self):
@@ -26,52 +57,347 @@ class CallbackTarget:
 
 
 class WebSocketClient:
-  def __init__(self, ws: Any, debug: Optional[Callable[[str], None]] = None) -> None:
+  def __init__(
+    self,
+    ws: Any,
+    debug: Optional[Callable[[str], None]] = None,
+    dispatcher: Optional[CommandDispatcher] = None,
+    codecs: Optional[Iterable[str]] = None,
+    buffer_frame_size: int = DEFAULT_FRAME_SIZE,
+    class_resolver: Optional[ClassResolver] = None,
+    async_executor: Optional[AsyncExecutor] = None,
+    max_async_calls: int = 64,
+    process_pool: Optional[ProcessPool] = None,
+    metrics: Optional[MetricsRegistry] = None,
+    logger: Optional[ScoundrelLogger] = None,
+    read_cache_size: int = 0,
+    read_cache_ttl: Optional[float] = None,
+    coalesce_window: float = DEFAULT_WINDOW,
+    coalesce_max_messages: int = DEFAULT_MAX_MESSAGES,
+    max_outgoing_commands: int = DEFAULT_MAX_OUTGOING_COMMANDS,
+    callback_timeout: Optional[float] = None,
+    max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE
+  ) -> None:
     self.ws: Any = ws
+    self.max_outgoing_commands: int = max_outgoing_commands
+    self.callback_timeout: Optional[float] = callback_timeout
+    # Also caps the binary buffers that follow a message, which are allocated before their frames arrive
+    self.max_message_size: int = max_message_size
+    # Created on the connection loop, which is where outgoing commands are sent from
+    self._outgoing_semaphore: Optional[asyncio.Semaphore] = None
+    self.outgoing_waiting: int = 0
+    self.closed: bool = False
+    # Flushed before responses, so batched callback calls arrive before the response of the command that made them
+    self.callback_batches: "weakref.WeakSet[CallbackBatch]" = weakref.WeakSet()
+    self.coalesce_window: float = coalesce_window
+    self.coalesce_max_messages: int = coalesce_max_messages
+    # Set up when the client asks for coalesced responses in its handshake
+    self.coalescer: Optional[ResponseCoalescer] = None
+    self.metrics: MetricsRegistry = metrics or MetricsRegistry()
+    self.process_pool: Optional[ProcessPool] = process_pool
+    self.owns_async_executor: bool = async_executor is None
+    self.async_executor: AsyncExecutor = async_executor or AsyncExecutor()
+    self.max_async_calls: int = max_async_calls
+    # Created on the shared async loop, which is the only place they are used
+    self._async_calls_semaphore: Optional[asyncio.Semaphore] = None
+    self._async_callbacks_semaphore: Optional[asyncio.Semaphore] = None
+    self.class_resolver: ClassResolver = class_resolver or ClassResolver(namespace=globals())
+    self.buffer_frame_size: int = buffer_frame_size
+    self._send_lock: Optional[asyncio.Lock] = None
+    self.json_codec: JsonWireCodec = JsonWireCodec()
+    self.codec: WireCodec = self.json_codec
+    self.allowed_codecs: Optional[List[str]] = list(codecs) if codecs is not None else None
     self.running: bool = True
-    self.objects: Dict[int, Any] = {}
-    self.objects_count: int = 0
-    self.instance_id: str = uuid.uuid4().hex
+    self.objects: ReferenceRegistry = ReferenceRegistry()
+    self.metrics.track_references(self.objects)
+    self.read_cache: ReadCache = ReadCache(maxsize=read_cache_size, ttl=read_cache_ttl)
+    if self.read_cache.enabled:
+      self.objects.on_release = self.read_cache.release
+    self.scopes: Dict[int, Optional[int]] = {}
+    self.scope_stack: List[int] = []
+    self.scopes_count: int = 0
+    self._scopes_lock = threading.Lock()
+    # Reference and function markers are resolved while messages are decoded
+    self.decode_context: DecodeContext = DecodeContext(self.objects, uuid.uuid4().hex, self.function_callback)
     self.loop: Optional[asyncio.AbstractEventLoop] = None
     self.outgoing_commands: Dict[int, asyncio.Future] = {}
     self.outgoing_commands_count: int = 0
-    self._debug: Callable[[str], None] = debug or self._default_debug
-    self._debug("WebSocketClient initialized")
-
-  @staticmethod
-  def _default_debug(message: str) -> None:
-    print(message, flush=True)
+    self.iterators: Dict[int, ReferenceIterator] = {}
+    self.iterators_count: int = 0
+    self.iterator_prefetch_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+    self._iterators_lock = threading.Lock()
+    self.owns_dispatcher: bool = dispatcher is None
+    self.dispatcher: CommandDispatcher = dispatcher or CommandDispatcher()
+    # A debug callback on its own keeps receiving every message like before there were log levels
+    self.logger: ScoundrelLogger = logger or ScoundrelLogger(level="debug" if debug else "warning", sink=debug)
+    self.logger.debug("WebSocketClient initialized")
+
+  @property
+  def instance_id(self) -> str:
+    return self.decode_context.instance_id
+
+  @instance_id.setter
+  def instance_id(self, instance_id: str) -> None:
+    self.decode_context.instance_id = instance_id
 
   async def listen(self) -> None:
-    self._debug("Starting running loop")
+    self.logger.debug("Starting running loop")
     self.loop = asyncio.get_running_loop()
+    self.metrics.add_connections(1)
 
-    while self.running:
-      self._debug("Waiting for new input")
-      raw_data = await self.ws.recv()
+    try:
+      await self.listen_for_commands()
+    finally:
+      self.metrics.add_connections(-1)
+      # Workers waiting for callback responses would otherwise keep the dispatcher shutdown below waiting forever
+      self.cancel_outgoing_commands()
+      # Closing waits for running prefetches, which would stall every connection on this loop
+      await self.loop.run_in_executor(None, self.close_iterators)
+
+      if self.coalescer is not None:
+        self.coalescer.close()
 
-      self._debug(f"Raw data received: {raw_data}")
+      if self.owns_dispatcher:
+        # Keep the loop running while workers finish, since their responses are sent through it
+        await self.loop.run_in_executor(None, self.dispatcher.shutdown)
+
+      if self.owns_async_executor:
+        await self.loop.run_in_executor(None, self.async_executor.shutdown)
+
+  async def listen_for_commands(self) -> None:
+    while self.running:
+      self.logger.debug("Waiting for new input")
+      try:
+        data, bytes_in = await self.receive_message()
+      except ConnectionClosed:
+        self.logger.debug("Connection closed")
+        break
+
+      received_at = time.perf_counter()
+      decode_error = self.decode_context.take_error()
+
+      if data.get("buffers"):
+        try:
+          data = await self.receive_buffers(data)
+        except (KeyError, TypeError, ValueError) as error:
+          # The frames left on the socket can't be told apart from the next messages, so the connection is closed
+          self.logger.warning("Closing connection after invalid buffer frames: %s", error)
+          await self.respond_with_error(data.get("command_id"), str(error))
+          await self.ws.close(1003, "Invalid buffer frames")
+          break
+
+        bytes_in += sum(buffer_data["byte_length"] for buffer_data in data["buffers"])
 
-      data = scoundrel_json_loads(raw_data)
       command = data["command"]
       command_id = data["command_id"]
       released_ids = data.get("released_reference_ids")
+      command_method = getattr(self, f"command_{command}", None) if isinstance(command, str) else None
+
+      # Client-supplied names that aren't commands share one label, so they can't grow the metrics without limit
+      if command_method is not None or command in ("handshake", "command_response"):
+        self.metrics.observe(command, "bytes_in", bytes_in)
+      else:
+        self.metrics.observe(UNKNOWN_COMMAND, "bytes_in", bytes_in)
 
-      self._debug(f"Data recieved as: {data}!")
+      self.logger.debug("Data received as: %s", data)
 
       self.release_references(released_ids)
 
-      if command == "command_response" and self.handle_command_response(data):
+      if command == "command_response":
+        if not self.handle_command_response(data) and command_id is not None:
+          # Responses can arrive after their command timed out
+          self.logger.info("Ignored response to unknown command %s", command_id)
         continue
 
-      command_method = getattr(self, f"command_{command}", None)
+      if decode_error is not None:
+        self.logger.info("Command %s failed while decoding: %s", command, decode_error)
+        await self.respond_with_error(command_id, str(decode_error))
+        continue
+
+      if command == "handshake":
+        # Handled in order on the connection loop, since it changes how the following messages are encoded
+        await self.handle_handshake(command_id, data.get("data") or {})
+        continue
 
-      if command_method:
-        thread = threading.Thread(target=self.run_command_in_thread, args=(command_method, command_id, data))
-        thread.start()
+      if command_method and self.coalescer is not None:
+        self.coalescer.command_dispatched()
+
+      if command_method and self.is_async_command(command, data.get("data")):
+        await self.dispatcher.dispatch_to(
+          self.async_executor.submit,
+          functools.partial(self.run_async_command, command_method, command_id, data, received_at)
+        )
+      elif command_method:
+        await self.dispatcher.dispatch(command, self.build_job(command_method, command_id, data, received_at))
       else:
         await self.respond_with_error(command_id, f"No such command {command}")
 
+  async def receive_message(self) -> Tuple[Any, int]:
+    recv_streaming = getattr(self.ws, "recv_streaming", None)
+
+    if recv_streaming is None:
+      raw_data = await self.ws.recv()
+      self.logger.debug("Raw data received: %s", raw_data)
+
+      return self.decode_message(raw_data), len(raw_data)
+
+    # Fragments go to the decoder as they arrive. MessagePack decodes them right away, JSON is joined at the end
+    decoder: Optional[IncrementalDecoder] = None
+    bytes_in = 0
+
+    async for fragment in recv_streaming():
+      if decoder is None:
+        decoder = self.message_decoder(fragment)
+
+      decoder.feed(fragment)
+      bytes_in += len(fragment)
+
+    if decoder is None:
+      raise ValueError("Received a message without frames")
+
+    self.logger.debug("Received message of %s bytes", bytes_in)
+
+    return decoder.result(), bytes_in
+
+  def message_decoder(self, first_fragment: Any) -> IncrementalDecoder:
+    if isinstance(first_fragment, str) or not self.codec.binary:
+      return self.json_codec.decoder(object_hook=self.decode_context.decode_object)
+
+    return self.codec.decoder(object_hook=self.decode_context.decode_object)
+
+  def decode_message(self, raw_data: Any) -> Any:
+    # Text frames are always JSON, binary frames use the negotiated codec
+    if isinstance(raw_data, str) or not self.codec.binary:
+      return self.json_codec.decode(raw_data, object_hook=self.decode_context.decode_object)
+
+    return self.codec.decode(raw_data, object_hook=self.decode_context.decode_object)
+
+  async def send_message(self, payload: Dict[str, Any]) -> None:
+    buffers = self.extract_outgoing_buffers(payload.get("data"))
+    if buffers:
+      payload["buffers"] = [buffer.metadata() for buffer in buffers]
+
+    encode_started_at = time.perf_counter()
+    frames: List[Any] = [self.codec.encode(payload)]
+    self.record_sent(time.perf_counter() - encode_started_at, len(frames[0]) + sum(buffer.byte_length for buffer in buffers))
+
+    coalescer = self.coalescer
+    if coalescer is not None and payload.get("command") == "command_response":
+      if not buffers:
+        # Encoded here on the worker, only the joining happens on the connection loop
+        await self.run_on_connection_loop(coalescer.add(frames[0]))
+        return
+
+      await self.run_on_connection_loop(coalescer.response_sent())
+
+    for buffer in buffers:
+      frames.extend(buffer.frames())
+
+    await self.send_frames(frames)
+
+  def record_sent(self, serialize_seconds: float, bytes_out: int) -> None:
+    timing = CURRENT_TIMING.get()
+    if timing is None:
+      return
+
+    timing.serialize_seconds += serialize_seconds
+    self.metrics.observe(timing.command, "serialize_ms", serialize_seconds * 1000)
+    self.metrics.observe(timing.command, "bytes_out", bytes_out)
+
+  async def send_frames(self, frames: Sequence[Any]) -> None:
+    await self.run_on_connection_loop(self.send_frames_in_order(frames))
+
+  async def run_on_connection_loop(self, coroutine: Coroutine[Any, Any, None]) -> None:
+    loop = self.loop
+    if loop is None or loop is asyncio.get_running_loop():
+      await coroutine
+    else:
+      # Commands run on worker loops, so hand the frames to the connection loop that owns the socket
+      await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coroutine, loop))
+
+  async def send_frames_in_order(self, frames: Sequence[Any]) -> None:
+    if self._send_lock is None:
+      self._send_lock = asyncio.Lock()
+
+    # Buffer frames have to follow their message without other messages in between
+    async with self._send_lock:
+      for frame in frames:
+        await self.ws.send(frame)
+
+  @staticmethod
+  def extract_outgoing_buffers(payload: Any) -> List[OutgoingBuffer]:
+    if not isinstance(payload, dict):
+      return []
+
+    payloads = [payload.get("data")]
+    results = payload["data"].get("results") if isinstance(payload.get("data"), dict) else None
+    if isinstance(results, list):
+      payloads.extend(result.get("data") for result in results if isinstance(result, dict))
+
+    buffers: List[OutgoingBuffer] = []
+    for response_payload in payloads:
+      if isinstance(response_payload, dict) and isinstance(response_payload.get("response"), OutgoingBuffer):
+        buffers.append(response_payload["response"])
+        response_payload["response"] = {"__scoundrel_type": "buffer", "index": len(buffers) - 1}
+
+    return buffers
+
+  async def receive_buffers(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    buffers: List[memoryview] = []
+    remaining_bytes = self.max_message_size
+
+    for buffer_data in data["buffers"]:
+      assembler = BufferAssembler(
+        byte_length=buffer_data["byte_length"],
+        frames=buffer_data["frames"],
+        format=buffer_data.get("format"),
+        shape=buffer_data.get("shape"),
+        max_byte_length=remaining_bytes,
+        frame_size=self.buffer_frame_size
+      )
+      remaining_bytes -= len(assembler.data)
+
+      while not assembler.done:
+        assembler.add(await self.ws.recv())
+
+      buffers.append(assembler.result())
+
+    data["data"] = resolve_buffer_markers(data.get("data"), buffers)
+
+    return data
+
+  async def handle_handshake(self, command_id: int, data: Dict[str, Any]) -> None:
+    try:
+      requested_codecs = data.get("codecs") or ["json"]
+      if not isinstance(requested_codecs, list):
+        raise ValueError("Codecs must be a list")
+
+      codec = negotiate_wire_codec(requested_codecs, self.allowed_codecs)
+    except Exception as error:
+      await self.respond_with_error(command_id, str(error))
+      return
+
+    coalesce = bool(data.get("coalesce"))
+    handles = "compact" if data.get("handles") == "compact" else "verbose"
+
+    await self.respond_to_command(
+      command_id,
+      {"codec": codec.name, "instance_id": self.instance_id, "coalesce": coalesce, "handles": handles}
+    )
+    self.codec = codec
+    # The client has the instance ID from this response, so compact payloads leave it out from here on
+    self.decode_context.compact_handles = handles == "compact"
+
+    if coalesce and self.coalescer is None:
+      self.coalescer = ResponseCoalescer(
+        send=self.send_frames_in_order,
+        join=lambda frames: self.codec.encode_many(frames),
+        window=self.coalesce_window,
+        max_messages=self.coalesce_max_messages,
+        on_flush=self.metrics.record_coalesced_frame,
+        on_error=lambda error: self.logger.warning("Sending coalesced responses failed: %s", error)
+      )
+
   def handle_command_response(self, data: Dict[str, Any]) -> bool:
     command_id = data.get("command_id")
     if not isinstance(command_id, int):
@@ -81,6 +407,9 @@ class WebSocketClient:
     if not future:
       return False
 
+    if future.done():
+      return True
+
     if data.get("error"):
       future.set_exception(RuntimeError(data["error"]))
       return True
@@ -93,20 +422,162 @@ class WebSocketClient:
     if self.loop is None:
       raise RuntimeError("No event loop available for outgoing commands")
 
+    if self._outgoing_semaphore is None:
+      self._outgoing_semaphore = asyncio.Semaphore(self.max_outgoing_commands)
+
+    # Senders wait for a free slot, so a loop calling a callback can't flood the socket with pending commands
+    self.outgoing_waiting += 1
+    self.metrics.add_waiting_callbacks(1)
+    try:
+      await self._outgoing_semaphore.acquire()
+    finally:
+      self.outgoing_waiting -= 1
+      self.metrics.add_waiting_callbacks(-1)
+
+    try:
+      if self.closed:
+        raise ConnectionError("Connection closed before the command was sent")
+
+      return await self.send_command_and_wait(command, data)
+    finally:
+      self._outgoing_semaphore.release()
+
+  async def send_command_and_wait(self, command: str, data: Dict[str, Any]) -> Any:
+    if self.loop is None:
+      raise RuntimeError("No event loop available for outgoing commands")
+
     self.outgoing_commands_count += 1
     command_id = self.outgoing_commands_count
     future = self.loop.create_future()
     self.outgoing_commands[command_id] = future
+    self.metrics.add_outgoing_callbacks(1)
+
+    try:
+      payload = {"command": command, "command_id": command_id, "data": data}
+      await self.send_message(payload)
+
+      return await asyncio.wait_for(future, self.callback_timeout)
+    except asyncio.TimeoutError:
+      self.metrics.record_callback_timeout()
+      raise TimeoutError(f"No response to {command} {command_id} within {self.callback_timeout} seconds") from None
+    finally:
+      self.outgoing_commands.pop(command_id, None)
+      self.metrics.add_outgoing_callbacks(-1)
+
+  def cancel_outgoing_commands(self) -> None:
+    self.closed = True
+    cancelled = 0
+
+    for future in list(self.outgoing_commands.values()):
+      if not future.done():
+        future.set_exception(ConnectionError("Connection closed before the command was answered"))
+        cancelled += 1
+
+    if cancelled:
+      self.metrics.record_callbacks_cancelled(cancelled)
+
+  def function_callback(self, function_id: int, marker: Optional[Dict[str, Any]] = None) -> Callable[..., Any]:
+    options = marker or {}
+    mode = options.get("__scoundrel_callback_mode")
+
+    if mode is None or mode == "result":
+      return lambda *args: self.call_function_on_reference(function_id, *args)
+
+    if mode == FIRE_AND_FORGET:
+      return lambda *args: self.send_function_calls(function_id, [args])
+
+    if mode == BATCHED:
+      interval_ms = options.get("__scoundrel_batch_interval_ms", DEFAULT_BATCH_INTERVAL * 1000)
+      if not isinstance(interval_ms, (int, float)) or interval_ms < 0:
+        raise ValueError(f"Invalid batch interval: {interval_ms!r}")
+
+      batch = CallbackBatch(
+        function_id,
+        send=self.send_function_calls,
+        schedule=self.schedule_on_connection_loop,
+        max_calls=options.get("__scoundrel_batch_size", DEFAULT_BATCH_SIZE),
+        interval=interval_ms / 1000
+      )
+      self.callback_batches.add(batch)
+
+      return batch
+
+    raise ValueError(f"Unknown callback mode: {mode}")
+
+  def function_calls_payload(self, function_id: int, calls: Sequence[Sequence[Any]]) -> Dict[str, Any]:
+    data: Dict[str, Any] = {"reference_id": function_id, "with": "none"}
+    if len(calls) == 1:
+      data["args"] = self.serialize_function_args(calls[0])
+    else:
+      data["calls"] = [self.serialize_function_args(args) for args in calls]
+
+    # Without a command ID the client knows there is nobody waiting for a response
+    return {"command": "call_function_on_reference", "command_id": None, "data": data}
+
+  def send_function_calls(self, function_id: int, calls: List[Sequence[Any]]) -> None:
+    if self.loop is None:
+      raise RuntimeError("No event loop available for outgoing commands")
+
+    if self.closed:
+      raise ConnectionError("Connection closed before the callback was sent")
+
+    payload = self.function_calls_payload(function_id, calls)
+    future = asyncio.run_coroutine_threadsafe(self.send_message(payload), self.loop)
+    self.metrics.record_callbacks_without_reply(len(calls))
+
+    if self.in_connection_loop() or self.async_executor.in_loop_thread():
+      # Waiting would block the loop, so the frame is sent in the background
+      future.add_done_callback(self.report_send_error)
+      return
+
+    # Worker threads wait until the frame is sent, which keeps a fast producer from queueing frames without limit
+    future.result()
+
+  async def flush_callback_batches(self) -> None:
+    for batch in list(self.callback_batches):
+      calls = batch.take()
+      if calls:
+        self.metrics.record_callbacks_without_reply(len(calls))
+        await self.send_message(self.function_calls_payload(batch.function_id, calls))
+
+  def schedule_on_connection_loop(self, delay: float, callback: Callable[[], None]) -> None:
+    if self.loop is None:
+      raise RuntimeError("No event loop available for outgoing commands")
+
+    self.loop.call_soon_threadsafe(self.loop.call_later, delay, self.run_reporting_errors, callback)
+
+  def run_reporting_errors(self, callback: Callable[[], None]) -> None:
+    try:
+      callback()
+    except Exception as error:
+      self.logger.warning("Flushing callback calls failed: %s", error)
+
+  def in_connection_loop(self) -> bool:
+    try:
+      return asyncio.get_running_loop() is self.loop
+    except RuntimeError:
+      return False
 
-    payload = {"command": command, "command_id": command_id, "data": data}
-    await self.ws.send(scoundrel_json_dumps(payload))
+  def report_send_error(self, future: "concurrent.futures.Future[None]") -> None:
+    if not future.cancelled() and future.exception() is not None:
+      self.logger.warning("Sending a callback call failed: %s", future.exception())
 
-    return await future
+  def report_callback_error(self, future: "asyncio.Future[Any]") -> None:
+    # Marks the error as retrieved for callers that never await the call
+    if not future.cancelled() and future.exception() is not None:
+      self.logger.info("Callback call failed: %s", future.exception())
 
   def call_function_on_reference(self, function_id: int, *args: Any) -> Any:
     if self.loop is None:
       raise RuntimeError("No event loop available for outgoing commands")
 
+    if self.async_executor.in_loop_thread():
+      # Blocking here would stall every coroutine on the shared loop. The call is sent even if the caller
+      # doesn't await the returned future
+      task = asyncio.ensure_future(self.call_function_on_reference_async(function_id, *args))
+      task.add_done_callback(self.report_callback_error)
+      return task
+
     serialized_args = self.serialize_function_args(args)
     future = asyncio.run_coroutine_threadsafe(
       self.send_command(
@@ -116,176 +587,644 @@ class WebSocketClient:
       self.loop
     )
 
-    result = future.result()
+    with self.dispatcher.blocking():
+      result = future.result()
+
+    if isinstance(result, dict) and "response" in result:
+      return result["response"]
+
+    return result
+
+  async def call_function_on_reference_async(self, function_id: int, *args: Any) -> Any:
+    if self.loop is None:
+      raise RuntimeError("No event loop available for outgoing commands")
+
+    if self._async_callbacks_semaphore is None:
+      self._async_callbacks_semaphore = asyncio.Semaphore(self.max_async_calls)
+
+    serialized_args = self.serialize_function_args(args)
+
+    async with self._async_callbacks_semaphore:
+      with self.dispatcher.blocking():
+        result = await asyncio.wrap_future(
+          asyncio.run_coroutine_threadsafe(
+            self.send_command(
+              "call_function_on_reference",
+              {"reference_id": function_id, "args": serialized_args, "with": "result"}
+            ),
+            self.loop
+          )
+        )
+
     if isinstance(result, dict) and "response" in result:
       return result["response"]
 
     return result
 
-  def run_command_in_thread(
+  def is_async_command(self, command: str, data: Any) -> bool:
+    if command != "call_method_on_reference" or not isinstance(data, dict):
+      return False
+
+    reference_id = data.get("reference_id")
+    method_name = data.get("method_name")
+    if not isinstance(reference_id, int) or not isinstance(method_name, str):
+      return False
+
+    object = self.objects.get(reference_id)
+    if object is None:
+      return False
+
+    # Look the method up without running descriptors, since this runs on the connection loop
+    method = inspect.getattr_static(object, method_name, None)
+    method = getattr(method, "__func__", method)
+
+    return inspect.iscoroutinefunction(method)
+
+  async def run_async_command(
     self,
     command_method: Callable[[int, Dict[str, Any]], Awaitable[None]],
     command_id: int,
-    data: Dict[str, Any]
+    data: Dict[str, Any],
+    received_at: Optional[float] = None
   ) -> None:
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    if self._async_calls_semaphore is None:
+      self._async_calls_semaphore = asyncio.Semaphore(self.max_async_calls)
+
+    async with self._async_calls_semaphore:
+      try:
+        await self.run_command(command_method, command_id, data, received_at)
+      except Exception:
+        # The command has already reported the error back to the client
+        pass
+
+  async def await_result(self, result: Any) -> Any:
+    if not inspect.isawaitable(result):
+      return result
+
+    if self.async_executor.in_loop_thread():
+      return await result
 
-    loop.run_until_complete(self.run_command(command_method, command_id, data))
-    loop.close()
+    return await asyncio.wrap_future(self.async_executor.submit(result))
+
+  def build_job(
+    self,
+    command_method: Callable[[int, Dict[str, Any]], Awaitable[None]],
+    command_id: int,
+    data: Dict[str, Any],
+    received_at: Optional[float] = None
+  ) -> Callable[[], Awaitable[None]]:
+    return lambda: self.run_command(command_method, command_id, data, received_at)
 
   async def run_command(
     self,
     command_method: Callable[[int, Dict[str, Any]], Awaitable[None]],
     command_id: int,
-    data: Dict[str, Any]
+    data: Dict[str, Any],
+    received_at: Optional[float] = None
   ) -> None:
+    scope_token = CURRENT_SCOPE.set(data["scope_id"]) if data.get("scope_id") is not None else None
+    timing = self.metrics.command_started(command_method.__name__[len("command_"):], received_at)
+    timing_token = CURRENT_TIMING.set(timing)
+    failed = False
+
     try:
       await command_method(command_id, data["data"])
     except Exception as error:
-      self._debug(f"ERROR: {error}")
+      failed = True
+      self.logger.info("Command %s failed: %s", timing.command, error)
       await self.respond_with_error(command_id, str(error))
       raise
+    finally:
+      CURRENT_TIMING.reset(timing_token)
+      self.metrics.command_finished(timing, failed)
+
+      if scope_token is not None:
+        CURRENT_SCOPE.reset(scope_token)
 
   async def respond_to_command(self, command_id: int, data: Any) -> None:
+    await self.flush_callback_batches()
+
     data = {"command": "command_response", "command_id": command_id, "data": {"data": data}}
-    data_json = scoundrel_json_dumps(data)
 
-    self._debug(f"Reply: {data_json}")
+    self.logger.debug("Reply: %s", data)
 
-    await self.ws.send(data_json)
+    await self.send_message(data)
 
   async def respond_with_error(self, command_id: int, error: str) -> None:
+    await self.flush_callback_batches()
+
     data = {"command": "command_response", "command_id": command_id, "data": {"error": error}}
-    data_json = scoundrel_json_dumps(data)
 
-    self._debug(f"Reply: {data_json}")
+    self.logger.debug("Reply: %s", data)
 
-    await self.ws.send(data_json)
+    await self.send_message(data)
 
   async def command_new_object_with_reference(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_new_object_with_reference(data))
+
+  async def command_call_method_on_reference(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_call_method_on_reference(data))
+
+  async def command_import(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_import(data))
+
+  async def command_read_attribute(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_read_attribute(data))
+
+  async def command_serialize_reference(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_serialize_reference(data))
+
+  async def command_iterate_open(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_iterate_open(data))
+
+  async def command_iterate_next(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_iterate_next(data))
+
+  async def command_iterate_close(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_iterate_close(data))
+
+  async def command_release_references(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_release_references(data))
+
+  async def command_reference_stats(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_reference_stats(data))
+
+  async def command_open_scope(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_open_scope(data))
+
+  async def command_close_scope(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_close_scope(data))
+
+  async def command_pipeline(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_pipeline(data))
+
+  async def command_batch(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_batch(data))
+
+  async def command_mark_immutable(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_mark_immutable(data))
+
+  async def command_stats(self, command_id: int, data: Dict[str, Any]) -> None:
+    await self.respond_to_command(command_id, await self.execute_stats(data))
+
+  async def execute_new_object_with_reference(self, data: Dict[str, Any]) -> Dict[str, Any]:
     class_name = data["class_name"]
-    args = self.parse_arg(data.get("args", []))
+    args = data.get("args", [])
 
     if class_name == "[]":
-      instance = list(args)
+      instance: Any = list(args)
+    elif self.process_pool is not None and self.process_pool.matches(class_name):
+      instance = self.process_pool.create(class_name, args)
     else:
-      klass = eval(class_name)
+      klass = self.class_resolver.resolve(class_name)
       instance = klass(*args)
 
     object_id = self.spawn_object(instance)
 
-    await self.respond_to_command(command_id, {"object_id": object_id, "instance_id": self.instance_id})
+    return self.with_instance_id({"object_id": object_id})
 
-  async def command_call_method_on_reference(self, command_id: int, data: Dict[str, Any]) -> None:
-    args = self.parse_arg(data["args"])
+  async def execute_call_method_on_reference(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    args = data["args"]
     method_name = data["method_name"]
     reference_id = data["reference_id"]
     with_string = data["with"]
     object = self.objects[reference_id]
-    method = getattr(object, method_name)
-    result = method(*args)
-
-    if with_string == "reference":
-      object_id = self.spawn_object(result)
-      response = object_id
-    elif with_string == "result":
-      response = result
-    else:
-      raise ValueError(f"Unknown return type: {with_string}")
 
-    response_payload: Dict[str, Any] = {"response": response}
-    if with_string == "reference":
-      response_payload["instance_id"] = self.instance_id
+    try:
+      if isinstance(object, RemoteObject):
+        result = object.call(method_name, args, keep=with_string == "reference")
+      else:
+        method = getattr(object, method_name)
+        result = await self.await_result(method(*args))
+    finally:
+      # The call may have changed what the cached reads returned
+      self.read_cache.invalidate(reference_id)
 
-    await self.respond_to_command(command_id, response_payload)
+    return self.build_response_payload(result, with_string)
 
-  async def command_import(self, command_id: int, data: Dict[str, Any]) -> None:
+  async def execute_import(self, data: Dict[str, Any]) -> Dict[str, Any]:
     import_name = data["import_name"]
-    import_result = importlib.import_module(import_name)
+
+    if self.process_pool is not None and self.process_pool.matches(import_name):
+      import_result: Any = self.process_pool.import_module(import_name)
+    else:
+      import_result = importlib.import_module(import_name)
+
     object_id = self.spawn_object(import_result)
 
-    await self.respond_to_command(command_id, {"object_id": object_id, "instance_id": self.instance_id})
+    return self.with_instance_id({"object_id": object_id})
 
-  async def command_read_attribute(self, command_id: int, data: Dict[str, Any]) -> None:
-    attribute_name = data["attribute_name"]
+  async def execute_read_attribute(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    attribute_name = data.get("attribute_name")
     reference_id = data["reference_id"]
     with_string = data["with"]
     object = self.objects[reference_id]
 
+    cache_key = (reference_id, attribute_name, with_string)
+    # Reference reads aren't cached, since every reader releases the reference it got on its own
+    use_cache = (
+      with_string not in ("buffer", "reference")
+      and not any(key in data for key in ("keys", "slice", "all"))
+      and self.read_cache.should_cache(reference_id, bool(data.get("cache")))
+    )
+
+    if use_cache:
+      cached_payload = self.read_cache.get(cache_key)
+      if cached_payload is not None:
+        return cached_payload
+
+    payload = self.read_attribute_payload(object, attribute_name, with_string, data)
+
+    if use_cache:
+      self.read_cache.put(cache_key, payload)
+
+    return payload
+
+  def read_attribute_payload(self, object: Any, attribute_name: Any, with_string: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    keep = with_string == "reference"
+    keys = data.get("keys")
+    if "keys" in data and not isinstance(keys, list):
+      raise ValueError("Keys must be a list")
+
+    item_slice = None if keys is not None else self.parse_item_slice(data)
+
+    if keys is not None or item_slice is not None or attribute_reads.is_slice_name(attribute_name):
+      if isinstance(object, RemoteObject):
+        items = object.items(keys, item_slice, attribute_name, keep=keep)
+      else:
+        items = attribute_reads.read_items(object, keys, item_slice, attribute_name)
+
+      # A name like "[0:2]" on an object that isn't a sequence is read as a plain attribute or key
+      if items is not None:
+        return self.build_items_payload(*items, with_string)
+
+    if isinstance(object, RemoteObject):
+      return self.build_response_payload(object.read(attribute_name, keep=keep), with_string)
+
     result = self.read_attribute_value(object, attribute_name)
 
+    return self.build_response_payload(result, with_string)
+
+  async def execute_serialize_reference(self, data: Dict[str, Any]) -> str:
+    reference_id = data["reference_id"]
+    object = self.objects[reference_id]
+
+    if isinstance(object, RemoteObject):
+      return object.serialize()
+
+    return scoundrel_json_dumps(object)
+
+  async def execute_iterate_open(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    reference_id = data["reference_id"]
+    object = self.objects[reference_id]
+    reference_iterator = ReferenceIterator(
+      object,
+      chunk_size=data.get("chunk_size", 100),
+      executor=self.get_iterator_prefetch_executor()
+    )
+
+    with self._iterators_lock:
+      self.iterators_count += 1
+      iterator_id = self.iterators_count
+      self.iterators[iterator_id] = reference_iterator
+
+    # Start reading the first chunk while the client receives the iterator ID
+    reference_iterator.prefetch()
+
+    return {"iterator_id": iterator_id}
+
+  async def execute_iterate_next(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    iterator_id = data["iterator_id"]
+    with_string = data.get("with", "result")
+    reference_iterator = self.iterators.get(iterator_id)
+
+    if reference_iterator is None:
+      raise ValueError(f"No such iterator {iterator_id}")
+
+    items, done = reference_iterator.next_chunk(data.get("chunk_size"))
+
+    if done:
+      self.iterators.pop(iterator_id, None)
+      reference_iterator.close()
+
+    if with_string == "reference":
+      response: List[Any] = [self.spawn_object(item) for item in items]
+    elif with_string == "result":
+      response = items
+    else:
+      raise ValueError(f"Unknown return type: {with_string}")
+
+    response_payload: Dict[str, Any] = {"response": response, "done": done}
+    if with_string == "reference":
+      self.with_instance_id(response_payload)
+
+    return response_payload
+
+  async def execute_iterate_close(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    iterator_id = data["iterator_id"]
+    reference_iterator = self.iterators.pop(iterator_id, None)
+
+    if reference_iterator is not None:
+      reference_iterator.close()
+
+    return {"closed": reference_iterator is not None}
+
+  def get_iterator_prefetch_executor(self) -> concurrent.futures.ThreadPoolExecutor:
+    with self._iterators_lock:
+      if self.iterator_prefetch_executor is None:
+        self.iterator_prefetch_executor = concurrent.futures.ThreadPoolExecutor(
+          max_workers=4,
+          thread_name_prefix="scoundrel-prefetch"
+        )
+
+      return self.iterator_prefetch_executor
+
+  def close_iterators(self) -> None:
+    for reference_iterator in list(self.iterators.values()):
+      reference_iterator.close()
+
+    self.iterators.clear()
+
+    if self.iterator_prefetch_executor is not None:
+      self.iterator_prefetch_executor.shutdown(wait=False)
+      self.iterator_prefetch_executor = None
+
+  async def execute_release_references(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    if "first_id" in data or "last_id" in data:
+      # Reused slots make IDs of later references smaller than earlier ones, so a range can't describe them
+      raise ValueError("Reference IDs aren't contiguous, release a list of reference_ids or use a scope instead")
+
+    reference_ids = data.get("reference_ids")
+    if not isinstance(reference_ids, list):
+      raise ValueError("Reference IDs must be a list")
+
+    return {"released": self.objects.release_many(reference_ids)}
+
+  async def execute_reference_stats(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    return self.objects.stats()
+
+  async def execute_stats(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    stats = self.metrics.snapshot()
+    stats["connection"] = {
+      "instance_id": self.instance_id,
+      "references": self.objects.stats(),
+      "outgoing_callbacks": len(self.outgoing_commands),
+      "outgoing_callbacks_waiting": self.outgoing_waiting,
+      "max_outgoing_commands": self.max_outgoing_commands,
+      "read_cache": self.read_cache.stats(),
+      "iterators": len(self.iterators),
+      "scopes": len(self.scopes)
+    }
+
+    return stats
+
+  async def execute_mark_immutable(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    reference_ids = data.get("reference_ids")
+    if reference_ids is None:
+      reference_ids = [data["reference_id"]]
+
+    if not isinstance(reference_ids, list):
+      raise ValueError("Reference IDs must be a list")
+
+    for reference_id in reference_ids:
+      if reference_id not in self.objects:
+        # Raises the same stale or unknown reference error as other commands
+        self.objects[reference_id]
+
+    for reference_id in reference_ids:
+      self.read_cache.mark_immutable(reference_id)
+
+    return {"marked": len(reference_ids), "read_cache": self.read_cache.enabled}
+
+  async def execute_open_scope(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"scope_id": self.open_scope()}
+
+  async def execute_close_scope(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"released": self.close_scope(data["scope_id"])}
+
+  def open_scope(self) -> int:
+    with self._scopes_lock:
+      self.scopes_count += 1
+      scope_id = self.scopes_count
+      self.scopes[scope_id] = self.scope_stack[-1] if self.scope_stack else None
+      self.scope_stack.append(scope_id)
+
+    return scope_id
+
+  def close_scope(self, scope_id: int) -> int:
+    with self._scopes_lock:
+      if scope_id not in self.scopes:
+        raise ValueError(f"No such scope {scope_id}")
+
+      # Closing a scope also closes the scopes that were opened inside it
+      closing_ids = [scope_id]
+      for closing_id in closing_ids:
+        closing_ids.extend(child_id for child_id, parent_id in self.scopes.items() if parent_id == closing_id)
+
+      for closing_id in closing_ids:
+        del self.scopes[closing_id]
+        if closing_id in self.scope_stack:
+          self.scope_stack.remove(closing_id)
+
+    return sum(self.objects.release_scope(closing_id) for closing_id in closing_ids)
+
+  def current_scope(self) -> Optional[int]:
+    scope_id = CURRENT_SCOPE.get()
+    if scope_id is not None:
+      return scope_id if scope_id in self.scopes else None
+
+    return self.scope_stack[-1] if self.scope_stack else None
+
+  async def execute_pipeline(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    steps = data.get("steps")
+    if not isinstance(steps, list):
+      raise ValueError("Pipeline requires a list of steps")
+
+    value = self.objects[data["reference_id"]]
+
+    if any(isinstance(step, dict) and "call" in step for step in steps):
+      self.read_cache.invalidate(data["reference_id"])
+
+    for index, step in enumerate(steps):
+      try:
+        value = await self.await_result(self.run_pipeline_step(value, step))
+      except Exception as error:
+        raise ValueError(f"Pipeline step {index} failed: {error}") from error
+
+    with_string = data.get("with", "result")
+    if isinstance(value, RemoteObject) and with_string != "reference":
+      value = value.fetch()
+
+    return self.build_response_payload(value, with_string)
+
+  def run_pipeline_step(self, value: Any, step: Any) -> Any:
+    if not isinstance(step, dict):
+      raise ValueError(f"Invalid pipeline step: {step!r}")
+
+    if isinstance(value, RemoteObject):
+      # Intermediate values stay in the worker process and only the final one is fetched
+      return self.run_remote_pipeline_step(value, step)
+
+    if "attribute" in step:
+      return self.read_attribute_value(value, step["attribute"])
+
+    if "index" in step:
+      return value[step["index"]]
+
+    if "call" in step:
+      method = getattr(value, step["call"])
+      return method(*step.get("args", []))
+
+    raise ValueError(f"Invalid pipeline step: {step!r}")
+
+  def run_remote_pipeline_step(self, value: RemoteObject, step: Dict[str, Any]) -> Any:
+    if "attribute" in step:
+      return value.read(step["attribute"], keep=True)
+
+    if "index" in step:
+      return value.item(step["index"], keep=True)
+
+    if "call" in step:
+      return value.call(step["call"], step.get("args", []), keep=True)
+
+    raise ValueError(f"Invalid pipeline step: {step!r}")
+
+  async def execute_batch(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    commands = data.get("commands")
+    if not isinstance(commands, list):
+      raise ValueError("Batch requires a list of commands")
+
+    stop_on_error = data.get("stop_on_error", True)
+    results: List[Dict[str, Any]] = []
+    previous_data: List[Any] = []
+    failed = False
+
+    for index, sub_command in enumerate(commands):
+      if stop_on_error and failed:
+        results.append({"error": "Skipped after earlier error", "skipped": True})
+        previous_data.append(None)
+        continue
+
+      try:
+        command = sub_command["command"]
+        if command == "batch":
+          raise ValueError("Batches can't be nested")
+
+        execute_method = getattr(self, f"execute_{command}", None)
+        if execute_method is None:
+          raise ValueError(f"No such command {command}")
+
+        sub_data = self.resolve_batch_results(sub_command.get("data") or {}, previous_data)
+        result = await execute_method(sub_data)
+      except Exception as error:
+        self.logger.info("Batch command %s failed: %s", index, error)
+        results.append({"error": str(error)})
+        previous_data.append(None)
+        failed = True
+      else:
+        results.append({"data": result})
+        previous_data.append(result)
+
+    return {"results": results}
+
+  def resolve_batch_results(self, value: Any, previous_data: Sequence[Any]) -> Any:
+    def resolve_marker(marker: Dict[str, Any]) -> Any:
+      if marker.get("__scoundrel_type") == "batch_result":
+        return self.batch_result_value(marker, previous_data)
+
+      return marker
+
+    return resolve_markers(value, resolve_marker)
+
+  @staticmethod
+  def batch_result_value(marker: Dict[str, Any], previous_data: Sequence[Any]) -> Any:
+    index = marker.get("index")
+    if not isinstance(index, int) or index < 0 or index >= len(previous_data):
+      raise ValueError(f"Batch result {index} isn't available yet")
+
+    result = previous_data[index]
+    if result is None:
+      raise ValueError(f"Batch result {index} failed")
+
+    key = marker.get("key")
+    if key is not None:
+      return result[key]
+
+    # Default to the object ID the earlier command produced so it can be used as a reference ID
+    if isinstance(result, dict):
+      if "object_id" in result:
+        return result["object_id"]
+      if "response" in result:
+        return result["response"]
+
+    return result
+
+  def build_response_payload(self, result: Any, with_string: str) -> Dict[str, Any]:
+    response: Any
+
     if with_string == "reference":
       object_id = self.spawn_object(result)
       response = object_id
     elif with_string == "result":
       response = result
+    elif with_string == "buffer":
+      response = OutgoingBuffer(result, frame_size=self.buffer_frame_size)
     else:
       raise ValueError(f"Unknown return type: {with_string}")
 
     response_payload: Dict[str, Any] = {"response": response}
     if with_string == "reference":
-      response_payload["instance_id"] = self.instance_id
-
-    await self.respond_to_command(command_id, response_payload)
-
-  async def command_serialize_reference(self, command_id: int, data: Dict[str, Any]) -> None:
-    reference_id = data["reference_id"]
-    object = self.objects[reference_id]
+      self.with_instance_id(response_payload)
 
-    await self.respond_to_command(command_id, scoundrel_json_dumps(object))
+    return response_payload
 
-  def read_attribute_value(self, object: Any, attribute_name: Any) -> Any:
-    if isinstance(object, (list, tuple)):
-      index = self.parse_index(attribute_name)
-      if index is not None:
-        return object[index]
-      if attribute_name == "length":
-        return len(object)
-    elif isinstance(object, dict):
-      if attribute_name in object:
-        return object[attribute_name]
-      if attribute_name == "length":
-        return len(object)
-
-    return getattr(object, attribute_name)
+  def build_items_payload(
+    self,
+    keys: Optional[List[Any]],
+    values: List[Any],
+    length: Optional[int],
+    with_string: str
+  ) -> Dict[str, Any]:
+    if with_string == "reference":
+      response: List[Any] = [self.spawn_object(value) for value in values]
+    elif with_string == "result":
+      response = values
+    else:
+      raise ValueError(f"Unknown return type: {with_string}")
 
-  @staticmethod
-  def parse_index(attribute_name: Any) -> Optional[int]:
-    if isinstance(attribute_name, int):
-      return attribute_name
-    if isinstance(attribute_name, str) and attribute_name.isdigit():
-      return int(attribute_name)
-    return None
+    response_payload: Dict[str, Any] = {"response": response}
+    if length is not None:
+      response_payload["length"] = length
+    if keys is not None:
+      response_payload["keys"] = keys
+    if with_string == "reference":
+      self.with_instance_id(response_payload)
 
-  def parse_arg(self, arg: Any) -> Any:
-    if type(arg).__name__ in ("list", "tuple"):
-      new_array = []
+    return response_payload
 
-      for x in arg:
-        new_array.append(self.parse_arg(x))
+  def with_instance_id(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+    if not self.decode_context.compact_handles:
+      payload["instance_id"] = self.instance_id
 
-      return new_array
-    elif isinstance(arg, dict):
-      if arg.get("__scoundrel_type") == "function":
-        function_id = arg.get("__scoundrel_function_id")
-        if not isinstance(function_id, int):
-          raise ValueError("Missing function reference ID")
-        return lambda *args: self.call_function_on_reference(function_id, *args)
+    return payload
 
-      if arg.get("__scoundrel_type") == "reference":
-        instance_id = arg.get("__scoundrel_instance_id")
-        if instance_id is None or instance_id == self.instance_id:
-          return self.objects[arg["__scoundrel_object_id"]]
+  @staticmethod
+  def parse_item_slice(data: Dict[str, Any]) -> Optional[slice]:
+    if data.get("all"):
+      return slice(None)
 
-      new_dict = {}
+    slice_data = data.get("slice")
+    if isinstance(slice_data, dict):
+      return slice(slice_data.get("start"), slice_data.get("stop"), slice_data.get("step"))
 
-      for k, v in arg.items():
-        new_dict[k] = self.parse_arg(v)
+    return None
 
-      return new_dict
+  def read_attribute_value(self, object: Any, attribute_name: Any) -> Any:
+    return attribute_reads.read_attribute_value(object, attribute_name)
 
-    return arg
+  def parse_arg(self, arg: Any) -> Any:
+    # Decoded messages are already resolved, this is for values that were built without the decode context
+    return self.decode_context.resolve(arg)
 
   def serialize_function_args(self, args: Sequence[Any]) -> Sequence[Any]:
     return [self.serialize_function_arg(arg) for arg in args]
@@ -294,7 +1233,12 @@ class WebSocketClient:
     if arg is None or isinstance(arg, (str, int, float, bool)):
       return arg
 
-    object_id = self.spawn_object(arg)
+    return self.reference_marker(self.spawn_object(arg))
+
+  def reference_marker(self, object_id: int) -> Dict[str, Any]:
+    if self.decode_context.compact_handles:
+      return {COMPACT_REFERENCE_KEY: object_id}
+
     return {
       "__scoundrel_object_id": object_id,
       "__scoundrel_instance_id": self.instance_id,
@@ -302,19 +1246,13 @@ class WebSocketClient:
     }
 
   def spawn_object(self, object: Any) -> int:
-    self.objects_count += 1
-    object_id = self.objects_count
-    self.objects[object_id] = object
-
-    return object_id
+    return self.objects.spawn(object, scope=self.current_scope())
 
   def release_references(self, released_ids: Optional[Sequence[int]]) -> None:
     if not isinstance(released_ids, list):
       return
 
-    for reference_id in released_ids:
-      if reference_id in self.objects:
-        del self.objects[reference_id]
+    self.objects.release_many(released_ids)
 
 
 class ScoundrelPythonServer:
@@ -322,28 +1260,134 @@ class ScoundrelPythonServer:
     self,
     host: str = "127.0.0.1",
     port: int = 53874,
-    debug: Optional[Callable[[str], None]] = None
+    debug: Optional[Callable[[str], None]] = None,
+    pool_size: Optional[int] = None,
+    queue_size: int = 1024,
+    inline_commands: Optional[Iterable[str]] = None,
+    codecs: Optional[Iterable[str]] = None,
+    class_cache_size: int = 256,
+    max_async_calls: int = 64,
+    process_targets: Optional[Iterable[str]] = None,
+    processes: Optional[int] = None,
+    workers: int = 1,
+    stats_port: Optional[int] = None,
+    log_level: Optional[str] = None,
+    read_cache_size: int = 0,
+    read_cache_ttl: Optional[float] = None,
+    coalesce_window: float = DEFAULT_WINDOW,
+    coalesce_max_messages: int = DEFAULT_MAX_MESSAGES,
+    max_outgoing_commands: int = DEFAULT_MAX_OUTGOING_COMMANDS,
+    callback_timeout: Optional[float] = None,
+    max_message_size: int = DEFAULT_MAX_MESSAGE_SIZE
   ) -> None:
+    if max_message_size < 1:
+      raise ValueError(f"Max message size must be at least 1 byte, got {max_message_size}")
+
     self.host: str = host
     self.port: int = int(port)
-    self._debug: Callable[[str], None] = debug or self._default_debug
-
-  @staticmethod
-  def _default_debug(message: str) -> None:
-    print(message, flush=True)
+    self.workers: int = workers
+    self.dispatcher: CommandDispatcher = CommandDispatcher(
+      pool_size=pool_size,
+      queue_size=queue_size,
+      inline_commands=inline_commands
+    )
+    self.codecs: List[str] = list(codecs) if codecs is not None else available_wire_codecs()
+    self.class_resolver: ClassResolver = ClassResolver(namespace=globals(), maxsize=class_cache_size)
+    self.async_executor: AsyncExecutor = AsyncExecutor()
+    self.max_async_calls: int = max_async_calls
+    self.process_pool: Optional[ProcessPool] = ProcessPool(process_targets, processes) if process_targets else None
+    self.stats_port: Optional[int] = stats_port
+    self.read_cache_size: int = read_cache_size
+    self.read_cache_ttl: Optional[float] = read_cache_ttl
+    self.coalesce_window: float = coalesce_window
+    self.coalesce_max_messages: int = coalesce_max_messages
+    self.max_outgoing_commands: int = max_outgoing_commands
+    self.callback_timeout: Optional[float] = callback_timeout
+    self.max_message_size: int = max_message_size
+    self.metrics: MetricsRegistry = MetricsRegistry()
+    self.metrics.register_gauge("class_resolver", self.class_resolver.stats)
+    self.metrics.register_gauge("dispatcher", self.dispatcher_stats)
+    if self.process_pool is not None:
+      self.metrics.register_gauge("process_pool", self.process_pool.stats)
+    self.logger: ScoundrelLogger = ScoundrelLogger(level=log_level or ("debug" if debug else "warning"), sink=debug)
 
   async def handler(self, ws: Any, path: Optional[str] = None) -> None:
     del path
-    web_socket_client = WebSocketClient(ws, debug=self._debug)
+    web_socket_client = WebSocketClient(
+      ws,
+      dispatcher=self.dispatcher,
+      codecs=self.codecs,
+      class_resolver=self.class_resolver,
+      async_executor=self.async_executor,
+      max_async_calls=self.max_async_calls,
+      process_pool=self.process_pool,
+      metrics=self.metrics,
+      logger=self.logger,
+      read_cache_size=self.read_cache_size,
+      read_cache_ttl=self.read_cache_ttl,
+      coalesce_window=self.coalesce_window,
+      coalesce_max_messages=self.coalesce_max_messages,
+      max_outgoing_commands=self.max_outgoing_commands,
+      callback_timeout=self.callback_timeout,
+      max_message_size=self.max_message_size
+    )
     await web_socket_client.listen()
 
   def run(self) -> None:
-    asyncio.run(self.run_forever())
+    if self.workers > 1:
+      WorkerSupervisor(self, self.workers).run()
+    else:
+      asyncio.run(self.run_forever())
+
+  async def run_forever(self, sock: Optional[socket.socket] = None, started: Optional[Callable[[], None]] = None) -> None:
+    try:
+      if sock is not None:
+        serve = websockets.serve(self.handler, sock=sock, max_size=self.max_message_size)
+      else:
+        serve = websockets.serve(self.handler, self.host, self.port, max_size=self.max_message_size)
+
+      async with serve:
+        stats_server = await self.start_stats_server() if self.stats_port is not None else None
 
-  async def run_forever(self) -> None:
-    async with websockets.serve(self.handler, self.host, self.port):
-      self._debug(f"Started with PID {os.getpid()} on {self.host}:{self.port}")
-      await asyncio.Future()
+        if started is not None:
+          started()
+        else:
+          # The JavaScript runner waits for this line, so it is printed at every log level
+          self.logger.always(f"Started with PID {os.getpid()} on {self.host}:{self.port}")
+
+        try:
+          await asyncio.Future()
+        finally:
+          if stats_server is not None:
+            stats_server.close()
+    finally:
+      self.dispatcher.shutdown()
+      self.async_executor.shutdown()
+
+      if self.process_pool is not None:
+        self.process_pool.shutdown()
+
+  def dispatcher_stats(self) -> Dict[str, int]:
+    return {"pending": self.dispatcher.pending, "capacity": self.dispatcher.capacity, "pool_size": self.dispatcher.pool_size}
+
+  async def start_stats_server(self) -> asyncio.AbstractServer:
+    return await asyncio.start_server(self.handle_stats_request, "127.0.0.1", self.stats_port)
+
+  async def handle_stats_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    try:
+      # Every path answers with the metrics, so only the request headers are consumed
+      while (await reader.readline()).strip():
+        pass
+
+      body = self.metrics.render_text().encode("utf-8")
+      writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+        + f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("ascii")
+        + body
+      )
+      await writer.drain()
+    finally:
+      writer.close()
 
   @classmethod
   def from_argv(cls, argv: Optional[Sequence[str]] = None) -> "ScoundrelPythonServer":
@@ -354,10 +1398,103 @@ class ScoundrelPythonServer:
     )
     parser.add_argument("--host", default="127.0.0.1")
     parser.add_argument("--port", default="53874")
+    parser.add_argument("--pool-size", type=int, default=None, help="Worker threads executing commands")
+    parser.add_argument("--queue-size", type=int, default=1024, help="Commands queued before reading pauses")
+    parser.add_argument(
+      "--inline-commands",
+      default="",
+      help="Comma separated commands run directly on the connection loop, e.g. read_attribute,serialize_reference"
+    )
+
+    parser.add_argument(
+      "--codecs",
+      default=None,
+      help="Comma separated wire codecs clients may negotiate, e.g. json,msgpack"
+    )
+
+    parser.add_argument(
+      "--max-async-calls",
+      type=int,
+      default=64,
+      help="Coroutine calls and awaited callbacks each connection runs at the same time"
+    )
+    parser.add_argument("--class-cache-size", type=int, default=256, help="Resolved class names kept in the cache")
+    parser.add_argument(
+      "--process-targets",
+      default="",
+      help="Comma separated modules or classes created in worker processes, e.g. reports,numpy.linalg"
+    )
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes for process targets")
+    parser.add_argument("--workers", type=int, default=1, help="Server processes sharing the listening socket")
+    parser.add_argument(
+      "--read-cache-size",
+      type=int,
+      default=0,
+      help="Cached attribute reads per connection for cache requests and immutable references, 0 disables the cache"
+    )
+    parser.add_argument("--read-cache-ttl", type=float, default=None, help="Seconds cached reads of mutable references stay valid")
+    parser.add_argument(
+      "--coalesce-window-ms",
+      type=float,
+      default=DEFAULT_WINDOW * 1000,
+      help="How long responses wait for others to share a frame when a client asks for coalescing"
+    )
+    parser.add_argument("--coalesce-max-messages", type=int, default=DEFAULT_MAX_MESSAGES, help="Responses per coalesced frame")
+    parser.add_argument(
+      "--max-outgoing-commands",
+      type=int,
+      default=DEFAULT_MAX_OUTGOING_COMMANDS,
+      help="Callback calls each connection waits on at the same time, further ones wait for a free slot"
+    )
+    parser.add_argument(
+      "--callback-timeout",
+      type=float,
+      default=None,
+      help="Seconds to wait for a callback response before failing the call, waits forever by default"
+    )
+    parser.add_argument(
+      "--max-message-size",
+      type=int,
+      default=DEFAULT_MAX_MESSAGE_SIZE,
+      help="Largest message in bytes the server accepts, larger ones close the connection"
+    )
+    parser.add_argument(
+      "--log-level",
+      default="warning",
+      choices=list(LOG_LEVELS),
+      help="Messages below this level are skipped without being formatted"
+    )
+    parser.add_argument(
+      "--stats-port",
+      type=int,
+      default=None,
+      help="Serve metrics as text on this local port, offset by the worker index with --workers"
+    )
 
     args = parser.parse_args(argv)
 
-    return cls(host=args.host, port=args.port)
+    return cls(
+      host=args.host,
+      port=args.port,
+      pool_size=args.pool_size,
+      queue_size=args.queue_size,
+      inline_commands=parse_inline_commands(args.inline_commands),
+      codecs=[codec.strip() for codec in args.codecs.split(",") if codec.strip()] if args.codecs else None,
+      class_cache_size=args.class_cache_size,
+      max_async_calls=args.max_async_calls,
+      process_targets=[target.strip() for target in args.process_targets.split(",") if target.strip()],
+      processes=args.processes,
+      workers=args.workers,
+      stats_port=args.stats_port,
+      log_level=args.log_level,
+      read_cache_size=args.read_cache_size,
+      read_cache_ttl=args.read_cache_ttl,
+      coalesce_window=args.coalesce_window_ms / 1000,
+      coalesce_max_messages=args.coalesce_max_messages,
+      max_outgoing_commands=args.max_outgoing_commands,
+      callback_timeout=args.callback_timeout,
+      max_message_size=args.max_message_size
+    )
 
 
 def main(argv: Optional[Sequence[str]] = None) -> None:
@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import datetime as dt
+import re
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .scoundrel_json import (
+  _decode_object,
+  _deserialize_regex,
+  _ensure_serialized_object,
+  _find_handler_for_value,
+  _format_datetime,
+  _native_subclasses_handled,
+  _parse_iso_datetime,
+  _regex_flags_from_pattern,
+)
+from .scoundrel_json import dumps as scoundrel_json_dumps
+from .scoundrel_json import loads as scoundrel_json_loads
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+DATE_EXT_TYPE = 1
+REGEX_EXT_TYPE = 2
+COALESCED_COMMAND = "command_responses"
+NATIVE_CONVERSIONS: Sequence[Tuple[Any, Callable[[Any], Any]]] = (
+  (dict, dict),
+  ((list, tuple), list),
+  (str, str),
+  (bytes, bytes),
+  (bool, bool),
+  (int, int),
+  (float, float),
+)
+
+Frame = Union[str, bytes]
+ObjectHook = Optional[Callable[[Dict[str, Any]], Any]]
+
+
+class IncrementalDecoder:
+  def __init__(self, codec: "WireCodec", object_hook: ObjectHook = None) -> None:
+    self.codec: "WireCodec" = codec
+    self.object_hook: ObjectHook = object_hook
+    self.fragments: List[Frame] = []
+
+  def feed(self, fragment: Frame) -> None:
+    self.fragments.append(fragment)
+
+  def result(self) -> Any:
+    fragments = self.fragments
+    self.fragments = []
+
+    if len(fragments) == 1:
+      raw = fragments[0]
+    elif fragments and isinstance(fragments[0], str):
+      raw = "".join(fragment for fragment in fragments if isinstance(fragment, str))
+    else:
+      raw = b"".join(fragment.encode("utf-8") if isinstance(fragment, str) else fragment for fragment in fragments)
+
+    # The fragments are let go before decoding, so the message is only held once next to the decoded value
+    del fragments
+
+    return self.codec.decode(raw, object_hook=self.object_hook)
+
+
+class WireCodec:
+  name: str = ""
+  binary: bool = False
+
+  def encode(self, value: Any) -> Frame:
+    raise NotImplementedError
+
+  def decode(self, raw: Frame, object_hook: ObjectHook = None) -> Any:
+    raise NotImplementedError
+
+  def decoder(self, object_hook: ObjectHook = None) -> IncrementalDecoder:
+    return IncrementalDecoder(self, object_hook=object_hook)
+
+  def encode_many(self, frames: Sequence[Frame]) -> Frame:
+    raise NotImplementedError
+
+
+class JsonWireCodec(WireCodec):
+  name = "json"
+
+  def encode(self, value: Any) -> Frame:
+    return scoundrel_json_dumps(value)
+
+  def decode(self, raw: Frame, object_hook: ObjectHook = None) -> Any:
+    if isinstance(raw, (bytes, bytearray, memoryview)):
+      raw = bytes(raw).decode("utf-8")
+
+    return scoundrel_json_loads(raw, object_hook=object_hook)
+
+  def encode_many(self, frames: Sequence[Frame]) -> Frame:
+    # Joins frames that were already encoded, so the responses aren't serialized a second time
+    return f'{{"command": "{COALESCED_COMMAND}", "responses": [{", ".join(str(frame) for frame in frames)}]}}'
+
+
+class MessagePackWireCodec(WireCodec):
+  name = "msgpack"
+  binary = True
+
+  def __init__(self) -> None:
+    if msgpack is None:
+      raise RuntimeError("The msgpack codec requires the msgpack package")
+
+  def encode(self, value: Any) -> Frame:
+    # msgpack packs subclasses of its native types itself, strict types hands them to the registered handlers
+    return msgpack.packb(
+      value,
+      default=self._encode_default,
+      use_bin_type=True,
+      strict_types=_native_subclasses_handled()
+    )
+
+  def decode(self, raw: Frame, object_hook: ObjectHook = None) -> Any:
+    if isinstance(raw, str):
+      return scoundrel_json_loads(raw, object_hook=object_hook)
+
+    return msgpack.unpackb(
+      raw,
+      ext_hook=self._decode_ext,
+      object_hook=object_hook or _decode_object,
+      raw=False,
+      strict_map_key=False
+    )
+
+  def decoder(self, object_hook: ObjectHook = None) -> IncrementalDecoder:
+    return MessagePackIncrementalDecoder(self, object_hook=object_hook)
+
+  def encode_many(self, frames: Sequence[Frame]) -> Frame:
+    packer = msgpack.Packer(use_bin_type=True)
+    header = (
+      packer.pack_map_header(2)
+      + packer.pack("command")
+      + packer.pack(COALESCED_COMMAND)
+      + packer.pack("responses")
+      + packer.pack_array_header(len(frames))
+    )
+
+    return header + b"".join(frame if isinstance(frame, bytes) else frame.encode("utf-8") for frame in frames)
+
+  @staticmethod
+  def _encode_default(value: Any) -> Any:
+    if isinstance(value, dt.datetime):
+      return msgpack.ExtType(DATE_EXT_TYPE, _format_datetime(value).encode("utf-8"))
+
+    if isinstance(value, re.Pattern):
+      regex = f"/{value.pattern}/{_regex_flags_from_pattern(value)}"
+      return msgpack.ExtType(REGEX_EXT_TYPE, regex.encode("utf-8"))
+
+    if isinstance(value, (bytearray, memoryview)):
+      return bytes(value)
+
+    handler = _find_handler_for_value(value)
+    if handler is not None:
+      return _ensure_serialized_object(handler, handler.serialize(value), "value")
+
+    # Tuples and native subclasses without a handler only get here with strict types
+    for native_type, convert in NATIVE_CONVERSIONS:
+      if isinstance(value, native_type):
+        return convert(value)
+
+    raise TypeError(f"Cannot serialize unsupported type {type(value).__name__}")
+
+  @staticmethod
+  def _decode_ext(code: int, data: bytes) -> Any:
+    if code == DATE_EXT_TYPE:
+      return _parse_iso_datetime(data.decode("utf-8"))
+
+    if code == REGEX_EXT_TYPE:
+      return _deserialize_regex({"value": data.decode("utf-8")})
+
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackIncrementalDecoder(IncrementalDecoder):
+  def __init__(self, codec: "WireCodec", object_hook: ObjectHook = None) -> None:
+    super().__init__(codec, object_hook=object_hook)
+    # Fragments are copied into the unpacker as they arrive instead of being collected and joined
+    self.unpacker = msgpack.Unpacker(
+      ext_hook=MessagePackWireCodec._decode_ext,
+      object_hook=object_hook or _decode_object,
+      raw=False,
+      strict_map_key=False,
+      max_buffer_size=0
+    )
+
+  def feed(self, fragment: Frame) -> None:
+    self.unpacker.feed(fragment.encode("utf-8") if isinstance(fragment, str) else fragment)
+
+  def result(self) -> Any:
+    return self.unpacker.unpack()
+
+
+_wire_codecs: Dict[str, Callable[[], WireCodec]] = {}
+
+
+def register_wire_codec(name: str, factory: Callable[[], WireCodec]) -> None:
+  _wire_codecs[name] = factory
+
+
+def available_wire_codecs() -> List[str]:
+  names = []
+
+  for name, factory in _wire_codecs.items():
+    try:
+      factory()
+    except RuntimeError:
+      continue
+    names.append(name)
+
+  return names
+
+
+def negotiate_wire_codec(requested: Sequence[str], allowed: Optional[Iterable[str]] = None) -> WireCodec:
+  allowed_names = set(allowed) if allowed is not None else set(_wire_codecs)
+
+  for name in requested:
+    if name not in allowed_names or name not in _wire_codecs:
+      continue
+
+    try:
+      return _wire_codecs[name]()
+    except RuntimeError:
+      continue
+
+  return JsonWireCodec()
+
+
+register_wire_codec("json", JsonWireCodec)
+register_wire_codec("msgpack", MessagePackWireCodec)
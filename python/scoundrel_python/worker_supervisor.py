@@ -0,0 +1,166 @@
+import asyncio
+import multiprocessing
+import multiprocessing.connection
+import os
+import signal
+import socket
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+  from .web_socket_server import ScoundrelPythonServer
+
+# Workers that crash sooner than this after starting are restarted with a delay instead of in a tight loop
+MIN_WORKER_UPTIME = 1.0
+RESTART_DELAY = 1.0
+
+
+class WorkerStopped(Exception):
+  pass
+
+
+def bind_socket(host: str, port: int) -> socket.socket:
+  family, socket_type, proto, _canonname, address = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+  sock = socket.socket(family, socket_type, proto)
+  sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+  sock.bind(address)
+  sock.listen(socket.SOMAXCONN)
+  sock.setblocking(False)
+
+  return sock
+
+
+class WorkerSupervisor:
+  def __init__(self, server: "ScoundrelPythonServer", workers: int, ready_timeout: float = 30.0) -> None:
+    if workers < 1:
+      raise ValueError(f"Workers must be at least 1, got {workers}")
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+      raise RuntimeError("Running several workers requires the fork start method")
+
+    self.server: "ScoundrelPythonServer" = server
+    self.workers: int = workers
+    self.ready_timeout: float = ready_timeout
+    self.processes: Dict[int, Any] = {}
+    self.started_at: Dict[int, float] = {}
+    self.restarts: int = 0
+    self.sock: Optional[socket.socket] = None
+    # Forked workers inherit the bound socket and the server without pickling either
+    self._context = multiprocessing.get_context("fork")
+    self._ready_reader, self._ready_writer = self._context.Pipe(duplex=False)
+
+  def run(self) -> None:
+    previous_handlers = {
+      signal.SIGTERM: signal.signal(signal.SIGTERM, self._stop),
+      signal.SIGINT: signal.signal(signal.SIGINT, self._stop)
+    }
+
+    try:
+      self.sock = bind_socket(self.server.host, self.server.port)
+      port = self.sock.getsockname()[1]
+
+      for index in range(self.workers):
+        self.start_worker(index)
+
+      pids = self.wait_until_ready()
+      self.server.logger.always(
+        f"Started with PID {os.getpid()} on {self.server.host}:{port} with workers {', '.join(str(pid) for pid in pids)}"
+      )
+
+      self.supervise()
+    except WorkerStopped:
+      pass
+    finally:
+      for signal_number, handler in previous_handlers.items():
+        signal.signal(signal_number, handler)
+
+      self.stop_workers()
+
+      if self.sock is not None:
+        self.sock.close()
+
+  def start_worker(self, index: int) -> None:
+    process = self._context.Process(target=self._run_worker, args=(index,), name=f"scoundrel-server-{index}", daemon=True)
+    process.start()
+
+    self.processes[index] = process
+    self.started_at[index] = time.monotonic()
+
+  def wait_until_ready(self) -> List[int]:
+    pids: List[int] = []
+    deadline = time.monotonic() + self.ready_timeout
+
+    while len(pids) < self.workers:
+      sentinels = [process.sentinel for process in self.processes.values()]
+      ready = multiprocessing.connection.wait(
+        [self._ready_reader] + sentinels,
+        timeout=max(0, deadline - time.monotonic())
+      )
+
+      if not ready:
+        raise RuntimeError(f"Only {len(pids)} of {self.workers} workers started within {self.ready_timeout} seconds")
+
+      if self._ready_reader in ready:
+        pids.append(self._ready_reader.recv())
+        continue
+
+      for index, process in self.processes.items():
+        if not process.is_alive():
+          raise RuntimeError(f"Worker {index} exited with code {process.exitcode} before it started")
+
+    return pids
+
+  def supervise(self) -> None:
+    while True:
+      sentinels = {process.sentinel: index for index, process in self.processes.items()}
+
+      for sentinel in multiprocessing.connection.wait([self._ready_reader] + list(sentinels)):
+        if sentinel is self._ready_reader:
+          # Restarted workers report in as well
+          self._ready_reader.recv()
+          continue
+
+        index = sentinels[sentinel]
+        process = self.processes[index]
+        process.join()
+
+        if time.monotonic() - self.started_at[index] < MIN_WORKER_UPTIME:
+          time.sleep(RESTART_DELAY)
+
+        self.start_worker(index)
+        self.restarts += 1
+        self.server.logger.warning(
+          "Worker %s exited with code %s, restarted as %s",
+          process.pid,
+          process.exitcode,
+          self.processes[index].pid
+        )
+
+  def stop_workers(self) -> None:
+    processes = list(self.processes.values())
+    self.processes = {}
+
+    for process in processes:
+      if process.is_alive():
+        process.terminate()
+
+    for process in processes:
+      process.join(timeout=5)
+      if process.is_alive():
+        process.kill()
+        process.join()
+
+  def _run_worker(self, index: int) -> None:
+    # The supervisor stops workers on shutdown, so a Ctrl+C reaching the whole process group is left to it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+    if self.server.stats_port is not None:
+      # Only one process can listen on the stats port, so each worker gets its own
+      self.server.stats_port += index
+
+    asyncio.run(self.server.run_forever(sock=self.sock, started=lambda: self._ready_writer.send(os.getpid())))
+
+  @staticmethod
+  def _stop(_signal_number: int, _frame: Any) -> None:
+    raise WorkerStopped()
@@ -0,0 +1,17 @@
+import pytest
+
+from scoundrel_python import scoundrel_json
+
+
+@pytest.fixture
+def restore_scoundrel_types():
+  # Handlers registered by a test would otherwise change how every later test encodes values
+  handlers = list(scoundrel_json._type_handlers)
+
+  yield
+
+  scoundrel_json._type_handlers[:] = handlers
+  scoundrel_json._handlers_by_type_name.clear()
+  scoundrel_json._handlers_by_type_name.update((handler.type, handler) for handler in handlers)
+  scoundrel_json._handlers_by_python_type.clear()
+  scoundrel_json._fast_path_enabled = scoundrel_json._fast_path_supported()
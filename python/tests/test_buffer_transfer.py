@@ -0,0 +1,70 @@
+import array
+
+import pytest
+
+from scoundrel_python.buffer_transfer import BufferAssembler, OutgoingBuffer, resolve_buffer_markers
+
+
+def test_outgoing_buffer_slices_frames_without_copying():
+  data = bytearray(b"abcdefghij")
+  buffer = OutgoingBuffer(data, frame_size=4)
+  frames = list(buffer.frames())
+
+  assert buffer.metadata()["byte_length"] == 10
+  assert buffer.metadata()["frames"] == 3
+  assert [bytes(frame) for frame in frames] == [b"abcd", b"efgh", b"ij"]
+
+  data[0] = ord("z")
+
+  assert bytes(frames[0]) == b"zbcd"
+
+
+def test_outgoing_buffer_rejects_objects_without_buffer_protocol():
+  with pytest.raises(TypeError, match="buffer protocol"):
+    OutgoingBuffer(["not", "a", "buffer"])
+
+
+def test_buffer_assembler_rebuilds_typed_arrays():
+  values = array.array("d", [1.5, 2.5, 3.5])
+  buffer = OutgoingBuffer(values, frame_size=5)
+  metadata = buffer.metadata()
+  assembler = BufferAssembler(metadata["byte_length"], metadata["frames"], format=metadata["format"], frame_size=5)
+
+  for frame in buffer.frames():
+    assembler.add(bytes(frame))
+
+  assert assembler.done
+  assert assembler.result().tolist() == [1.5, 2.5, 3.5]
+
+
+def test_buffer_assembler_checks_lengths_before_allocating():
+  with pytest.raises(ValueError, match="exceeds the limit"):
+    BufferAssembler(2 ** 40, 2 ** 20, max_byte_length=1024)
+
+  with pytest.raises(ValueError, match="Invalid buffer length"):
+    BufferAssembler(-1, 1)
+
+  with pytest.raises(ValueError, match="must be sent in 2 frames"):
+    BufferAssembler(6, 1, frame_size=3)
+
+  assembler = BufferAssembler(6, 2, frame_size=3)
+
+  with pytest.raises(ValueError, match="exceed the announced"):
+    assembler.add(b"abcdefg")
+
+
+def test_resolve_buffer_markers():
+  buffers = [memoryview(b"abc")]
+
+  resolved = resolve_buffer_markers({"args": [{"__scoundrel_type": "buffer", "index": 0}, 1]}, buffers)
+
+  assert bytes(resolved["args"][0]) == b"abc"
+  assert resolved["args"][1] == 1
+
+
+def test_resolve_buffer_markers_keeps_containers_without_markers():
+  rows = [{"id": 1}, {"id": 2}]
+
+  resolved = resolve_buffer_markers({"args": [rows, {"__scoundrel_type": "buffer", "index": 0}]}, [memoryview(b"abc")])
+
+  assert resolved["args"][0] is rows
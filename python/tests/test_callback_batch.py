@@ -0,0 +1,49 @@
+import pytest
+
+from scoundrel_python.callback_batch import CallbackBatch
+
+
+def build_batch(max_calls=3):
+  sent = []
+  scheduled = []
+  batch = CallbackBatch(
+    7,
+    send=lambda function_id, calls: sent.append((function_id, calls)),
+    schedule=lambda delay, callback: scheduled.append((delay, callback)),
+    max_calls=max_calls,
+    interval=0.5
+  )
+
+  return batch, sent, scheduled
+
+
+def test_callback_batch_sends_full_batches_and_schedules_one_flush():
+  batch, sent, scheduled = build_batch()
+
+  for index in range(4):
+    batch(index, "step")
+
+  assert sent == [(7, [(0, "step"), (1, "step"), (2, "step")])]
+  assert len(scheduled) == 1
+  assert scheduled[0][0] == 0.5
+
+  scheduled[0][1]()
+  batch.flush()
+
+  assert sent[1] == (7, [(3, "step")])
+  assert len(sent) == 2
+
+
+def test_callback_batch_take_empties_the_batch():
+  batch, sent, _scheduled = build_batch()
+
+  batch("a")
+
+  assert batch.take() == [("a",)]
+  assert batch.take() == []
+  assert sent == []
+
+
+def test_callback_batch_rejects_invalid_sizes():
+  with pytest.raises(ValueError):
+    build_batch(max_calls=0)
@@ -0,0 +1,40 @@
+import collections
+
+import pytest
+
+from scoundrel_python.class_resolver import ClassResolver
+
+
+def test_class_resolver_resolves_builtins_namespace_and_dotted_imports():
+  class Example:
+    pass
+
+  resolver = ClassResolver(namespace={"Example": Example})
+
+  assert resolver.resolve("dict") is dict
+  assert resolver.resolve("Example") is Example
+  assert resolver.resolve("collections.OrderedDict") is collections.OrderedDict
+
+
+def test_class_resolver_counts_cache_hits_and_misses():
+  resolver = ClassResolver(maxsize=1)
+
+  resolver.resolve("collections.Counter")
+  resolver.resolve("collections.Counter")
+  resolver.resolve("collections.deque")
+  resolver.resolve("collections.Counter")
+
+  assert resolver.stats() == {"hits": 1, "misses": 3, "size": 1, "maxsize": 1}
+
+
+def test_class_resolver_rejects_invalid_and_unknown_names():
+  resolver = ClassResolver()
+
+  with pytest.raises(ValueError, match="Invalid class name"):
+    resolver.resolve("__import__('os')")
+
+  with pytest.raises(NameError, match="Can't resolve class collections.Missing"):
+    resolver.resolve("collections.Missing")
+
+  with pytest.raises(NameError, match="Can't resolve class missing_module_for_scoundrel"):
+    resolver.resolve("missing_module_for_scoundrel")
@@ -0,0 +1,186 @@
+import asyncio
+import threading
+
+import pytest
+
+from scoundrel_python.async_executor import AsyncExecutor
+from scoundrel_python.command_dispatcher import CommandDispatcher, parse_inline_commands
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_reuses_worker_threads():
+  dispatcher = CommandDispatcher(pool_size=2, queue_size=10)
+  thread_names = []
+  done = asyncio.Event()
+  loop = asyncio.get_running_loop()
+
+  async def job():
+    thread_names.append(threading.current_thread().name)
+    if len(thread_names) == 6:
+      loop.call_soon_threadsafe(done.set)
+
+  for _index in range(6):
+    await dispatcher.dispatch("read_attribute", job)
+
+  await asyncio.wait_for(done.wait(), 5)
+  dispatcher.shutdown()
+
+  assert len(set(thread_names)) <= 2
+  assert all(name.startswith("scoundrel-worker-") for name in thread_names)
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_runs_inline_commands_on_the_calling_loop():
+  dispatcher = CommandDispatcher(pool_size=1, queue_size=0, inline_commands=["read_attribute"])
+  loops = []
+
+  async def job():
+    loops.append(asyncio.get_running_loop())
+
+  await dispatcher.dispatch("read_attribute", job)
+
+  assert loops == [asyncio.get_running_loop()]
+  assert dispatcher.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_applies_backpressure_when_queue_is_full():
+  dispatcher = CommandDispatcher(pool_size=1, queue_size=1)
+  release = threading.Event()
+
+  async def blocking_job():
+    release.wait(5)
+
+  await dispatcher.dispatch("call_method_on_reference", blocking_job)
+  await dispatcher.dispatch("call_method_on_reference", blocking_job)
+
+  third_dispatch = asyncio.ensure_future(dispatcher.dispatch("call_method_on_reference", blocking_job))
+  await asyncio.sleep(0.05)
+
+  assert not third_dispatch.done()
+
+  release.set()
+  await asyncio.wait_for(third_dispatch, 5)
+  dispatcher.shutdown()
+
+  assert dispatcher.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_frees_slot_and_thread_while_a_job_is_blocking():
+  dispatcher = CommandDispatcher(pool_size=1, queue_size=0)
+  release = threading.Event()
+  loop = asyncio.get_running_loop()
+  second_ran = asyncio.Event()
+
+  async def blocking_job():
+    with dispatcher.blocking():
+      release.wait(5)
+
+  async def second_job():
+    loop.call_soon_threadsafe(second_ran.set)
+
+  await dispatcher.dispatch("call_method_on_reference", blocking_job)
+  await asyncio.wait_for(dispatcher.dispatch("read_attribute", second_job), 5)
+  await asyncio.wait_for(second_ran.wait(), 5)
+
+  release.set()
+
+  async def pool_shrunk():
+    while dispatcher.pending or len(dispatcher._workers) > 1:
+      await asyncio.sleep(0.01)
+
+  await asyncio.wait_for(pool_shrunk(), 5)
+  dispatcher.shutdown()
+
+  assert dispatcher.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_counts_jobs_on_other_loops_against_its_slots():
+  dispatcher = CommandDispatcher(pool_size=1, queue_size=0)
+  executor = AsyncExecutor()
+  release = threading.Event()
+  answered = threading.Event()
+  loop = asyncio.get_running_loop()
+  waiting = asyncio.Event()
+
+  async def blocking_job():
+    await asyncio.get_running_loop().run_in_executor(None, release.wait, 5)
+
+  async def waiting_job():
+    with dispatcher.blocking():
+      loop.call_soon_threadsafe(waiting.set)
+      await asyncio.get_running_loop().run_in_executor(None, answered.wait, 5)
+
+  try:
+    await dispatcher.dispatch_to(executor.submit, blocking_job)
+    second_dispatch = asyncio.ensure_future(dispatcher.dispatch_to(executor.submit, waiting_job))
+    await asyncio.sleep(0.05)
+
+    assert dispatcher.pending == 1
+    assert not second_dispatch.done()
+
+    release.set()
+    await asyncio.wait_for(second_dispatch, 5)
+    await asyncio.wait_for(waiting.wait(), 5)
+
+    # The job waiting on the client handed its slot back
+    await asyncio.wait_for(dispatcher.dispatch_to(executor.submit, blocking_job), 5)
+    answered.set()
+
+    while dispatcher.pending:
+      await asyncio.sleep(0.01)
+  finally:
+    release.set()
+    answered.set()
+    executor.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_hands_a_slot_over_once_for_concurrent_waits_of_one_job():
+  dispatcher = CommandDispatcher(pool_size=1, queue_size=0)
+  executor = AsyncExecutor()
+  answered = threading.Event()
+  loop = asyncio.get_running_loop()
+  waiting = asyncio.Event()
+  pending_while_waiting = []
+
+  async def wait_on_client():
+    with dispatcher.blocking():
+      await asyncio.sleep(0.05)
+      pending_while_waiting.append(dispatcher.pending)
+      loop.call_soon_threadsafe(waiting.set)
+      await asyncio.get_running_loop().run_in_executor(None, answered.wait, 5)
+
+  async def gathering_job():
+    await asyncio.gather(wait_on_client(), wait_on_client())
+
+  try:
+    await dispatcher.dispatch_to(executor.submit, gathering_job)
+    await asyncio.wait_for(waiting.wait(), 5)
+    answered.set()
+
+    while dispatcher.pending:
+      await asyncio.sleep(0.01)
+  finally:
+    answered.set()
+    executor.shutdown()
+
+  assert pending_while_waiting == [0, 0]
+  assert dispatcher.pending == 0
+
+
+def test_dispatcher_blocking_does_nothing_outside_workers():
+  dispatcher = CommandDispatcher(pool_size=1, queue_size=0)
+
+  with dispatcher.blocking():
+    pass
+
+  assert dispatcher.pending == 0
+  assert dispatcher._workers == []
+
+
+def test_parse_inline_commands():
+  assert parse_inline_commands("read_attribute, serialize_reference,") == ("read_attribute", "serialize_reference")
+  assert parse_inline_commands("") == ()
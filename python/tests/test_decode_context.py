@@ -0,0 +1,60 @@
+import datetime as dt
+
+from scoundrel_python.decode_context import DecodeContext
+from scoundrel_python.reference_registry import ReferenceRegistry
+from scoundrel_python.scoundrel_json import dumps as scoundrel_json_dumps
+from scoundrel_python.scoundrel_json import loads as scoundrel_json_loads
+
+
+def build_context():
+  registry = ReferenceRegistry()
+  context = DecodeContext(registry, "instance-1", lambda function_id, marker: ("callback", function_id))
+
+  return registry, context
+
+
+def test_decode_context_resolves_markers_and_types_while_loading():
+  registry, context = build_context()
+  rows = [1, 2]
+  object_id = registry.spawn(rows)
+  timestamp = dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+  foreign = {"__scoundrel_type": "reference", "__scoundrel_object_id": 1, "__scoundrel_instance_id": "other"}
+  raw = scoundrel_json_dumps({
+    "args": [
+      {"__scoundrel_type": "reference", "__scoundrel_object_id": object_id, "__scoundrel_instance_id": "instance-1"},
+      {"__scoundrel_type": "function", "__scoundrel_function_id": 5},
+      {"at": timestamp, "items": [foreign]}
+    ]
+  })
+
+  decoded = scoundrel_json_loads(raw, object_hook=context.decode_object)
+
+  assert decoded["args"][0] is rows
+  assert decoded["args"][1] == ("callback", 5)
+  assert decoded["args"][2] == {"at": timestamp, "items": [foreign]}
+  assert context.take_error() is None
+
+
+def test_decode_context_keeps_lookup_errors_for_the_command():
+  _registry, context = build_context()
+  marker = {"__scoundrel_type": "reference", "__scoundrel_object_id": 99}
+
+  decoded = scoundrel_json_loads(scoundrel_json_dumps({"args": [marker]}), object_hook=context.decode_object)
+  error = context.take_error()
+
+  assert decoded == {"args": [marker]}
+  assert isinstance(error, KeyError)
+  assert context.take_error() is None
+
+
+def test_decode_context_resolve_only_copies_containers_that_change():
+  registry, context = build_context()
+  object_id = registry.spawn("value")
+  untouched = [{"id": 1}, [2, 3]]
+  value = {"plain": untouched, "reference": {"__scoundrel_type": "reference", "__scoundrel_object_id": object_id}}
+
+  resolved = context.resolve(value)
+
+  assert resolved == {"plain": untouched, "reference": "value"}
+  assert resolved["plain"] is untouched
+  assert context.resolve(untouched) is untouched
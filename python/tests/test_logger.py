@@ -0,0 +1,44 @@
+import pytest
+
+from scoundrel_python.logger import ScoundrelLogger, truncate
+
+
+def test_logger_skips_disabled_levels_without_formatting():
+  messages = []
+  logger = ScoundrelLogger(level="info", sink=messages.append)
+
+  class Unprintable:
+    def __str__(self):
+      raise AssertionError("Formatted a skipped message")
+
+  logger.debug("Payload: %s", Unprintable())
+  logger.debug(lambda: str(Unprintable()))
+  logger.info("Command %s failed: %s", "read_attribute", "boom")
+  logger.warning(lambda: "Lazy warning")
+
+  assert messages == ["Command read_attribute failed: boom", "Lazy warning"]
+
+
+def test_logger_truncates_arguments():
+  messages = []
+  logger = ScoundrelLogger(level="debug", sink=messages.append, max_length=5)
+
+  logger.debug("Reply: %s", {"data": "long payload"})
+
+  assert messages == ["Reply: {'dat... (19 more characters)"]
+  assert truncate("short", 5) == "short"
+
+
+def test_logger_off_still_prints_always_messages():
+  messages = []
+  logger = ScoundrelLogger(level="off", sink=messages.append)
+
+  logger.error("Hidden")
+  logger.always("Started with PID 1 on 127.0.0.1:53874")
+
+  assert messages == ["Started with PID 1 on 127.0.0.1:53874"]
+
+
+def test_logger_rejects_unknown_levels():
+  with pytest.raises(ValueError, match="Unknown log level 'verbose'"):
+    ScoundrelLogger(level="verbose")
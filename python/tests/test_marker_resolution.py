@@ -0,0 +1,22 @@
+from scoundrel_python.marker_resolution import resolve_markers
+
+
+def resolve_marker(value):
+  return value["value"] * 10 if value.get("__scoundrel_type") == "test" else value
+
+
+def test_resolve_markers_copies_only_containers_that_change():
+  unchanged = {"rows": [1, 2]}
+  value = {"markers": [{"__scoundrel_type": "test", "value": 4}], "unchanged": unchanged}
+
+  resolved = resolve_markers(value, resolve_marker)
+
+  assert resolved == {"markers": [40], "unchanged": {"rows": [1, 2]}}
+  assert resolved["unchanged"] is unchanged
+  assert value["markers"] == [{"__scoundrel_type": "test", "value": 4}]
+
+
+def test_resolve_markers_keeps_values_without_markers():
+  value = [{"name": "alpha"}, ["beta"], "gamma"]
+
+  assert resolve_markers(value, resolve_marker) is value
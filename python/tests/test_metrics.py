@@ -0,0 +1,80 @@
+import time
+
+from scoundrel_python.metrics import Histogram, MetricsRegistry
+from scoundrel_python.reference_registry import ReferenceRegistry
+
+
+def test_histogram_counts_values_into_fixed_buckets():
+  histogram = Histogram([1, 10, 100])
+
+  for value in (0.5, 1, 5, 50, 500):
+    histogram.observe(value)
+
+  snapshot = histogram.snapshot()
+
+  assert snapshot["counts"] == [2, 1, 1, 1]
+  assert snapshot["count"] == 5
+  assert snapshot["sum"] == 556.5
+  assert snapshot["max"] == 500
+
+
+def test_histogram_percentiles_report_bucket_upper_bounds():
+  histogram = Histogram([1, 10, 100])
+
+  for _ in range(98):
+    histogram.observe(0.5)
+  histogram.observe(50)
+  histogram.observe(500)
+
+  assert histogram.percentile(0.5) == 1
+  assert histogram.percentile(0.99) == 100
+  assert histogram.percentile(1.0) == 500
+  assert Histogram([1]).percentile(0.99) == 0.0
+
+
+def test_metrics_registry_tracks_commands_gauges_and_references():
+  metrics = MetricsRegistry()
+  references = ReferenceRegistry()
+  references.spawn("value")
+  metrics.track_references(references)
+  metrics.register_gauge("dispatcher", lambda: {"pending": 3})
+
+  timing = metrics.command_started("read_attribute", received_at=time.perf_counter() - 0.002)
+  assert metrics.snapshot()["in_flight_commands"] == 1
+
+  metrics.command_finished(timing, failed=True)
+  metrics.observe("read_attribute", "bytes_in", 120)
+
+  snapshot = metrics.snapshot()
+  command = snapshot["commands"]["read_attribute"]
+
+  assert snapshot["in_flight_commands"] == 0
+  assert snapshot["live_references"] == 1
+  assert snapshot["dispatcher"] == {"pending": 3}
+  assert command["count"] == 1
+  assert command["errors"] == 1
+  assert command["queue_wait_ms"]["count"] == 1
+  assert command["execution_ms"]["count"] == 1
+  assert command["bytes_in"]["counts"][1] == 1
+
+
+def test_metrics_registry_renders_text_histograms():
+  metrics = MetricsRegistry()
+  metrics.register_gauge("dispatcher", lambda: {"pending": 3})
+  metrics.observe("import", "bytes_out", 100)
+
+  text = metrics.render_text()
+
+  assert "scoundrel_dispatcher_pending 3\n" in text
+  assert 'scoundrel_commands_total{command="import"} 0\n' in text
+  assert 'scoundrel_command_bytes_out_bucket{command="import",le="64"} 0\n' in text
+  assert 'scoundrel_command_bytes_out_bucket{command="import",le="256"} 1\n' in text
+  assert 'scoundrel_command_bytes_out_bucket{command="import",le="+Inf"} 1\n' in text
+  assert 'scoundrel_command_bytes_out_sum{command="import"} 100.0\n' in text
+
+
+def test_metrics_registry_escapes_label_values():
+  metrics = MetricsRegistry()
+  metrics.observe('say "hi"\\\n', "bytes_in", 1)
+
+  assert 'scoundrel_command_bytes_in_count{command="say \\"hi\\"\\\\\\n"} 1\n' in metrics.render_text()
@@ -0,0 +1,89 @@
+import gc
+import os
+
+import pytest
+
+from scoundrel_python.process_pool import ProcessPool, RemoteObject
+
+
+@pytest.fixture
+def pool():
+  process_pool = ProcessPool(["collections", "os"], processes=1)
+  yield process_pool
+  process_pool.shutdown()
+
+
+def test_process_pool_matches_targets_and_their_members():
+  process_pool = ProcessPool(["collections", "reports.Generator"])
+
+  assert process_pool.matches("collections")
+  assert process_pool.matches("collections.Counter")
+  assert process_pool.matches("reports.Generator")
+  assert not process_pool.matches("collectionsx.Counter")
+  assert not process_pool.matches("reports.Other")
+
+
+def test_process_pool_runs_objects_in_a_worker_process(pool):
+  counter = pool.create("collections.Counter", [["a", "b", "a"]])
+  remote_os = pool.import_module("os")
+
+  assert isinstance(counter, RemoteObject)
+  assert counter.call("most_common", [1]) == [("a", 2)]
+  assert remote_os.call("getpid", []) == pool.workers[0].pid
+  assert remote_os.call("getpid", []) != os.getpid()
+
+
+def test_process_pool_keeps_results_and_passes_them_back_as_arguments(pool):
+  counter = pool.create("collections.Counter", [["a", "b", "a"]])
+  keys = counter.call("keys", [], keep=True)
+  other = pool.create("collections.Counter", [])
+
+  assert isinstance(keys, RemoteObject)
+  other.call("update", [keys])
+  assert other.fetch() == {"a": 1, "b": 1}
+  assert counter.serialize() == '{"a": 2, "b": 1}'
+
+
+def test_process_pool_raises_worker_errors_and_unpicklable_arguments(pool):
+  counter = pool.create("collections.Counter", [])
+
+  with pytest.raises(AttributeError):
+    counter.call("missing", [])
+
+  with pytest.raises(TypeError, match="Can't send arguments"):
+    counter.call("update", [lambda: None])
+
+  assert counter.call("most_common", []) == []
+
+
+def test_process_pool_releases_collected_objects_with_the_next_request(pool):
+  counter = pool.create("collections.Counter", [])
+  worker = counter.worker
+  object_id = counter.object_id
+
+  del counter
+  gc.collect()
+
+  assert list(worker.pending_releases) == [object_id]
+  other = pool.create("collections.Counter", [])
+  assert list(worker.pending_releases) == []
+  assert other.call("__len__", []) == 0
+
+
+def test_process_pool_reads_items_and_iterates_in_chunks(pool):
+  counter = pool.create("collections.Counter", [list(range(250))])
+  pairs = counter.call("most_common", [], keep=True)
+
+  assert pairs.read("length") == 250
+  assert pairs.read("1") == (1, 1)
+  assert pairs.items(None, slice(0, 2)) == (None, [(0, 1), (1, 1)], 250)
+  assert counter.items([3, 4], None) == (None, [1, 1], 250)
+  assert list(pairs) == [(index, 1) for index in range(250)]
+
+  keys, values, length = counter.items(None, slice(0, 2), keep=True)
+  assert keys == [0, 1]
+  assert [value.fetch() for value in values] == [1, 1]
+
+  with pytest.raises(TypeError):
+    iter(counter.call("__len__", [], keep=True))
+
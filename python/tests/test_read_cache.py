@@ -0,0 +1,54 @@
+import time
+
+from scoundrel_python.read_cache import ReadCache
+
+
+def test_read_cache_is_disabled_without_a_size():
+  cache = ReadCache()
+
+  assert not cache.enabled
+  assert not cache.should_cache(1, requested=True)
+
+
+def test_read_cache_returns_copies_and_evicts_least_recently_used():
+  cache = ReadCache(maxsize=2)
+  cache.put((1, "a", "result"), {"response": "alpha"})
+  cache.put((1, "b", "result"), {"response": "beta"})
+
+  cached = cache.get((1, "a", "result"))
+  assert cached == {"response": "alpha"}
+  cached["response"] = "changed"
+
+  cache.put((2, "c", "result"), {"response": "gamma"})
+
+  assert cache.get((1, "a", "result")) == {"response": "alpha"}
+  assert cache.get((1, "b", "result")) is None
+  assert cache.stats()["evictions"] == 1
+
+
+def test_read_cache_expires_mutable_reads_but_not_immutable_ones():
+  cache = ReadCache(maxsize=10, ttl=0.01)
+  cache.mark_immutable(2)
+  cache.put((1, "a", "result"), {"response": "alpha"})
+  cache.put((2, "a", "result"), {"response": "beta"})
+
+  time.sleep(0.02)
+
+  assert cache.get((1, "a", "result")) is None
+  assert cache.get((2, "a", "result")) == {"response": "beta"}
+  assert cache.should_cache(2, requested=False)
+  assert not cache.should_cache(1, requested=False)
+
+
+def test_read_cache_invalidates_reads_of_released_ids():
+  cache = ReadCache(maxsize=10)
+  cache.mark_immutable(1)
+  cache.put((1, "name", "result"), {"response": "alpha"})
+  cache.put((2, "name", "result"), {"response": "beta"})
+
+  cache.release(1)
+
+  assert cache.get((1, "name", "result")) is None
+  assert cache.get((2, "name", "result")) == {"response": "beta"}
+  assert cache.stats()["size"] == 1
+  assert cache.stats()["immutable_references"] == 0
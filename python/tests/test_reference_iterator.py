@@ -0,0 +1,52 @@
+import concurrent.futures
+
+import pytest
+
+from scoundrel_python.reference_iterator import ReferenceIterator
+
+
+def test_reference_iterator_reads_chunks_until_done():
+  with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+    reference_iterator = ReferenceIterator(range(5), chunk_size=2, executor=executor)
+
+    assert reference_iterator.next_chunk() == ([0, 1], False)
+    assert reference_iterator.next_chunk() == ([2, 3], False)
+    assert reference_iterator.next_chunk() == ([4], True)
+
+
+def test_reference_iterator_prefetches_the_next_chunk():
+  read_values = []
+
+  def generator():
+    for value in range(10):
+      read_values.append(value)
+      yield value
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+    reference_iterator = ReferenceIterator(generator(), chunk_size=3, executor=executor)
+
+    assert reference_iterator.next_chunk() == ([0, 1, 2], False)
+
+    concurrent.futures.wait([reference_iterator._prefetched])
+
+    assert read_values == [0, 1, 2, 3, 4, 5]
+
+
+def test_reference_iterator_close_closes_generators():
+  closed = []
+
+  def generator():
+    try:
+      yield from range(100)
+    finally:
+      closed.append(True)
+
+  with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+    reference_iterator = ReferenceIterator(generator(), chunk_size=10, executor=executor)
+    reference_iterator.next_chunk()
+    reference_iterator.close()
+
+    assert closed == [True]
+
+    with pytest.raises(ValueError, match="Iterator is closed"):
+      reference_iterator.next_chunk()
@@ -0,0 +1,62 @@
+import pytest
+
+from scoundrel_python.reference_registry import (
+  SLOT_BITS,
+  ReferenceRegistry,
+  StaleReferenceError,
+  UnknownReferenceError,
+)
+
+
+def test_reference_registry_reuses_slots_with_new_generations():
+  registry = ReferenceRegistry()
+  first_id = registry.spawn("first")
+  second_id = registry.spawn("second")
+
+  assert (first_id, second_id) == (1, 2)
+
+  registry.release(first_id)
+  reused_id = registry.spawn("reused")
+
+  assert reused_id == (1 << SLOT_BITS) | 1
+  assert registry[reused_id] == "reused"
+  assert first_id not in registry
+
+  with pytest.raises(StaleReferenceError, match="Stale reference ID 1"):
+    registry[first_id]
+
+
+def test_reference_registry_rejects_unknown_ids():
+  registry = ReferenceRegistry()
+
+  with pytest.raises(UnknownReferenceError, match="Unknown reference ID 5"):
+    registry[5]
+
+  assert registry.get(5) is None
+
+
+def test_reference_registry_releases_lists_and_scopes():
+  registry = ReferenceRegistry()
+  ids = [registry.spawn(index) for index in range(5)]
+  scoped_ids = [registry.spawn(index, scope="request") for index in range(3)]
+
+  assert registry.release_many([ids[1], ids[2], ids[3], ids[2]]) == 3
+  assert registry.ids() == [ids[0], ids[4], *scoped_ids]
+
+  assert registry.release_scope("request") == 3
+  assert registry.ids() == [ids[0], ids[4]]
+
+
+def test_reference_registry_stats():
+  registry = ReferenceRegistry()
+  object_id = registry.spawn([1, 2, 3])
+  registry.spawn("value")
+  registry.release(object_id)
+
+  stats = registry.stats()
+
+  assert stats["live"] == 1
+  assert stats["spawned"] == 2
+  assert stats["released"] == 1
+  assert stats["free_slots"] == 1
+  assert stats["retained_bytes"] > 0
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from scoundrel_python.response_coalescer import ResponseCoalescer
+
+
+def build_coalescer(sent, **options):
+  async def send(frames):
+    sent.extend(frames)
+
+  return ResponseCoalescer(send=send, join=lambda frames: "+".join(frames), **options)
+
+
+@pytest.mark.asyncio
+async def test_response_coalescer_sends_lone_responses_right_away():
+  sent = []
+  coalescer = build_coalescer(sent)
+  coalescer.command_dispatched()
+
+  await coalescer.add("a")
+
+  assert sent == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_response_coalescer_joins_responses_until_the_last_outstanding_one():
+  sent = []
+  flushed = []
+  coalescer = build_coalescer(sent, window=10, on_flush=flushed.append)
+  for _ in range(3):
+    coalescer.command_dispatched()
+
+  await coalescer.add("a")
+  await coalescer.add("b")
+  assert sent == []
+
+  await coalescer.add("c")
+
+  assert sent == ["a+b+c"]
+  assert flushed == [3]
+
+
+@pytest.mark.asyncio
+async def test_response_coalescer_flushes_after_the_window_and_at_max_messages():
+  sent = []
+  coalescer = build_coalescer(sent, window=0.01, max_messages=2)
+  for _ in range(5):
+    coalescer.command_dispatched()
+
+  await coalescer.add("a")
+  await coalescer.add("b")
+  assert sent == ["a+b"]
+
+  await coalescer.add("c")
+  await asyncio.sleep(0.05)
+
+  assert sent == ["a+b", "c"]
+
+  coalescer.close()
+
+
+@pytest.mark.asyncio
+async def test_response_coalescer_counts_responses_sent_past_it():
+  sent = []
+  coalescer = build_coalescer(sent, window=10)
+  for _ in range(2):
+    coalescer.command_dispatched()
+
+  await coalescer.add("a")
+  await coalescer.response_sent()
+
+  assert sent == ["a"]
+  assert coalescer.outstanding == 0
+
+  coalescer.command_dispatched()
+  await coalescer.add("b")
+
+  assert sent == ["a", "b"]
@@ -1,6 +1,10 @@
+import collections
 import datetime as dt
 import re
 
+import pytest
+
+from scoundrel_python.scoundrel_json import ScoundrelTypeHandler, register_scoundrel_type
 from scoundrel_python.scoundrel_json import dumps as scoundrel_json_dumps
 from scoundrel_python.scoundrel_json import loads as scoundrel_json_loads
 
@@ -23,3 +27,128 @@ def test_scoundrel_json_serializes_regex():
   assert parsed["matcher"].pattern == "scoundrel"
   assert parsed["matcher"].flags & re.IGNORECASE
   assert parsed["matcher"].flags & re.MULTILINE
+
+
+def test_scoundrel_json_decodes_nested_types_and_keeps_unknown_ones():
+  timestamp = dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+  unknown = {"__scoundrel_type__": "unknown", "value": 1}
+  payload = scoundrel_json_dumps({"events": [{"at": timestamp, "tags": ["a"]}], "unknown": unknown})
+  parsed = scoundrel_json_loads(payload)
+
+  assert parsed == {"events": [{"at": timestamp, "tags": ["a"]}], "unknown": unknown}
+  assert scoundrel_json_loads(payload.encode("utf-8")) == parsed
+
+
+def test_scoundrel_json_serializes_datetime_subclasses():
+  class MyDateTime(dt.datetime):
+    pass
+
+  timestamp = MyDateTime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+  payload = scoundrel_json_dumps({"created_at": timestamp})
+  parsed = scoundrel_json_loads(payload)
+
+  assert '"__scoundrel_type__": "date"' in payload
+  assert parsed["created_at"] == dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+
+
+def test_scoundrel_json_uses_exact_python_types_without_predicate(restore_scoundrel_types):
+  class Point:
+    def __init__(self, x, y):
+      self.x = x
+      self.y = y
+
+  def fail_predicate(value):
+    raise AssertionError("Predicate shouldn't be called for exact types")
+
+  register_scoundrel_type(
+    ScoundrelTypeHandler(
+      type="test_point",
+      can_serialize=fail_predicate,
+      serialize=lambda value: {"x": value.x, "y": value.y},
+      deserialize=lambda payload: Point(payload["x"], payload["y"]),
+      python_types=(Point,)
+    )
+  )
+
+  parsed = scoundrel_json_loads(scoundrel_json_dumps({"point": Point(1, 2)}))
+
+  assert isinstance(parsed["point"], Point)
+  assert (parsed["point"].x, parsed["point"].y) == (1, 2)
+
+
+def test_scoundrel_json_caches_predicate_results_per_type(restore_scoundrel_types):
+  class Money:
+    def __init__(self, cents):
+      self.cents = cents
+
+  calls = []
+
+  def can_serialize(value):
+    calls.append(value)
+    return isinstance(value, Money)
+
+  register_scoundrel_type(
+    ScoundrelTypeHandler(
+      type="test_money",
+      can_serialize=can_serialize,
+      serialize=lambda value: {"cents": value.cents},
+      deserialize=lambda payload: Money(payload["cents"])
+    )
+  )
+
+  scoundrel_json_dumps({"price": Money(100)})
+  scoundrel_json_dumps({"price": Money(200)})
+
+  assert len([value for value in calls if isinstance(value, Money)]) == 1
+
+
+def test_scoundrel_json_uses_predicate_handlers_for_native_subclasses(restore_scoundrel_types):
+  Point = collections.namedtuple("Point", ["x", "y"])
+
+  register_scoundrel_type(
+    ScoundrelTypeHandler(
+      type="test_ordered_dict",
+      can_serialize=lambda value: isinstance(value, collections.OrderedDict),
+      serialize=lambda value: {"items": list(value.items())},
+      deserialize=lambda payload: collections.OrderedDict(payload["items"])
+    )
+  )
+  register_scoundrel_type(
+    ScoundrelTypeHandler(
+      type="test_point",
+      can_serialize=lambda value: isinstance(value, Point),
+      serialize=lambda value: {"x": value.x, "y": value.y},
+      deserialize=lambda payload: Point(payload["x"], payload["y"])
+    )
+  )
+
+  parsed = scoundrel_json_loads(scoundrel_json_dumps({"a": collections.OrderedDict(x=1), "point": Point(1, 2), "items": (1, 2)}))
+
+  assert type(parsed["a"]) is collections.OrderedDict
+  assert parsed == {"a": collections.OrderedDict(x=1), "point": Point(1, 2), "items": [1, 2]}
+  assert type(parsed["point"]) is Point
+
+
+def test_scoundrel_json_serializes_several_custom_values_and_shared_values():
+  timestamp = dt.datetime(2024, 1, 2, 3, 4, 5)
+  shared = {"name": "shared"}
+  payload = scoundrel_json_dumps({"first": timestamp, "second": timestamp, "matcher": re.compile("a"), "items": [shared, shared]})
+  parsed = scoundrel_json_loads(payload)
+
+  assert parsed["first"] == timestamp
+  assert parsed["second"] == timestamp
+  assert parsed["items"] == [shared, shared]
+
+
+def test_scoundrel_json_reports_error_paths():
+  circular = []
+  circular.append(circular)
+
+  with pytest.raises(ValueError, match=r"circular reference at value\.items\[1\]\[0\]"):
+    scoundrel_json_dumps({"items": [1, circular]})
+
+  with pytest.raises(ValueError, match=r"non-finite number at value\.values\[0\]"):
+    scoundrel_json_dumps({"values": [float("inf")]})
+
+  with pytest.raises(TypeError, match=r"unsupported type object at value\.nested\.value"):
+    scoundrel_json_dumps({"nested": {"value": object()}})
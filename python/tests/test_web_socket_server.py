@@ -1,8 +1,19 @@
+import asyncio
+import os
+import threading
+import time
+
 import pytest
+import websockets
+from websockets.exceptions import ConnectionClosed
 
+from scoundrel_python.command_dispatcher import CommandDispatcher
+from scoundrel_python.logger import DEBUG, INFO
+from scoundrel_python.process_pool import ProcessPool
 from scoundrel_python.scoundrel_json import dumps as scoundrel_json_dumps
 from scoundrel_python.scoundrel_json import loads as scoundrel_json_loads
 from scoundrel_python.web_socket_server import ScoundrelPythonServer, WebSocketClient
+from scoundrel_python.worker_supervisor import bind_socket
 
 
 class DummyWebSocket:
@@ -24,6 +35,15 @@ class DummyWebSocket:
     self.sent.append(payload)
 
 
+class ClosingWebSocket(DummyWebSocket):
+  def __init__(self, recv_messages=None):
+    super().__init__(recv_messages)
+    self.close_code = None
+
+  async def close(self, code=1000, reason=""):
+    self.close_code = code
+
+
 def test_parse_arg_resolves_reference():
   ws = DummyWebSocket()
   client = WebSocketClient(ws)
@@ -221,3 +241,1269 @@ async def test_listen_rejects_unknown_command():
 
   payload = scoundrel_json_loads(ws.sent[0])
   assert payload["data"]["error"] == "No such command missing_command"
+
+
+@pytest.mark.asyncio
+async def test_listen_keeps_unknown_commands_out_of_metrics():
+  ws = DummyWebSocket([
+    scoundrel_json_dumps({"command": "missing_command", "command_id": 13, "data": {}}),
+    scoundrel_json_dumps({"command": None, "command_id": 14, "data": {}}),
+    scoundrel_json_dumps({"command": 'evil"\n', "command_id": 15, "data": {}}),
+    # Helpers of the client must not be callable as commands
+    scoundrel_json_dumps({"command": "job", "command_id": 16, "data": {}})
+  ])
+  client = WebSocketClient(ws)
+  ws.on_recv = lambda: len(ws.recv_messages) == 1 and setattr(client, "running", False)
+
+  await client.listen()
+
+  commands = client.metrics.snapshot()["commands"]
+
+  assert list(commands) == ["unknown"]
+  assert commands["unknown"]["bytes_in"]["count"] == 4
+  assert [scoundrel_json_loads(sent)["data"]["error"] for sent in ws.sent] == [
+    "No such command missing_command",
+    "No such command None",
+    'No such command evil"\n',
+    "No such command job"
+  ]
+  assert 'command="unknown"' in client.metrics.render_text()
+
+
+def test_server_parses_dispatch_arguments():
+  server = ScoundrelPythonServer.from_argv([
+    "--pool-size", "3",
+    "--queue-size", "7",
+    "--inline-commands", "read_attribute,serialize_reference"
+  ])
+
+  assert server.dispatcher.pool_size == 3
+  assert server.dispatcher.queue_size == 7
+  assert server.dispatcher.inline_commands == {"read_attribute", "serialize_reference"}
+
+
+@pytest.mark.asyncio
+async def test_listen_runs_commands_on_the_worker_pool():
+  message = scoundrel_json_dumps({
+    "command": "read_attribute",
+    "command_id": 13,
+    "data": {"attribute_name": "length", "reference_id": 1, "with": "result"}
+  })
+  ws = DummyWebSocket([message])
+  client = WebSocketClient(ws)
+  client.objects[1] = ["a", "b"]
+  ws.on_recv = lambda: setattr(client, "running", False)
+
+  await client.listen()
+
+  payload = scoundrel_json_loads(ws.sent[0])
+  assert payload["command_id"] == 13
+  assert payload["data"]["data"]["response"] == 2
+
+
+@pytest.mark.asyncio
+async def test_command_batch_chains_results_of_earlier_commands():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+
+  class Example:
+    def __init__(self):
+      self.items = ["alpha", "beta"]
+
+    def get_items(self):
+      return self.items
+
+  object_id = client.spawn_object(Example())
+
+  await client.command_batch(14, {
+    "commands": [
+      {
+        "command": "call_method_on_reference",
+        "data": {"args": [], "method_name": "get_items", "reference_id": object_id, "with": "reference"}
+      },
+      {
+        "command": "read_attribute",
+        "data": {
+          "attribute_name": 1,
+          "reference_id": {"__scoundrel_type": "batch_result", "index": 0},
+          "with": "result"
+        }
+      },
+      {
+        "command": "read_attribute",
+        "data": {
+          "attribute_name": "length",
+          "reference_id": {"__scoundrel_type": "batch_result", "index": 0},
+          "with": "result"
+        }
+      }
+    ]
+  })
+
+  assert len(ws.sent) == 1
+
+  payload = scoundrel_json_loads(ws.sent[0])
+  results = payload["data"]["data"]["results"]
+
+  assert payload["command_id"] == 14
+  assert results[0]["data"]["instance_id"] == client.instance_id
+  assert results[1]["data"]["response"] == "beta"
+  assert results[2]["data"]["response"] == 2
+
+
+@pytest.mark.asyncio
+async def test_command_batch_skips_commands_after_an_error():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object(["alpha"])
+
+  await client.command_batch(15, {
+    "commands": [
+      {"command": "missing_command", "data": {}},
+      {"command": "read_attribute", "data": {"attribute_name": 0, "reference_id": object_id, "with": "result"}}
+    ]
+  })
+
+  results = scoundrel_json_loads(ws.sent[0])["data"]["data"]["results"]
+
+  assert results[0]["error"] == "No such command missing_command"
+  assert results[1]["skipped"] is True
+
+
+@pytest.mark.asyncio
+async def test_command_read_attribute_returns_slice_of_results():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object(list(range(10)))
+
+  await client.command_read_attribute(16, {"attribute_name": "[2:5]", "reference_id": object_id, "with": "result"})
+  await client.command_read_attribute(17, {"slice": {"start": 8}, "reference_id": object_id, "with": "result"})
+  await client.command_read_attribute(18, {"all": True, "reference_id": object_id, "with": "result"})
+
+  responses = [scoundrel_json_loads(sent)["data"]["data"] for sent in ws.sent]
+
+  assert responses[0] == {"response": [2, 3, 4], "length": 10}
+  assert responses[1]["response"] == [8, 9]
+  assert responses[2]["response"] == list(range(10))
+
+
+@pytest.mark.asyncio
+async def test_command_read_attribute_returns_dict_items_as_references():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object({"alpha": [1], "beta": [2], "gamma": [3]})
+
+  await client.command_read_attribute(19, {"slice": {"stop": 2}, "reference_id": object_id, "with": "reference"})
+
+  response = scoundrel_json_loads(ws.sent[0])["data"]["data"]
+
+  assert response["keys"] == ["alpha", "beta"]
+  assert response["length"] == 3
+  assert response["instance_id"] == client.instance_id
+  assert [client.objects[child_id] for child_id in response["response"]] == [[1], [2]]
+
+
+@pytest.mark.asyncio
+async def test_command_read_attribute_reads_slice_names_only_from_sequences():
+  class Point:
+    x = 1
+    y = 2
+
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  dict_id = client.spawn_object({"[0:2]": "literal", "alpha": 1})
+  point_id = client.spawn_object(Point())
+
+  await client.command_read_attribute(40, {"attribute_name": "[0:2]", "reference_id": dict_id, "with": "result"})
+  await client.command_read_attribute(41, {"keys": ["x", "y"], "reference_id": point_id, "with": "result"})
+
+  assert scoundrel_json_loads(ws.sent[0])["data"]["data"] == {"response": "literal"}
+  assert scoundrel_json_loads(ws.sent[1])["data"]["data"] == {"response": [1, 2]}
+
+
+@pytest.mark.asyncio
+async def test_command_read_attribute_returns_explicit_keys():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object(["a", "b", "c", "d"])
+
+  await client.command_read_attribute(20, {"keys": [3, "0"], "reference_id": object_id, "with": "result"})
+
+  response = scoundrel_json_loads(ws.sent[0])["data"]["data"]
+
+  assert response["response"] == ["d", "a"]
+
+
+@pytest.mark.asyncio
+async def test_iterate_commands_stream_generator_in_chunks():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object(value * 2 for value in range(5))
+
+  await client.command_iterate_open(21, {"reference_id": object_id, "chunk_size": 2})
+  iterator_id = scoundrel_json_loads(ws.sent[0])["data"]["data"]["iterator_id"]
+
+  await client.command_iterate_next(22, {"iterator_id": iterator_id})
+  await client.command_iterate_next(23, {"iterator_id": iterator_id, "with": "reference"})
+  await client.command_iterate_next(24, {"iterator_id": iterator_id})
+
+  responses = [scoundrel_json_loads(sent)["data"]["data"] for sent in ws.sent[1:]]
+
+  assert responses[0] == {"response": [0, 2], "done": False}
+  assert [client.objects[child_id] for child_id in responses[1]["response"]] == [4, 6]
+  assert responses[2] == {"response": [8], "done": True}
+  assert iterator_id not in client.iterators
+
+  client.close_iterators()
+
+
+@pytest.mark.asyncio
+async def test_iterate_close_cancels_iterator():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object(iter(range(1000)))
+
+  await client.command_iterate_open(25, {"reference_id": object_id, "chunk_size": 10})
+  iterator_id = scoundrel_json_loads(ws.sent[0])["data"]["data"]["iterator_id"]
+
+  await client.command_iterate_close(26, {"iterator_id": iterator_id})
+
+  assert scoundrel_json_loads(ws.sent[1])["data"]["data"] == {"closed": True}
+  assert client.iterators == {}
+
+  client.close_iterators()
+
+
+@pytest.mark.asyncio
+async def test_listen_closes_iterators_without_blocking_the_connection_loop():
+  reading = threading.Event()
+
+  def slow_numbers():
+    reading.set()
+    time.sleep(0.3)
+    yield 1
+
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object(slow_numbers())
+  ticks = []
+
+  async def tick():
+    while True:
+      ticks.append(time.perf_counter())
+      await asyncio.sleep(0.01)
+
+  await client.command_iterate_open(27, {"reference_id": object_id, "chunk_size": 1})
+  await asyncio.get_running_loop().run_in_executor(None, reading.wait, 5)
+  ticker = asyncio.ensure_future(tick())
+
+  with pytest.raises(RuntimeError, match="No more messages"):
+    await client.listen()
+
+  ticker.cancel()
+
+  assert client.iterators == {}
+  assert max(later - earlier for earlier, later in zip(ticks, ticks[1:])) < 0.2
+
+
+@pytest.mark.asyncio
+async def test_listen_switches_codec_after_handshake():
+  msgpack = pytest.importorskip("msgpack")
+
+  handshake = scoundrel_json_dumps({"command": "handshake", "command_id": 27, "data": {"codecs": ["msgpack", "json"]}})
+  command = msgpack.packb({"command": "missing_command", "command_id": 28, "data": {}}, use_bin_type=True)
+  ws = DummyWebSocket([handshake, command])
+  client = WebSocketClient(ws)
+  ws.on_recv = lambda: setattr(client, "running", bool(ws.recv_messages[1:]))
+
+  await client.listen()
+
+  handshake_response = scoundrel_json_loads(ws.sent[0])
+  error_response = msgpack.unpackb(ws.sent[1], raw=False)
+
+  assert handshake_response["data"]["data"]["codec"] == "msgpack"
+  assert error_response["data"]["error"] == "No such command missing_command"
+
+
+@pytest.mark.asyncio
+async def test_listen_resolves_references_while_decoding_and_reports_unknown_ones():
+  class Recorder:
+    def record(self, rows, owner):
+      self.received = (rows, owner)
+      return len(rows)
+
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  owner = [1, 2, 3]
+  recorder = Recorder()
+  recorder_id = client.spawn_object(recorder)
+  owner_marker = {"__scoundrel_type": "reference", "__scoundrel_object_id": client.spawn_object(owner)}
+  ws.recv_messages = [
+    scoundrel_json_dumps({
+      "command": "call_method_on_reference",
+      "command_id": 31,
+      "data": {"args": [[{"owner": owner_marker}], owner_marker], "method_name": "record", "reference_id": recorder_id, "with": "result"}
+    }),
+    scoundrel_json_dumps({
+      "command": "call_method_on_reference",
+      "command_id": 32,
+      "data": {
+        "args": [{"__scoundrel_type": "reference", "__scoundrel_object_id": 999}],
+        "method_name": "record",
+        "reference_id": recorder_id,
+        "with": "result"
+      }
+    })
+  ]
+  ws.on_recv = lambda: setattr(client, "running", bool(ws.recv_messages[1:]))
+
+  await client.listen()
+
+  responses = {response["command_id"]: response["data"] for response in map(scoundrel_json_loads, ws.sent)}
+
+  assert responses[31]["data"]["response"] == 1
+  assert recorder.received[0][0]["owner"] is owner
+  assert recorder.received[1] is owner
+  assert "Unknown reference ID 999" in responses[32]["error"]
+
+
+class StreamingWebSocket(DummyWebSocket):
+  def __init__(self, recv_messages=None):
+    super().__init__(recv_messages)
+    self.streamed_messages = 0
+
+  async def recv_streaming(self):
+    fragments = await self.recv()
+    self.streamed_messages += 1
+
+    for fragment in fragments:
+      yield fragment
+
+
+@pytest.mark.asyncio
+async def test_listen_decodes_fragmented_messages_with_the_negotiated_codec():
+  msgpack = pytest.importorskip("msgpack")
+
+  handshake = scoundrel_json_dumps({"command": "handshake", "command_id": 29, "data": {"codecs": ["msgpack", "json"]}})
+  command = msgpack.packb({"command": "missing_command", "command_id": 30, "data": {"items": list(range(50))}}, use_bin_type=True)
+  ws = StreamingWebSocket([
+    [handshake[:10], handshake[10:20], handshake[20:]],
+    [command[index:index + 16] for index in range(0, len(command), 16)]
+  ])
+  client = WebSocketClient(ws)
+  ws.on_recv = lambda: setattr(client, "running", bool(ws.recv_messages[1:]))
+
+  await client.listen()
+
+  handshake_response = scoundrel_json_loads(ws.sent[0])
+  error_response = msgpack.unpackb(ws.sent[1], raw=False)
+
+  assert ws.streamed_messages == 2
+  assert handshake_response["data"]["data"]["codec"] == "msgpack"
+  assert error_response["data"]["error"] == "No such command missing_command"
+  assert client.metrics.snapshot()["commands"]["unknown"]["bytes_in"]["sum"] == len(command)
+
+
+@pytest.mark.asyncio
+async def test_command_call_method_on_reference_returns_buffer_frames():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws, buffer_frame_size=4)
+
+  class Example:
+    def report(self):
+      return b"0123456789"
+
+  object_id = client.spawn_object(Example())
+
+  await client.command_call_method_on_reference(29, {
+    "args": [],
+    "method_name": "report",
+    "reference_id": object_id,
+    "with": "buffer"
+  })
+
+  payload = scoundrel_json_loads(ws.sent[0])
+
+  assert payload["data"]["data"]["response"] == {"__scoundrel_type": "buffer", "index": 0}
+  assert payload["buffers"][0]["byte_length"] == 10
+  assert [bytes(frame) for frame in ws.sent[1:]] == [b"0123", b"4567", b"89"]
+
+
+@pytest.mark.asyncio
+async def test_listen_reassembles_incoming_buffers():
+  message = scoundrel_json_dumps({
+    "command": "call_method_on_reference",
+    "command_id": 30,
+    "buffers": [{"byte_length": 6, "frames": 2}],
+    "data": {
+      "args": [{"__scoundrel_type": "buffer", "index": 0}],
+      "method_name": "extend",
+      "reference_id": 1,
+      "with": "result"
+    }
+  })
+  ws = DummyWebSocket([message, b"abc", b"def"])
+  client = WebSocketClient(ws, buffer_frame_size=3)
+  client.objects[1] = bytearray()
+  ws.on_recv = lambda: setattr(client, "running", False)
+
+  await client.listen()
+
+  assert client.objects[1] == bytearray(b"abcdef")
+
+
+@pytest.mark.asyncio
+async def test_listen_closes_the_connection_on_invalid_buffers():
+  def buffer_message(command_id, byte_length, frames):
+    return scoundrel_json_dumps({
+      "command": "call_method_on_reference",
+      "command_id": command_id,
+      "buffers": [{"byte_length": byte_length, "frames": frames}],
+      "data": {"args": [{"__scoundrel_type": "buffer", "index": 0}], "method_name": "extend", "reference_id": 1, "with": "result"}
+    })
+
+  cases = [
+    ([buffer_message(32, 2 ** 40, 2 ** 20), b"abc"], "exceeds the limit of 1024 bytes"),
+    ([buffer_message(33, 6, 1), b"abcdef"], "must be sent in 2 frames"),
+    ([buffer_message(34, 6, 2), b"abc", "text frame"], "Buffer frames must be binary")
+  ]
+
+  for messages, error in cases:
+    # The command after the bad buffer must not run, since its frames would be read out of step
+    ws = ClosingWebSocket(messages + [scoundrel_json_dumps({"command": "missing_command", "command_id": 35, "data": {}})])
+    client = WebSocketClient(ws, buffer_frame_size=3, max_message_size=1024)
+    client.objects[1] = bytearray()
+
+    await client.listen()
+
+    assert len(ws.sent) == 1
+    assert error in scoundrel_json_loads(ws.sent[0])["data"]["error"]
+    assert ws.close_code == 1003
+    assert client.objects[1] == bytearray()
+
+
+@pytest.mark.asyncio
+async def test_command_read_attribute_rejects_released_reference():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object(["alpha"])
+  client.release_references([object_id])
+  client.spawn_object(["beta"])
+
+  with pytest.raises(KeyError):
+    await client.run_command(client.command_read_attribute, 31, {
+      "data": {"attribute_name": 0, "reference_id": object_id, "with": "result"}
+    })
+
+  payload = scoundrel_json_loads(ws.sent[0])
+  assert payload["data"]["error"] == f"Stale reference ID {object_id} was released"
+
+
+@pytest.mark.asyncio
+async def test_command_release_references_releases_lists_of_reused_slots():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_ids = [client.spawn_object(index) for index in range(4)]
+  client.release_references(object_ids[:2])
+  # The reused slots give the newest references IDs above the older ones
+  reused_ids = [client.spawn_object(index) for index in range(3)]
+
+  await client.command_release_references(32, {"reference_ids": [reused_ids[0], reused_ids[2], object_ids[0]]})
+  await client.command_reference_stats(33, {})
+
+  with pytest.raises(ValueError, match="aren't contiguous"):
+    await client.run_command(client.command_release_references, 34, {"data": {"first_id": object_ids[2], "last_id": reused_ids[2]}})
+
+  assert scoundrel_json_loads(ws.sent[0])["data"]["data"] == {"released": 2}
+  assert scoundrel_json_loads(ws.sent[1])["data"]["data"]["live"] == 3
+  assert set(client.objects.ids()) == {object_ids[2], object_ids[3], reused_ids[1]}
+
+
+@pytest.mark.asyncio
+async def test_close_scope_releases_references_created_inside_it():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  outside_id = client.spawn_object("outside")
+
+  await client.command_open_scope(34, {})
+  scope_id = scoundrel_json_loads(ws.sent[0])["data"]["data"]["scope_id"]
+
+  await client.command_read_attribute(35, {"all": True, "reference_id": client.spawn_object([1, 2]), "with": "reference"})
+  callback_arg = client.serialize_function_arg({"event": "progress"})
+
+  await client.command_close_scope(36, {"scope_id": scope_id})
+
+  assert scoundrel_json_loads(ws.sent[2])["data"]["data"] == {"released": 4}
+  assert callback_arg["__scoundrel_object_id"] not in client.objects
+  assert list(client.objects) == [outside_id]
+
+
+@pytest.mark.asyncio
+async def test_run_command_tags_references_with_explicit_scope():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  first_scope = client.open_scope()
+  second_scope = client.open_scope()
+  object_id = client.spawn_object(["value"])
+
+  await client.run_command(client.command_read_attribute, 37, {
+    "scope_id": first_scope,
+    "data": {"attribute_name": 0, "reference_id": object_id, "with": "reference"}
+  })
+
+  child_id = scoundrel_json_loads(ws.sent[0])["data"]["data"]["response"]
+
+  assert client.close_scope(second_scope) == 1
+  assert child_id in client.objects
+  assert client.close_scope(first_scope) == 1
+  assert child_id not in client.objects
+
+
+@pytest.mark.asyncio
+async def test_command_new_object_with_reference_imports_dotted_class_names():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+
+  await client.command_new_object_with_reference(38, {"class_name": "collections.OrderedDict", "args": []})
+  await client.command_new_object_with_reference(39, {"class_name": "collections.OrderedDict", "args": []})
+
+  object_id = scoundrel_json_loads(ws.sent[0])["data"]["data"]["object_id"]
+
+  assert type(client.objects[object_id]).__name__ == "OrderedDict"
+  assert client.class_resolver.hits == 1
+  assert client.class_resolver.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_command_pipeline_walks_attributes_indexes_and_calls():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+
+  class Account:
+    def __init__(self, name):
+      self.name = name
+
+    def greeting(self, prefix):
+      return {"text": f"{prefix} {self.name}"}
+
+  class Bank:
+    def __init__(self):
+      self.accounts = [Account("alpha"), Account("beta")]
+
+  object_id = client.spawn_object(Bank())
+
+  await client.command_pipeline(40, {
+    "reference_id": object_id,
+    "steps": [
+      {"attribute": "accounts"},
+      {"index": 1},
+      {"call": "greeting", "args": ["Hello"]},
+      {"attribute": "text"}
+    ],
+    "with": "result"
+  })
+
+  assert scoundrel_json_loads(ws.sent[0])["data"]["data"] == {"response": "Hello beta"}
+  assert len(client.objects) == 1
+
+
+@pytest.mark.asyncio
+async def test_command_pipeline_reports_failing_step():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object({"items": []})
+
+  with pytest.raises(ValueError, match="Pipeline step 1 failed"):
+    await client.command_pipeline(41, {
+      "reference_id": object_id,
+      "steps": [{"attribute": "items"}, {"index": 0}],
+      "with": "reference"
+    })
+
+
+class CallbackAnsweringWebSocket:
+  def __init__(self, messages):
+    self.sent = []
+    self.messages = asyncio.Queue()
+    self.responded = asyncio.Event()
+    for message in messages:
+      self.messages.put_nowait(message)
+
+  async def recv(self):
+    return await self.messages.get()
+
+  async def send(self, payload):
+    self.sent.append(payload)
+    data = scoundrel_json_loads(payload)
+
+    if data["command"] == "call_function_on_reference" and data["command_id"] is not None:
+      self.messages.put_nowait(scoundrel_json_dumps({
+        "command": "command_response",
+        "command_id": data["command_id"],
+        "data": {"data": {"response": data["data"]["args"][0] * 10}}
+      }))
+    elif data["command"] == "command_response":
+      self.responded.set()
+
+
+@pytest.mark.asyncio
+async def test_listen_awaits_async_methods_and_callbacks_without_worker_threads():
+  class AsyncExample:
+    async def compute(self, value, callback):
+      await asyncio.sleep(0)
+      self.thread_name = threading.current_thread().name
+      return await callback(value + 1)
+
+  message = scoundrel_json_dumps({
+    "command": "call_method_on_reference",
+    "command_id": 42,
+    "data": {
+      "args": [1, {"__scoundrel_type": "function", "__scoundrel_function_id": 5}],
+      "method_name": "compute",
+      "reference_id": 1,
+      "with": "result"
+    }
+  })
+  ws = CallbackAnsweringWebSocket([message])
+  client = WebSocketClient(ws)
+  client.objects[1] = AsyncExample()
+
+  listen_task = asyncio.ensure_future(client.listen())
+  await asyncio.wait_for(ws.responded.wait(), 5)
+  listen_task.cancel()
+
+  with pytest.raises(asyncio.CancelledError):
+    await listen_task
+
+  response = scoundrel_json_loads(ws.sent[-1])
+
+  assert response["command_id"] == 42
+  assert response["data"]["data"]["response"] == 20
+  assert client.objects[1].thread_name == "scoundrel-async"
+
+
+@pytest.mark.asyncio
+async def test_async_methods_send_callbacks_they_do_not_await():
+  class AsyncExample:
+    def notify(self, callback, value):
+      self.pending_call = callback(value)
+
+    async def compute(self, value, callback):
+      self.notify(callback, value)
+      self.pending_commands = client.dispatcher.pending
+      await asyncio.sleep(0)
+      return "notified"
+
+  message = scoundrel_json_dumps({
+    "command": "call_method_on_reference",
+    "command_id": 43,
+    "data": {
+      "args": [3, {"__scoundrel_type": "function", "__scoundrel_function_id": 5}],
+      "method_name": "compute",
+      "reference_id": 1,
+      "with": "result"
+    }
+  })
+  ws = CallbackAnsweringWebSocket([message])
+  client = WebSocketClient(ws)
+  client.objects[1] = AsyncExample()
+
+  listen_task = asyncio.ensure_future(client.listen())
+  await asyncio.wait_for(ws.responded.wait(), 5)
+
+  while not client.objects[1].pending_call.done():
+    await asyncio.sleep(0.01)
+
+  listen_task.cancel()
+
+  with pytest.raises(asyncio.CancelledError):
+    await listen_task
+
+  messages = [scoundrel_json_loads(sent) for sent in ws.sent]
+
+  assert [message["data"]["args"] for message in messages if message["command"] == "call_function_on_reference"] == [[3]]
+  assert client.objects[1].pending_call.result() == 30
+  assert client.objects[1].pending_commands == 1
+  assert client.dispatcher.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_listen_runs_async_commands_with_their_own_data():
+  class AsyncExample:
+    async def compute(self, value):
+      return value * 2
+
+  messages = [
+    scoundrel_json_dumps({
+      "command": "call_method_on_reference",
+      "command_id": 1,
+      "data": {"args": [21], "method_name": "compute", "reference_id": 1, "with": "result"}
+    }),
+    scoundrel_json_dumps({
+      "command": "read_attribute",
+      "command_id": 2,
+      "data": {"reference_id": 2, "attribute_name": "real", "with": "result"}
+    })
+  ]
+  ws = CallbackAnsweringWebSocket(messages)
+  client = WebSocketClient(ws)
+  client.objects[1] = AsyncExample()
+  client.objects[2] = 5
+
+  async def busy():
+    time.sleep(0.3)
+
+  # Keeps the async loop from starting the first command until the listener has decoded the second one
+  client.async_executor.submit(busy())
+  listen_task = asyncio.ensure_future(client.listen())
+
+  while len(ws.sent) < 2:
+    await asyncio.sleep(0.01)
+
+  await asyncio.sleep(0.05)
+  listen_task.cancel()
+
+  with pytest.raises(asyncio.CancelledError):
+    await listen_task
+
+  responses = {response["command_id"]: response["data"]["data"] for response in map(scoundrel_json_loads, ws.sent)}
+
+  assert len(ws.sent) == 2
+  assert responses == {1: {"response": 42}, 2: {"response": 5}}
+
+
+@pytest.mark.asyncio
+async def test_process_targets_are_created_and_called_in_worker_processes():
+  ws = DummyWebSocket()
+  process_pool = ProcessPool(["collections", "os"], processes=1)
+  client = WebSocketClient(ws, process_pool=process_pool)
+
+  try:
+    await client.command_import(50, {"import_name": "os"})
+    await client.command_new_object_with_reference(51, {"class_name": "collections.Counter", "args": [["a", "b", "a"]]})
+
+    os_id = scoundrel_json_loads(ws.sent[0])["data"]["data"]["object_id"]
+    counter_id = scoundrel_json_loads(ws.sent[1])["data"]["data"]["object_id"]
+
+    await client.command_call_method_on_reference(52, {"reference_id": os_id, "method_name": "getpid", "args": [], "with": "result"})
+    await client.command_pipeline(53, {"reference_id": counter_id, "steps": [{"call": "most_common", "args": [1]}, {"index": 0}], "with": "result"})
+    await client.command_serialize_reference(54, {"reference_id": counter_id})
+    worker_pid = process_pool.workers[0].pid
+  finally:
+    process_pool.shutdown()
+
+  assert scoundrel_json_loads(ws.sent[2])["data"]["data"]["response"] == worker_pid
+  assert worker_pid != os.getpid()
+  assert scoundrel_json_loads(ws.sent[3])["data"]["data"]["response"] == ["a", 2]
+  assert scoundrel_json_loads(scoundrel_json_loads(ws.sent[4])["data"]["data"]) == {"a": 2, "b": 1}
+
+
+@pytest.mark.asyncio
+async def test_process_targets_support_index_reads_length_and_iteration():
+  ws = DummyWebSocket()
+  process_pool = ProcessPool(["collections"], processes=1)
+  client = WebSocketClient(ws, process_pool=process_pool)
+
+  try:
+    counter_id = client.spawn_object(process_pool.create("collections.Counter", [["a", "b", "a", "c"]]))
+    pairs_id = client.spawn_object(client.objects[counter_id].call("most_common", [], keep=True))
+
+    for command_id, data in enumerate([
+      {"attribute_name": 0},
+      {"attribute_name": "length"},
+      {"attribute_name": "[1:3]"},
+      {"keys": ["a", "c"]}
+    ]):
+      reference_id = counter_id if "keys" in data else pairs_id
+      await client.command_read_attribute(command_id, {**data, "reference_id": reference_id, "with": "result"})
+
+    await client.command_iterate_open(10, {"reference_id": pairs_id, "chunk_size": 2})
+    iterator_id = scoundrel_json_loads(ws.sent[4])["data"]["data"]["iterator_id"]
+    await client.command_iterate_next(11, {"iterator_id": iterator_id})
+    await client.command_iterate_next(12, {"iterator_id": iterator_id})
+  finally:
+    client.close_iterators()
+    process_pool.shutdown()
+
+  responses = [scoundrel_json_loads(sent)["data"]["data"] for sent in ws.sent]
+
+  assert responses[0]["response"] == ["a", 2]
+  assert responses[1]["response"] == 3
+  assert responses[2] == {"response": [["b", 1], ["c", 1]], "length": 3}
+  assert responses[3] == {"response": [2, 1], "length": 3}
+  assert responses[5] == {"response": [["a", 2], ["b", 1]], "done": False}
+  assert responses[6] == {"response": [["c", 1]], "done": True}
+
+
+@pytest.mark.asyncio
+async def test_command_stats_reports_command_metrics_and_references():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  object_id = client.spawn_object(["alpha"])
+
+  await client.run_command(client.command_read_attribute, 60, {
+    "data": {"attribute_name": 0, "reference_id": object_id, "with": "result"}
+  }, received_at=0.0)
+
+  with pytest.raises(AttributeError):
+    await client.run_command(client.command_read_attribute, 61, {
+      "data": {"attribute_name": "missing", "reference_id": object_id, "with": "result"}
+    })
+
+  await client.command_stats(62, {})
+
+  stats = scoundrel_json_loads(ws.sent[2])["data"]["data"]
+  read_attribute = stats["commands"]["read_attribute"]
+
+  assert read_attribute["count"] == 2
+  assert read_attribute["errors"] == 1
+  assert read_attribute["queue_wait_ms"]["count"] == 1
+  assert read_attribute["serialize_ms"]["count"] == 2
+  assert read_attribute["bytes_out"]["count"] == 2
+  assert stats["in_flight_commands"] == 0
+  assert stats["live_references"] == 1
+  assert stats["connection"]["references"]["live"] == 1
+
+
+@pytest.mark.asyncio
+async def test_stats_server_serves_metrics_as_text():
+  server = ScoundrelPythonServer(stats_port=0)
+  server.metrics.observe("import", "bytes_in", 10)
+  stats_server = await server.start_stats_server()
+
+  try:
+    port = stats_server.sockets[0].getsockname()[1]
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    response = (await reader.read()).decode("utf-8")
+    writer.close()
+  finally:
+    stats_server.close()
+    server.dispatcher.shutdown()
+
+  assert response.startswith("HTTP/1.1 200 OK\r\n")
+  assert 'scoundrel_command_bytes_in_count{command="import"} 1\n' in response
+  assert "scoundrel_dispatcher_pending 0\n" in response
+
+
+@pytest.mark.asyncio
+async def test_debug_callback_receives_truncated_messages():
+  messages = []
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws, debug=messages.append)
+  client.logger.max_length = 20
+
+  await client.respond_to_command(63, "x" * 100)
+
+  assert messages[0] == "WebSocketClient initialized"
+  assert messages[-1] == "Reply: {'command': 'command... (151 more characters)"
+
+
+@pytest.mark.asyncio
+async def test_server_accepts_messages_up_to_the_max_message_size():
+  server = ScoundrelPythonServer.from_argv(["--max-message-size", str(4 * 1024 * 1024)])
+  sock = bind_socket("127.0.0.1", 0)
+  started = asyncio.Event()
+  serve_task = asyncio.ensure_future(server.run_forever(sock=sock, started=started.set))
+  message = {"command": "new_object_with_reference", "command_id": 1, "data": {"class_name": "[]", "args": ["x" * 2 * 1024 * 1024]}}
+
+  try:
+    await asyncio.wait_for(started.wait(), 5)
+
+    async with websockets.connect(f"ws://127.0.0.1:{sock.getsockname()[1]}") as ws:
+      await ws.send(scoundrel_json_dumps(message))
+      response = scoundrel_json_loads(await asyncio.wait_for(ws.recv(), 5))
+
+      message["data"]["args"] = ["x" * 5 * 1024 * 1024]
+      await ws.send(scoundrel_json_dumps(message))
+
+      with pytest.raises(ConnectionClosed) as error:
+        await asyncio.wait_for(ws.recv(), 5)
+  finally:
+    serve_task.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+      await serve_task
+
+  assert server.max_message_size == 4 * 1024 * 1024
+  assert response["data"]["data"]["object_id"] >= 1
+  assert error.value.rcvd.code == 1009
+
+
+def test_server_from_argv_parses_log_level():
+  server = ScoundrelPythonServer.from_argv(["--log-level", "debug"])
+
+  assert server.logger.enabled_for(DEBUG)
+  assert not ScoundrelPythonServer.from_argv([]).logger.enabled_for(INFO)
+
+
+@pytest.mark.asyncio
+async def test_read_cache_serves_cached_reads_until_a_method_call_or_release():
+  class Settings:
+    def __init__(self):
+      self.reads = 0
+      self.zone = "UTC"
+
+    @property
+    def timezone(self):
+      self.reads += 1
+      return self.zone
+
+    def change(self, zone):
+      self.zone = zone
+
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws, read_cache_size=16)
+  settings = Settings()
+  object_id = client.spawn_object(settings)
+  read = {"reference_id": object_id, "attribute_name": "timezone", "with": "result", "cache": True}
+
+  await client.command_read_attribute(70, read)
+  await client.command_read_attribute(71, read)
+  await client.command_call_method_on_reference(72, {"reference_id": object_id, "method_name": "change", "args": ["CET"], "with": "result"})
+  await client.command_read_attribute(73, read)
+  await client.command_read_attribute(74, {**read, "cache": False})
+
+  assert [scoundrel_json_loads(payload)["data"]["data"]["response"] for payload in ws.sent] == ["UTC", "UTC", None, "CET", "CET"]
+  assert settings.reads == 3
+  assert client.read_cache.stats()["hits"] == 1
+
+  client.release_references([object_id])
+
+  assert client.read_cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_command_mark_immutable_caches_every_read_of_the_reference():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws, read_cache_size=16)
+  object_id = client.spawn_object({"fields": ["id", "name"]})
+
+  await client.command_mark_immutable(75, {"reference_id": object_id})
+  await client.command_read_attribute(76, {"reference_id": object_id, "attribute_name": "fields", "with": "result"})
+  await client.command_read_attribute(77, {"reference_id": object_id, "attribute_name": "fields", "with": "result"})
+
+  responses = [scoundrel_json_loads(payload)["data"]["data"] for payload in ws.sent]
+
+  assert responses[0] == {"marked": 1, "read_cache": True}
+  assert responses[1]["response"] == responses[2]["response"] == ["id", "name"]
+  assert client.read_cache.stats()["hits"] == 1
+
+
+@pytest.mark.asyncio
+async def test_read_cache_hands_out_a_new_reference_for_every_reference_read():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws, read_cache_size=16)
+  object_id = client.spawn_object({"fields": ["id", "name"]})
+  read = {"reference_id": object_id, "attribute_name": "fields", "with": "reference", "cache": True}
+
+  await client.command_mark_immutable(78, {"reference_id": object_id})
+  await client.command_read_attribute(79, read)
+  await client.command_read_attribute(80, read)
+
+  first_id, second_id = [scoundrel_json_loads(payload)["data"]["data"]["response"] for payload in ws.sent[1:]]
+
+  # Releasing one reader's reference must leave the other reader's reference usable
+  client.release_references([first_id])
+
+  assert first_id != second_id
+  assert client.objects[second_id] == ["id", "name"]
+  assert client.read_cache.stats()["size"] == 0
+
+
+@pytest.mark.asyncio
+async def test_listen_coalesces_responses_after_handshake():
+  list_payload = ["alpha", "beta", "gamma"]
+  messages = [scoundrel_json_dumps({"command": "handshake", "command_id": 80, "data": {"coalesce": True}})]
+  messages.extend(
+    scoundrel_json_dumps({
+      "command": "read_attribute",
+      "command_id": 81 + index,
+      "data": {"reference_id": 1, "attribute_name": index, "with": "result"}
+    })
+    for index in range(3)
+  )
+  ws = CallbackAnsweringWebSocket(messages)
+  client = WebSocketClient(ws, coalesce_window=5)
+  client.objects[1] = list_payload
+
+  listen_task = asyncio.ensure_future(client.listen())
+  await asyncio.wait_for(ws.responded.wait(), 5)
+  while len(ws.sent) < 2:
+    await asyncio.sleep(0.01)
+  listen_task.cancel()
+
+  with pytest.raises(asyncio.CancelledError):
+    await listen_task
+
+  handshake_response = scoundrel_json_loads(ws.sent[0])
+  coalesced = scoundrel_json_loads(ws.sent[1])
+
+  assert handshake_response["data"]["data"]["coalesce"] is True
+  assert coalesced["command"] == "command_responses"
+  assert sorted(response["command_id"] for response in coalesced["responses"]) == [81, 82, 83]
+  assert client.metrics.snapshot()["coalescing"] == {"frames": 1, "responses": 3, "ratio": 3.0}
+
+
+class BufferAnsweringWebSocket(CallbackAnsweringWebSocket):
+  async def send(self, payload):
+    if isinstance(payload, str):
+      await super().send(payload)
+    else:
+      self.sent.append(payload)
+
+
+@pytest.mark.asyncio
+async def test_listen_sends_lone_responses_right_away_after_buffer_responses():
+  class Example:
+    def report(self):
+      return b"0123456789"
+
+  ws = BufferAnsweringWebSocket([
+    scoundrel_json_dumps({"command": "handshake", "command_id": 90, "data": {"coalesce": True}}),
+    scoundrel_json_dumps({
+      "command": "call_method_on_reference",
+      "command_id": 91,
+      "data": {"args": [], "method_name": "report", "reference_id": 1, "with": "buffer"}
+    })
+  ])
+  client = WebSocketClient(ws, coalesce_window=5)
+  client.objects[1] = Example()
+
+  def answered(command_id):
+    return any(
+      isinstance(sent, str) and scoundrel_json_loads(sent)["command_id"] == command_id
+      for sent in ws.sent
+    )
+
+  async def wait_for_answer(command_id):
+    while not answered(command_id):
+      await asyncio.sleep(0.01)
+
+  listen_task = asyncio.ensure_future(client.listen())
+  await asyncio.wait_for(wait_for_answer(91), 5)
+
+  ws.messages.put_nowait(scoundrel_json_dumps({
+    "command": "read_attribute",
+    "command_id": 92,
+    "data": {"reference_id": 1, "attribute_name": "__class__", "with": "reference"}
+  }))
+  await asyncio.wait_for(wait_for_answer(92), 1)
+  listen_task.cancel()
+
+  with pytest.raises(asyncio.CancelledError):
+    await listen_task
+
+  assert client.coalescer.outstanding == 0
+
+
+@pytest.mark.asyncio
+async def test_send_command_waits_for_a_free_outgoing_slot():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws, max_outgoing_commands=1)
+  client.loop = asyncio.get_running_loop()
+
+  first = asyncio.ensure_future(client.send_command("call_function_on_reference", {"reference_id": 1}))
+  second = asyncio.ensure_future(client.send_command("call_function_on_reference", {"reference_id": 2}))
+  await asyncio.sleep(0.01)
+
+  stats = await client.execute_stats({})
+
+  assert len(ws.sent) == 1
+  assert stats["connection"]["outgoing_callbacks"] == 1
+  assert stats["connection"]["outgoing_callbacks_waiting"] == 1
+  assert stats["callbacks_waiting"] == 1
+
+  client.handle_command_response({"command": "command_response", "command_id": 1, "data": {"data": "first"}})
+  await asyncio.sleep(0.01)
+  client.handle_command_response({"command": "command_response", "command_id": 2, "data": {"data": "second"}})
+
+  assert await first == "first"
+  assert await second == "second"
+  assert len(ws.sent) == 2
+  assert client.outgoing_commands == {}
+
+
+@pytest.mark.asyncio
+async def test_send_command_times_out_and_ignores_late_responses():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws, callback_timeout=0.01)
+  client.loop = asyncio.get_running_loop()
+
+  with pytest.raises(TimeoutError):
+    await client.send_command("call_function_on_reference", {"reference_id": 1})
+
+  assert client.outgoing_commands == {}
+  assert client.metrics.snapshot()["callbacks_timed_out"] == 1
+  assert not client.handle_command_response({"command": "command_response", "command_id": 1, "data": {"data": "late"}})
+
+
+@pytest.mark.asyncio
+async def test_listen_cancels_pending_callbacks_when_the_connection_closes():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  client.loop = asyncio.get_running_loop()
+
+  pending = asyncio.ensure_future(client.send_command("call_function_on_reference", {"reference_id": 1}))
+  await asyncio.sleep(0)
+
+  with pytest.raises(RuntimeError):
+    await client.listen()
+
+  with pytest.raises(ConnectionError):
+    await pending
+
+  with pytest.raises(ConnectionError):
+    await client.send_command("call_function_on_reference", {"reference_id": 2})
+
+  assert client.outgoing_commands == {}
+  assert client.metrics.snapshot()["callbacks_cancelled"] == 1
+
+
+@pytest.mark.asyncio
+async def test_callbacks_without_reply_are_sent_before_the_response():
+  class Job:
+    def run(self, progress, log):
+      for index in range(250):
+        progress(index)
+
+      log("done")
+      return "finished"
+
+  message = {
+    "command": "call_method_on_reference",
+    "command_id": 33,
+    "data": {
+      "args": [
+        {"__scoundrel_type": "function", "__scoundrel_function_id": 8, "__scoundrel_callback_mode": "batched", "__scoundrel_batch_size": 100},
+        {"__scoundrel_type": "function", "__scoundrel_function_id": 9, "__scoundrel_callback_mode": "fire_and_forget"}
+      ],
+      "method_name": "run",
+      "reference_id": 1,
+      "with": "result"
+    }
+  }
+  ws = CallbackAnsweringWebSocket([scoundrel_json_dumps(message)])
+  client = WebSocketClient(ws)
+  client.objects[1] = Job()
+
+  listen_task = asyncio.ensure_future(client.listen())
+  await asyncio.wait_for(ws.responded.wait(), 5)
+  listen_task.cancel()
+
+  with pytest.raises(asyncio.CancelledError):
+    await listen_task
+
+  messages = [scoundrel_json_loads(message) for message in ws.sent]
+  batches = [message["data"] for message in messages if message["data"].get("reference_id") == 8]
+
+  assert [len(batch["calls"]) for batch in batches] == [100, 100, 50]
+  assert batches[0]["calls"][1] == [1]
+  assert all(message["command_id"] is None for message in messages[:-1])
+  assert [message["data"] for message in messages if message["data"].get("reference_id") == 9] == [
+    {"reference_id": 9, "args": ["done"], "with": "none"}
+  ]
+  assert messages[-1]["command_id"] == 33
+  assert messages[-1]["data"]["data"]["response"] == "finished"
+  assert client.outgoing_commands == {}
+  assert client.metrics.snapshot()["callbacks_without_reply"] == 251
+
+
+class NestedCallbackWebSocket(CallbackAnsweringWebSocket):
+  async def send(self, payload):
+    self.sent.append(payload)
+    data = scoundrel_json_loads(payload)
+
+    if data["command"] == "call_function_on_reference":
+      # The client handles the callback by calling back into Python before it answers
+      self.callback_id = data["command_id"]
+      self.messages.put_nowait(scoundrel_json_dumps({
+        "command": "read_attribute",
+        "command_id": 91,
+        "data": {"attribute_name": "value", "reference_id": 1, "with": "result"}
+      }))
+    elif data["command"] == "command_response" and data["command_id"] == 91:
+      self.messages.put_nowait(scoundrel_json_dumps({
+        "command": "command_response",
+        "command_id": self.callback_id,
+        "data": {"data": {"response": data["data"]["data"]["response"] * 10}}
+      }))
+    elif data["command"] == "command_response":
+      self.responded.set()
+
+
+@pytest.mark.asyncio
+async def test_nested_callbacks_run_when_the_pool_is_saturated():
+  class Example:
+    value = 4
+
+    def compute(self, callback):
+      return callback() + 1
+
+  message = {
+    "command": "call_method_on_reference",
+    "command_id": 90,
+    "data": {
+      "args": [{"__scoundrel_type": "function", "__scoundrel_function_id": 5}],
+      "method_name": "compute",
+      "reference_id": 1,
+      "with": "result"
+    }
+  }
+  ws = NestedCallbackWebSocket([scoundrel_json_dumps(message)])
+  dispatcher = CommandDispatcher(pool_size=1, queue_size=0)
+  client = WebSocketClient(ws, dispatcher=dispatcher)
+  client.objects[1] = Example()
+
+  listen_task = asyncio.ensure_future(client.listen())
+  await asyncio.wait_for(ws.responded.wait(), 5)
+  listen_task.cancel()
+
+  with pytest.raises(asyncio.CancelledError):
+    await listen_task
+
+  dispatcher.shutdown()
+  response = scoundrel_json_loads(ws.sent[-1])
+
+  assert response["command_id"] == 90
+  assert response["data"]["data"]["response"] == 41
+  assert dispatcher.pending == 0
+
+
+@pytest.mark.asyncio
+async def test_compact_handles_leave_out_instance_ids_and_resolve_short_markers():
+  ws = DummyWebSocket()
+  client = WebSocketClient(ws)
+  client.loop = asyncio.get_running_loop()
+
+  await client.handle_handshake(90, {"handles": "compact"})
+  await client.command_new_object_with_reference(91, {"class_name": "[]", "args": ["alpha", "beta"]})
+
+  handshake_response = scoundrel_json_loads(ws.sent[0])["data"]["data"]
+  object_id = scoundrel_json_loads(ws.sent[1])["data"]["data"]["object_id"]
+
+  await client.command_read_attribute(92, {"reference_id": object_id, "attribute_name": 0, "with": "reference"})
+
+  message = client.decode_message(scoundrel_json_dumps({"args": [{"$r": object_id}, {"$f": 5}, {"$other": 1}]}))
+  marker = client.serialize_function_arg(["gamma"])
+
+  assert handshake_response["handles"] == "compact"
+  assert handshake_response["instance_id"] == client.instance_id
+  assert scoundrel_json_loads(ws.sent[1])["data"]["data"] == {"object_id": object_id}
+  assert list(scoundrel_json_loads(ws.sent[2])["data"]["data"]) == ["response"]
+  assert list(marker) == ["$r"]
+  assert client.objects[marker["$r"]] == ["gamma"]
+  assert message["args"][0] == ["alpha", "beta"]
+  assert callable(message["args"][1])
+  assert message["args"][2] == {"$other": 1}
+
+
+def test_verbose_handles_are_kept_without_a_compact_handshake():
+  client = WebSocketClient(DummyWebSocket())
+  marker = client.serialize_function_arg(["gamma"])
+
+  assert marker["__scoundrel_type"] == "reference"
+  assert marker["__scoundrel_instance_id"] == client.instance_id
+  assert client.decode_message(scoundrel_json_dumps({"args": [{"$r": marker["__scoundrel_object_id"]}]})) == {
+    "args": [{"$r": marker["__scoundrel_object_id"]}]
+  }
@@ -0,0 +1,100 @@
+import collections
+import datetime as dt
+import enum
+import re
+
+import pytest
+
+from scoundrel_python.scoundrel_json import ScoundrelTypeHandler, register_scoundrel_type
+from scoundrel_python.wire_codecs import JsonWireCodec, available_wire_codecs, negotiate_wire_codec
+
+
+def test_json_wire_codec_round_trips_text_frames():
+  codec = JsonWireCodec()
+  timestamp = dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+  raw = codec.encode({"created_at": timestamp})
+
+  assert isinstance(raw, str)
+  assert codec.decode(raw) == {"created_at": timestamp}
+  assert codec.decode(raw.encode("utf-8")) == {"created_at": timestamp}
+
+
+def test_json_wire_codec_decodes_fragments_joined_once():
+  codec = JsonWireCodec()
+  timestamp = dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+  raw = codec.encode({"created_at": timestamp, "items": [{"created_at": timestamp}]})
+  decoder = codec.decoder()
+
+  for index in range(0, len(raw), 7):
+    decoder.feed(raw[index:index + 7])
+
+  assert decoder.result() == {"created_at": timestamp, "items": [{"created_at": timestamp}]}
+  assert decoder.fragments == []
+
+
+def test_negotiate_wire_codec_falls_back_to_json():
+  assert negotiate_wire_codec(["unknown"]).name == "json"
+  assert negotiate_wire_codec(["msgpack", "json"], allowed=["json"]).name == "json"
+
+
+def test_msgpack_wire_codec_round_trips_native_extension_types():
+  pytest.importorskip("msgpack")
+
+  codec = negotiate_wire_codec(["msgpack", "json"])
+  timestamp = dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+  matcher = re.compile("scoundrel", re.IGNORECASE)
+  raw = codec.encode({"created_at": timestamp, "matcher": matcher, "blob": b"\x00\x01\x02", "items": [1, 2.5]})
+  decoded = codec.decode(raw)
+
+  assert codec.name == "msgpack"
+  assert "msgpack" in available_wire_codecs()
+  assert isinstance(raw, bytes)
+  assert decoded["created_at"] == timestamp
+  assert decoded["matcher"].pattern == "scoundrel"
+  assert decoded["matcher"].flags & re.IGNORECASE
+  assert decoded["blob"] == b"\x00\x01\x02"
+  assert decoded["items"] == [1, 2.5]
+
+
+def test_msgpack_wire_codec_uses_handlers_for_native_subclasses(restore_scoundrel_types):
+  pytest.importorskip("msgpack")
+
+  class Color(enum.IntEnum):
+    RED = 1
+
+  class Settings(dict):
+    pass
+
+  register_scoundrel_type(
+    ScoundrelTypeHandler(
+      type="test_ordered_dict",
+      can_serialize=lambda value: isinstance(value, collections.OrderedDict),
+      serialize=lambda value: {"items": list(value.items())},
+      deserialize=lambda payload: collections.OrderedDict(payload["items"])
+    )
+  )
+
+  codec = negotiate_wire_codec(["msgpack"])
+  decoded = codec.decode(codec.encode({
+    "ordered": collections.OrderedDict(x=1),
+    "settings": Settings(a=(1, True)),
+    "color": Color.RED
+  }))
+
+  assert type(decoded["ordered"]) is collections.OrderedDict
+  assert decoded == {"ordered": collections.OrderedDict(x=1), "settings": {"a": [1, True]}, "color": 1}
+
+
+def test_msgpack_wire_codec_decodes_fragments_incrementally():
+  pytest.importorskip("msgpack")
+
+  codec = negotiate_wire_codec(["msgpack"])
+  timestamp = dt.datetime(2024, 1, 2, 3, 4, 5, tzinfo=dt.timezone.utc)
+  raw = codec.encode({"created_at": timestamp, "items": list(range(100))})
+  decoder = codec.decoder()
+
+  for index in range(0, len(raw), 5):
+    decoder.feed(raw[index:index + 5])
+
+  assert decoder.fragments == []
+  assert decoder.result() == {"created_at": timestamp, "items": list(range(100))}
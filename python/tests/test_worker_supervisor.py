@@ -0,0 +1,80 @@
+import os
+import re
+import signal
+import subprocess
+import sys
+
+import pytest
+from websockets.sync.client import connect
+
+from scoundrel_python.scoundrel_json import dumps as scoundrel_json_dumps
+from scoundrel_python.scoundrel_json import loads as scoundrel_json_loads
+from scoundrel_python.worker_supervisor import WorkerSupervisor
+
+SERVER_PATH = os.path.join(os.path.dirname(__file__), "..", "server", "web-socket.py")
+STARTED_PATTERN = re.compile(r"^Started with PID (\d+) on (.+):(\d+) with workers ([\d, ]+)\n$")
+
+
+def request(port, payload):
+  with connect(f"ws://127.0.0.1:{port}") as ws:
+    ws.send(scoundrel_json_dumps(payload))
+    return scoundrel_json_loads(ws.recv())
+
+
+def pid_exists(pid):
+  try:
+    os.kill(pid, 0)
+  except ProcessLookupError:
+    return False
+
+  return True
+
+
+def test_worker_supervisor_rejects_invalid_worker_counts():
+  with pytest.raises(ValueError, match="at least 1"):
+    WorkerSupervisor(None, 0)  # type: ignore[arg-type]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="Workers are forked")
+def test_workers_share_the_port_and_are_restarted_after_crashing():
+  process = subprocess.Popen(
+    [sys.executable, SERVER_PATH, "--port", "0", "--workers", "2"],
+    stdout=subprocess.PIPE,
+    text=True
+  )
+
+  try:
+    assert process.stdout is not None
+    match = STARTED_PATTERN.match(process.stdout.readline())
+
+    assert match is not None
+    assert int(match.group(1)) == process.pid
+
+    port = int(match.group(3))
+    worker_pids = [int(pid) for pid in match.group(4).split(", ")]
+
+    assert len(worker_pids) == 2
+    assert process.pid not in worker_pids
+
+    response = request(port, {"command": "handshake", "command_id": 1, "data": {"codecs": ["json"]}})
+    assert response["data"]["data"]["codec"] == "json"
+
+    os.kill(worker_pids[0], signal.SIGKILL)
+
+    restart_line = process.stdout.readline()
+    while not restart_line.startswith("Worker "):
+      restart_line = process.stdout.readline()
+
+    assert restart_line.startswith(f"Worker {worker_pids[0]} exited with code -9, restarted as ")
+    restarted_pid = int(restart_line.rsplit(" ", 1)[1])
+
+    for command_id in range(2, 6):
+      response = request(port, {"command": "import", "command_id": command_id, "data": {"import_name": "os"}})
+      assert "object_id" in response["data"]["data"]
+  finally:
+    process.send_signal(signal.SIGTERM)
+    process.wait(timeout=10)
+
+  assert process.returncode == 0
+  assert not pid_exists(worker_pids[1])
+  assert not pid_exists(restarted_pid)